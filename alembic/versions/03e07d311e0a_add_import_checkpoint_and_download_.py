@@ -0,0 +1,45 @@
+"""Add import checkpoint and download split tables
+
+Revision ID: 03e07d311e0a
+Revises: 3b410454a439
+Create Date: 2026-10-18 19:23:50.838496
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "03e07d311e0a"
+down_revision: Union[str, None] = "3b410454a439"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "importcheckpoint",
+        sa.Column("importer", sa.String(), nullable=False),
+        sa.Column("unit", sa.String(), nullable=False),
+        sa.Column("position", sa.String(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("importer", "unit"),
+    )
+    op.create_table(
+        "downloadsplit",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.DateTime(), nullable=False),
+        sa.Column("normalized_name", sa.String(), nullable=False),
+        sa.Column("downloads", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_downloadsplit_month", "downloadsplit", ["month"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_downloadsplit_month", table_name="downloadsplit")
+    op.drop_table("downloadsplit")
+    op.drop_table("importcheckpoint")
@@ -0,0 +1,37 @@
+"""Add package features table
+
+Revision ID: 12fb8c3b1c57
+Revises: 864bf671b838
+Create Date: 2026-10-18 19:46:22.271986
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "12fb8c3b1c57"
+down_revision: Union[str, None] = "864bf671b838"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "packagefeatures",
+        sa.Column("package_id", sa.Integer(), nullable=False),
+        sa.Column("decayed_downloads", sa.Float(), nullable=False),
+        sa.Column("rolling_mean", sa.Float(), nullable=False),
+        sa.Column("slope", sa.Float(), nullable=False),
+        sa.Column("zscore", sa.Float(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["package_id"], ["package.id"]),
+        sa.PrimaryKeyConstraint("package_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("packagefeatures")
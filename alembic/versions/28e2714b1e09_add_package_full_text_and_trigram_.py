@@ -0,0 +1,57 @@
+"""Add package full-text and trigram search indexes
+
+Revision ID: 28e2714b1e09
+Revises: 77bc199a704b
+Create Date: 2026-10-18 18:43:15.721765
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "28e2714b1e09"
+down_revision: Union[str, None] = "77bc199a704b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "package",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('simple', coalesce(name, '')), 'A')"
+                " || setweight(to_tsvector('english', coalesce(summary, '')), 'B')"
+                " || setweight(to_tsvector('english', coalesce(keywords, '')), 'C')",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_package_search_vector",
+        "package",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_package_name_trgm",
+        "package",
+        ["name"],
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_package_name_trgm", table_name="package")
+    op.drop_index("ix_package_search_vector", table_name="package")
+    op.drop_column("package", "search_vector")
@@ -0,0 +1,39 @@
+"""Add import run table
+
+Revision ID: 3b410454a439
+Revises: 94e49f9afa86
+Create Date: 2026-10-18 19:12:21.492486
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b410454a439"
+down_revision: Union[str, None] = "94e49f9afa86"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "importrun",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("importer", sa.String(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=False),
+        sa.Column("watermark", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_importrun_importer", "importrun", ["importer"])
+    op.create_index("ix_package_upload_time", "package", ["upload_time"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_package_upload_time", table_name="package")
+    op.drop_index("ix_importrun_importer", table_name="importrun")
+    op.drop_table("importrun")
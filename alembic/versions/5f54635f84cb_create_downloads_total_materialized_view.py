@@ -0,0 +1,49 @@
+"""Create downloads total materialized view
+
+Revision ID: 5f54635f84cb
+Revises: 50fb9a7296e4
+Create Date: 2026-10-18 18:39:41.862076
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5f54635f84cb"
+down_revision: Union[str, None] = "50fb9a7296e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS downloadstotal")
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW downloadstotal AS
+        SELECT
+          package.id AS package_id,
+          coalesce(sum(download.downloads), 0) AS downloads_total
+        FROM package
+        LEFT OUTER JOIN download ON package.id = download.package_id
+        GROUP BY package.id
+        """
+    )
+    op.create_index(
+        "downloads_total_package_id_fkey",
+        "downloadstotal",
+        ["package_id"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_downloadstotal_downloads_total",
+        "downloadstotal",
+        [sa.text("downloads_total DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW downloadstotal")
@@ -0,0 +1,37 @@
+"""Add package id to downloads total sort index
+
+Revision ID: 77bc199a704b
+Revises: 5f54635f84cb
+Create Date: 2026-10-18 18:40:44.726533
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "77bc199a704b"
+down_revision: Union[str, None] = "5f54635f84cb"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_downloadstotal_downloads_total", table_name="downloadstotal")
+    op.create_index(
+        "ix_downloadstotal_downloads_total",
+        "downloadstotal",
+        [sa.text("downloads_total DESC"), sa.text("package_id DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_downloadstotal_downloads_total", table_name="downloadstotal")
+    op.create_index(
+        "ix_downloadstotal_downloads_total",
+        "downloadstotal",
+        [sa.text("downloads_total DESC")],
+    )
@@ -0,0 +1,49 @@
+"""Add package flags
+
+Revision ID: 7c2ab07b6612
+Revises: 12fb8c3b1c57
+Create Date: 2026-10-18 20:24:36.163057
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c2ab07b6612"
+down_revision: Union[str, None] = "12fb8c3b1c57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FLAGS = ["is_prerelease", "is_abandoned", "is_app", "is_library"]
+
+
+def upgrade() -> None:
+    for flag in FLAGS:
+        op.add_column("package", sa.Column(flag, sa.Boolean(), nullable=True))
+    op.add_column("package", sa.Column("dev_status", sa.SmallInteger(), nullable=True))
+
+    # the flags hold for few packages, so indexing only those keeps the
+    # indexes small, and reading the ids of a flag an index-only scan
+    for flag in FLAGS:
+        op.create_index(
+            f"ix_package_{flag}", "package", ["id"], postgresql_where=sa.text(flag)
+        )
+    op.create_index(
+        "ix_package_dev_status",
+        "package",
+        ["dev_status", "id"],
+        postgresql_where=sa.text("dev_status IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_package_dev_status", table_name="package")
+    for flag in FLAGS:
+        op.drop_index(f"ix_package_{flag}", table_name="package")
+    op.drop_column("package", "dev_status")
+    for flag in FLAGS:
+        op.drop_column("package", flag)
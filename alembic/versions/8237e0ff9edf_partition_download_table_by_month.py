@@ -0,0 +1,126 @@
+"""Partition download table by month
+
+Revision ID: 8237e0ff9edf
+Revises: 03e07d311e0a
+Create Date: 2026-10-18 19:26:42.834138
+
+"""
+
+from datetime import datetime
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from dateutil.relativedelta import relativedelta
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8237e0ff9edf"
+down_revision: Union[str, None] = "03e07d311e0a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the first month the downloads importer imports
+MIN_MONTH = datetime(2016, 1, 1)
+
+
+def create_downloads_total_view() -> None:
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW downloadstotal AS
+        SELECT
+          package.id AS package_id,
+          coalesce(sum(download.downloads), 0) AS downloads_total
+        FROM package
+        LEFT OUTER JOIN download ON package.id = download.package_id
+        GROUP BY package.id
+        """
+    )
+    op.create_index(
+        "downloads_total_package_id_fkey",
+        "downloadstotal",
+        ["package_id"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_downloadstotal_downloads_total",
+        "downloadstotal",
+        [sa.text("downloads_total DESC"), sa.text("package_id DESC")],
+    )
+
+
+def upgrade() -> None:
+    # the view depends on the table that is replaced
+    op.execute("DROP MATERIALIZED VIEW downloadstotal")
+    op.rename_table("download", "download_unpartitioned")
+    op.execute("ALTER INDEX download_pkey RENAME TO download_unpartitioned_pkey")
+    op.execute(
+        "ALTER INDEX ix_download_package_id_month"
+        " RENAME TO ix_download_unpartitioned_package_id_month"
+    )
+
+    # (package_id, month) was unique already, and a primary key of a
+    # partitioned table has to include the partition key
+    op.create_table(
+        "download",
+        sa.Column("package_id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.DateTime(), nullable=False),
+        sa.Column("imported_at", sa.DateTime(), nullable=False),
+        sa.Column("downloads", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["package_id"], ["package.id"]),
+        sa.PrimaryKeyConstraint("package_id", "month"),
+        postgresql_partition_by="RANGE (month)",
+    )
+
+    first_month, last_month = (
+        op.get_bind()
+        .execute(sa.text("SELECT min(month), max(month) FROM download_unpartitioned"))
+        .one()
+    )
+    month = min(first_month or MIN_MONTH, MIN_MONTH)
+    last_month = max(last_month or MIN_MONTH, datetime.now()) + relativedelta(months=3)
+    while month <= last_month:
+        month_end = month + relativedelta(months=1)
+        op.execute(
+            f"CREATE TABLE download_{month:%Y_%m} PARTITION OF download"
+            f" FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{month_end:%Y-%m-%d}')"
+        )
+        month = month_end
+
+    op.execute(
+        """
+        INSERT INTO download (package_id, month, imported_at, downloads)
+        SELECT package_id, month, imported_at, downloads FROM download_unpartitioned
+        """
+    )
+    op.drop_table("download_unpartitioned")
+    create_downloads_total_view()
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW downloadstotal")
+    op.rename_table("download", "download_partitioned")
+    op.execute("ALTER INDEX download_pkey RENAME TO download_partitioned_pkey")
+
+    op.create_table(
+        "download",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("package_id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.DateTime(), nullable=False),
+        sa.Column("downloads", sa.Integer(), nullable=False),
+        sa.Column("imported_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["package_id"], ["package.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_download_package_id_month", "download", ["package_id", "month"], unique=True
+    )
+    op.execute(
+        """
+        INSERT INTO download (package_id, month, imported_at, downloads)
+        SELECT package_id, month, imported_at, downloads FROM download_partitioned
+        """
+    )
+    # dropping the partitioned table drops its partitions
+    op.drop_table("download_partitioned")
+    create_downloads_total_view()
@@ -0,0 +1,86 @@
+"""Add package score view
+
+Revision ID: 864bf671b838
+Revises: 8237e0ff9edf
+Create Date: 2026-10-18 19:43:10.002736
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "864bf671b838"
+down_revision: Union[str, None] = "8237e0ff9edf"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the same as petshop.models.PackageScore
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW packagescore AS
+        WITH reference AS (
+          SELECT coalesce(
+            max(month) FILTER (WHERE imported_at >= month + interval '1 month'),
+            max(month),
+            date_trunc('month', LOCALTIMESTAMP)
+          ) AS month
+          FROM download
+        ),
+        scored AS (
+          SELECT
+            package.id AS package_id,
+            coalesce(sum(
+              download.downloads * power(0.5, (
+                CAST(extract(year FROM reference.month) * 12
+                  + extract(month FROM reference.month) AS double precision)
+                - CAST(extract(year FROM download.month) * 12
+                  + extract(month FROM download.month) AS double precision)
+              ) / 6)
+            ), 0) AS decayed_downloads,
+            coalesce(sum(download.downloads)
+              FILTER (WHERE download.month = reference.month), 0) AS last_month,
+            coalesce(sum(download.downloads)
+              FILTER (WHERE download.month = reference.month - interval '1 month'), 0)
+              AS previous_month,
+            power(0.5, CAST(greatest(
+              extract(epoch FROM reference.month - package.upload_time), 0
+            ) AS double precision) / 63072000) AS recency
+          FROM package
+          JOIN reference ON true
+          LEFT OUTER JOIN download
+            ON download.package_id = package.id AND download.month <= reference.month
+          GROUP BY package.id, reference.month
+        )
+        SELECT
+          package_id,
+          CAST(decayed_downloads AS double precision) AS decayed_downloads,
+          CAST((last_month - previous_month) / (previous_month + 1000.0)
+            AS double precision) AS growth,
+          recency,
+          CAST(decayed_downloads * (1 + recency) / 2 AS double precision) AS popularity
+        FROM scored
+        """
+    )
+    op.create_index(
+        "ix_packagescore_package_id", "packagescore", ["package_id"], unique=True
+    )
+    op.create_index(
+        "ix_packagescore_popularity",
+        "packagescore",
+        [sa.text("popularity DESC"), sa.text("package_id DESC")],
+    )
+    op.create_index(
+        "ix_packagescore_growth",
+        "packagescore",
+        [sa.text("growth DESC"), sa.text("package_id DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW packagescore")
@@ -0,0 +1,80 @@
+"""Add normalized package name
+
+Revision ID: 94e49f9afa86
+Revises: 9ad8683c8ed2
+Create Date: 2026-10-18 19:09:15.645012
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "94e49f9afa86"
+down_revision: Union[str, None] = "9ad8683c8ed2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "package",
+        sa.Column(
+            "normalized_name",
+            sa.String(),
+            sa.Computed(
+                "lower(regexp_replace(name, '[-_.]+', '-', 'g'))", persisted=True
+            ),
+            nullable=True,
+        ),
+    )
+
+    # merge packages whose names only differ in case or separators into the
+    # most recently uploaded one, adding up their downloads
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE package_duplicate AS
+        SELECT id, keep_id FROM (
+          SELECT
+            id,
+            first_value(id) OVER (
+              PARTITION BY normalized_name ORDER BY upload_time DESC, id DESC
+            ) AS keep_id
+          FROM package
+        ) AS ranked
+        WHERE id <> keep_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO download (imported_at, package_id, month, downloads)
+        SELECT max(download.imported_at), package_duplicate.keep_id,
+          download.month, sum(download.downloads)
+        FROM download
+        JOIN package_duplicate ON download.package_id = package_duplicate.id
+        GROUP BY package_duplicate.keep_id, download.month
+        ON CONFLICT (package_id, month) DO UPDATE
+        SET downloads = download.downloads + EXCLUDED.downloads
+        """
+    )
+    for table in ["download", "classifierpackagelink"]:
+        op.execute(
+            f"DELETE FROM {table} USING package_duplicate"
+            f" WHERE {table}.package_id = package_duplicate.id"
+        )
+    op.execute(
+        "DELETE FROM package USING package_duplicate WHERE package.id = package_duplicate.id"
+    )
+    op.execute("DROP TABLE package_duplicate")
+
+    op.create_index(
+        "ix_package_normalized_name", "package", ["normalized_name"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_package_normalized_name", table_name="package")
+    op.drop_column("package", "normalized_name")
@@ -0,0 +1,36 @@
+"""Add data generation table
+
+Revision ID: 9ad8683c8ed2
+Revises: ddf0042095e1
+Create Date: 2026-10-18 19:01:46.943101
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9ad8683c8ed2"
+down_revision: Union[str, None] = "ddf0042095e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "datageneration",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("generation", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute(
+        "INSERT INTO datageneration (id, generation, updated_at) VALUES (1, 0, now())"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("datageneration")
@@ -0,0 +1,29 @@
+"""Make package name index unique
+
+Revision ID: a8472fb56b5b
+Revises: 28e2714b1e09
+Create Date: 2026-10-18 18:44:53.303533
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a8472fb56b5b"
+down_revision: Union[str, None] = "28e2714b1e09"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 8b98fb25b5bf recreated the index as non-unique, which leaves nothing for
+    # INSERT ... ON CONFLICT (name) to infer
+    op.drop_index("ix_package_name", table_name="package")
+    op.create_index("ix_package_name", "package", ["name"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_package_name", table_name="package")
+    op.create_index("ix_package_name", "package", ["name"], unique=False)
@@ -0,0 +1,30 @@
+"""Add unique index on download package and month
+
+Revision ID: ddf0042095e1
+Revises: a8472fb56b5b
+Create Date: 2026-10-18 18:46:06.086280
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "ddf0042095e1"
+down_revision: Union[str, None] = "a8472fb56b5b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_download_package_id_month",
+        "download",
+        ["package_id", "month"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_download_package_id_month", table_name="download")
@@ -0,0 +1,71 @@
+"""Measure requests per second of the package API under concurrent load.
+
+Start the API first, e.g. `uvicorn petshop.api.main:app --workers 1`, then
+run `python benchmarks/load_test.py --concurrency 200 --duration 20`.
+"""
+
+import asyncio
+import statistics
+import time
+
+import click
+import httpx
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    path: str,
+    deadline: float,
+    latencies: list[float],
+    errors: list[int],
+):
+    while time.perf_counter() < deadline:
+        start_time = time.perf_counter()
+        try:
+            response = await client.get(path)
+        except httpx.HTTPError:
+            errors.append(0)
+            continue
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start_time)
+        else:
+            errors.append(response.status_code)
+
+
+async def run(url: str, path: str, concurrency: int, duration: float):
+    latencies: list[float] = []
+    errors: list[int] = []
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(
+                worker(client, path, deadline, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+
+    if len(latencies) < 2:
+        print(f"{len(latencies)} successful requests, {len(errors)} errors")
+        return
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{len(latencies) / duration:.1f} requests/s, "
+        f"p50 {quantiles[49] * 1000:.1f} ms, p95 {quantiles[94] * 1000:.1f} ms, "
+        f"{len(errors)} errors"
+    )
+
+
+@click.command()
+@click.option("--url", default="http://127.0.0.1:8000")
+@click.option("--path", default="/api/packages?q=flask")
+@click.option("--concurrency", type=int, default=100)
+@click.option("--duration", type=float, default=10.0)
+def main(url: str, path: str, concurrency: int, duration: float):
+    asyncio.run(run(url, path, concurrency, duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Compare computing score features with NumPy against SQL window functions.
+
+Both compute the features of petshop.importer.score_features from the same
+downloads, and the results are checked against each other. Point
+DATABASE_URL at a database with imported downloads, then run
+`python benchmarks/score_features.py --months 60`. Nothing is written.
+"""
+
+import time
+
+import click
+import numpy as np
+from dotenv import load_dotenv
+from sqlmodel import text
+
+from petshop.db import engine
+from petshop.importer.score_features import (
+    ROLLING_MEAN_MONTHS,
+    TREND_MONTHS,
+    compute_score_features,
+    get_reference_month,
+    load_download_matrix,
+)
+from petshop.models import SCORE_DOWNLOADS_HALF_LIFE_MONTHS
+
+# fills in the months without downloads, so that the windows span months
+# rather than rows, like the columns of the matrix
+SCORE_FEATURES_SQL = """
+WITH packages AS (
+  SELECT DISTINCT package_id FROM download
+  WHERE month <= :reference_month
+    AND month > CAST(:reference_month AS timestamp) - make_interval(months => :months)
+),
+series AS (
+  SELECT
+    packages.package_id,
+    months_ago,
+    coalesce(download.downloads, 0) AS downloads
+  FROM packages
+  CROSS JOIN generate_series(0, :months - 1) AS months_ago
+  LEFT OUTER JOIN download
+    ON download.package_id = packages.package_id
+    AND download.month
+      = CAST(:reference_month AS timestamp) - make_interval(months => months_ago)
+),
+windows AS (
+  SELECT
+    package_id,
+    months_ago,
+    downloads,
+    avg(downloads) OVER latest AS rolling_mean,
+    avg(downloads) OVER history AS history_mean,
+    stddev_pop(downloads) OVER history AS history_std
+  FROM series
+  WINDOW
+    latest AS (
+      PARTITION BY package_id ORDER BY months_ago DESC
+      ROWS :rolling_mean_months - 1 PRECEDING
+    ),
+    history AS (
+      PARTITION BY package_id ORDER BY months_ago DESC
+      ROWS BETWEEN :trend_months PRECEDING AND 1 PRECEDING
+    )
+)
+SELECT
+  package_id,
+  sum(downloads * power(0.5, months_ago / CAST(:half_life AS double precision)))
+    AS decayed_downloads,
+  max(rolling_mean) FILTER (WHERE months_ago = 0) AS rolling_mean,
+  coalesce(
+    regr_slope(downloads, -months_ago) FILTER (WHERE months_ago < :trend_months),
+    0
+  ) AS slope,
+  coalesce(
+    max((downloads - history_mean) / nullif(history_std, 0))
+      FILTER (WHERE months_ago = 0),
+    0
+  ) AS zscore
+FROM windows
+GROUP BY package_id
+ORDER BY package_id
+"""
+
+
+@click.command()
+@click.option("--months", type=click.IntRange(min=2), default=60)
+def main(months: int):
+    load_dotenv()  # pyright: ignore[reportUnusedCallResult]
+
+    with engine("importer").connect() as connection:
+        reference_month = get_reference_month(connection)
+        if reference_month is None:
+            raise click.ClickException("no downloads imported")
+
+        start_time = time.perf_counter()
+        matrix = load_download_matrix(connection, reference_month, months)
+        loaded_time = time.perf_counter()
+        features = compute_score_features(matrix)
+        numpy_time = time.perf_counter()
+        print(
+            f"numpy: {numpy_time - start_time:.2f} s for {len(matrix.package_ids)}"
+            f" packages × {months} months ({loaded_time - start_time:.2f} s COPY,"
+            f" {numpy_time - loaded_time:.2f} s compute)"
+        )
+
+        start_time = time.perf_counter()
+        rows = connection.execute(
+            text(SCORE_FEATURES_SQL),
+            {
+                "reference_month": reference_month,
+                "months": months,
+                "half_life": SCORE_DOWNLOADS_HALF_LIFE_MONTHS,
+                "rolling_mean_months": ROLLING_MEAN_MONTHS,
+                "trend_months": TREND_MONTHS,
+            },
+        ).all()
+        sql_time = time.perf_counter()
+        print(f"sql window functions: {sql_time - start_time:.2f} s")
+
+    expected = np.array(rows, dtype=np.float64)
+    np.testing.assert_array_equal(expected[:, 0], features.package_ids)
+    for index, values in enumerate(features[1:], start=1):
+        np.testing.assert_allclose(values, expected[:, index], rtol=1e-9, atol=1e-6)
+    print("results match")
+
+
+if __name__ == "__main__":
+    main()
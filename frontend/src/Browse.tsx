@@ -1,12 +1,26 @@
 import { Button, Spinner, TextInput, Toast } from "flowbite-react";
-import { useState, useCallback, Suspense } from "react";
+import { useState, useCallback, useRef, Suspense, ChangeEvent } from "react";
 import { SubmitHandler, useForm } from "react-hook-form";
 import { FaMagnifyingGlass } from "react-icons/fa6";
 import PackageList from "./PackageList";
 
 const fetchPackages = async (searchTerm: string) => {
   const response = await fetch(
-    `${import.meta.env.VITE_API_URL}/packages?q=${searchTerm}`,
+    `${import.meta.env.VITE_API_URL}/packages?cursor=&q=${searchTerm}`,
+  );
+  return response.json();
+};
+
+const fetchSuggestions = async (
+  searchTerm: string,
+  signal: AbortSignal,
+): Promise<string[]> => {
+  if (searchTerm === "") {
+    return [];
+  }
+  const response = await fetch(
+    `${import.meta.env.VITE_API_URL}/suggest?q=${encodeURIComponent(searchTerm)}`,
+    { signal },
   );
   return response.json();
 };
@@ -18,6 +32,34 @@ type SearchInputs = {
 export default function Browse() {
   const { register, handleSubmit } = useForm<SearchInputs>();
   const [searchTerm, setSearchTerm] = useState<string>("");
+  const [suggestions, setSuggestions] = useState<string[]>([]);
+  const suggestionsRequest = useRef<AbortController | null>(null);
+  const { onChange, ...searchTermProps } = register("searchTerm");
+
+  const onSearchTermChange = useCallback(
+    async (event: ChangeEvent<HTMLInputElement>) => {
+      await onChange(event);
+      // responses may arrive out of order, so only the latest request may
+      // set the suggestions
+      suggestionsRequest.current?.abort();
+      const controller = new AbortController();
+      suggestionsRequest.current = controller;
+      try {
+        const suggestions = await fetchSuggestions(
+          event.target.value,
+          controller.signal,
+        );
+        if (!controller.signal.aborted) {
+          setSuggestions(suggestions);
+        }
+      } catch (error) {
+        if (!controller.signal.aborted) {
+          throw error;
+        }
+      }
+    },
+    [onChange],
+  );
 
   const onSearch: SubmitHandler<SearchInputs> = useCallback(
     async (data: SearchInputs) => {
@@ -34,8 +76,16 @@ export default function Browse() {
             icon={FaMagnifyingGlass}
             placeholder="Enter a search term"
             className="grow"
-            {...register("searchTerm")}
+            list="suggestions"
+            autoComplete="off"
+            onChange={onSearchTermChange}
+            {...searchTermProps}
           />
+          <datalist id="suggestions">
+            {suggestions.map((name) => (
+              <option key={name} value={name} />
+            ))}
+          </datalist>
 
           <Button type="submit">Search</Button>
         </form>
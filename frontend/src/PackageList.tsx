@@ -1,11 +1,11 @@
 import { use } from "react";
-import { Package } from "./types";
+import { Package, PackagePage } from "./types";
 type Props = {
-  packagesPromise: Promise<Package[]>;
+  packagesPromise: Promise<PackagePage>;
 };
 
 export default function PackageList({ packagesPromise }: Props) {
-  const packages = use(packagesPromise);
+  const { packages } = use(packagesPromise);
 
   return (
     <ul>
@@ -3,3 +3,20 @@ export type Package = {
   name: string;
   downloads_total: number;
 };
+
+export type FacetCount = {
+  value: string;
+  count: number;
+};
+
+export type Facets = {
+  classifiers: FacetCount[];
+  licenses: FacetCount[];
+  requires_python: FacetCount[];
+};
+
+export type PackagePage = {
+  packages: Package[];
+  next_cursor: string | null;
+  facets: Facets | null;
+};
@@ -0,0 +1,128 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Protocol
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> bytes | None: ...
+
+    def set(self, key: str, value: bytes) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+class MemoryBackend:
+    """An LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResponseCache:
+    """Caches serialized responses per data generation.
+
+    Keys include the generation, so entries cached before an import are never
+    served after it, even by a backend shared between processes. The
+    generation itself is read from the database at most once every
+    `generation_check_interval` seconds.
+    """
+
+    def __init__(self, backend: CacheBackend, generation_check_interval: float = 1.0):
+        self.backend = backend
+        self.generation_check_interval = generation_check_interval
+        self.hits = 0
+        self.misses = 0
+        self._generation: int | None = None
+        self._generation_checked_at = 0.0
+
+    async def generation(self, load: Callable[[], Awaitable[int]]) -> int:
+        now = time.monotonic()
+        if (
+            self._generation is None
+            or now - self._generation_checked_at >= self.generation_check_interval
+        ):
+            self._generation = await load()
+            self._generation_checked_at = now
+
+        return self._generation
+
+    def key(self, generation: int, *params: str | int | list[str] | None) -> str:
+        return json.dumps([generation, *params])
+
+    def get(self, key: str) -> bytes | None:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def set(self, key: str, value: bytes):
+        self.backend.set(key, value)
+
+    def stats(self) -> dict[str, int | float | None]:
+        requests = self.hits + self.misses
+
+        return {
+            "generation": self._generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else None,
+        }
+
+
+_response_cache: ResponseCache | None = None
+
+
+def response_cache() -> ResponseCache:
+    global _response_cache
+
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            MemoryBackend(
+                max_entries=int(os.environ.get("API_CACHE_MAX_ENTRIES", "1024")),
+                ttl=float(os.environ.get("API_CACHE_TTL", "60")),
+            ),
+            generation_check_interval=float(
+                os.environ.get("API_CACHE_GENERATION_CHECK_INTERVAL", "1")
+            ),
+        )
+
+    return _response_cache
+
+
+def reset_response_cache():
+    global _response_cache
+
+    _response_cache = None
@@ -0,0 +1,270 @@
+import asyncio
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Hashable, Iterable
+from typing import Literal, TypeVar
+
+from pyroaring import BitMap, FrozenBitMap
+from sqlmodel import case, col, func, literal, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from petshop.models import (
+    Classifier,
+    ClassifierPackageLink,
+    FacetCount,
+    Facets,
+    Package,
+)
+
+K = TypeVar("K", bound=Hashable)
+
+PackageKind = Literal["app", "library"]
+
+SEPARATOR = " :: "
+# values per facet in a response
+FACET_LIMIT = 20
+# the license field often holds the whole license text, which is no bucket
+MAX_LICENSE_LENGTH = 64
+# only the most common licenses are counted, there are thousands of spellings
+LICENSE_BUCKETS = 200
+
+# licenses that are short enough to be a name, like "MIT" or "Apache-2.0"
+LICENSE_BUCKET = func.nullif(
+    func.btrim(
+        func.coalesce(
+            col(Package.license_expression),
+            case(
+                (
+                    func.length(col(Package.license)) <= MAX_LICENSE_LENGTH,
+                    col(Package.license),
+                )
+            ),
+        ),
+        " \t\r\n",
+    ),
+    "",
+)
+# the lowest Python version required, like ">=3.9" for ">=3.9, <4"
+REQUIRES_PYTHON_BUCKET = literal(">=").concat(
+    func.substring(col(Package.requires_python), r">=\s*([0-9]+(\.[0-9]+)?)")
+)
+# flags of petshop.importer.enrich_packages, read from their partial indexes
+FLAG_COLUMNS = {
+    "prerelease": col(Package.is_prerelease),
+    "abandoned": col(Package.is_abandoned),
+    "app": col(Package.is_app),
+    "library": col(Package.is_library),
+}
+
+
+class ClassifierIndex:
+    """Package ids per classifier, as roaring bitmaps.
+
+    Filters combine bitmaps with bitwise operations instead of joining
+    classifierpackagelink once per filter. A filter on a classifier also
+    matches the classifiers below it, so "Topic :: Internet" includes
+    "Topic :: Internet :: WWW/HTTP"; classifiers are kept sorted, which
+    makes those a contiguous range.
+
+    The development status is not read from the classifiers, but per level
+    from package.dev_status, like the flags.
+    """
+
+    def __init__(
+        self,
+        links: Iterable[tuple[str, int]],
+        package_ids: Iterable[int] = (),
+        generation: int = 0,
+        licenses: Iterable[tuple[str, int]] = (),
+        requires_python: Iterable[tuple[str, int]] = (),
+        flags: Iterable[tuple[str, int]] = (),
+        dev_status: Iterable[tuple[int, int]] = (),
+    ):
+        self.generation = generation
+        package_ids_by_classifier = bitmaps(links)
+        self.classifiers = sorted(package_ids_by_classifier)
+        self.package_ids = [
+            package_ids_by_classifier[classifier] for classifier in self.classifiers
+        ]
+        self.all = FrozenBitMap(package_ids).union(*self.package_ids)
+        self.licenses = dict(
+            heapq.nlargest(
+                LICENSE_BUCKETS,
+                bitmaps(licenses).items(),
+                key=lambda item: len(item[1]),
+            )
+        )
+        self.requires_python = bitmaps(requires_python)
+        self.flags = bitmaps(flags)
+        self.dev_status = bitmaps(dev_status)
+
+    def matching(self, classifier: str) -> FrozenBitMap:
+        """Packages with the classifier, or any classifier below it."""
+        lo = bisect_left(self.classifiers, classifier)
+        hi = lo
+        while hi < len(self.classifiers) and (
+            self.classifiers[hi] == classifier
+            or self.classifiers[hi].startswith(classifier + SEPARATOR)
+        ):
+            hi += 1
+
+        return FrozenBitMap().union(*self.package_ids[lo:hi])
+
+    def dev_status_at_least(self, level: int) -> FrozenBitMap:
+        return FrozenBitMap().union(
+            *(
+                package_ids
+                for status, package_ids in self.dev_status.items()
+                if status >= level
+            )
+        )
+
+    def flagged(self, flag: str) -> FrozenBitMap:
+        return self.flags.get(flag, FrozenBitMap())
+
+    def filter(
+        self,
+        dev_status: int | None = None,
+        topics: list[str] = [],
+        classifiers: list[str] = [],
+        exclude: list[str] = [],
+        prerelease: bool | None = None,
+        abandoned: bool | None = None,
+        kind: PackageKind | None = None,
+    ) -> FrozenBitMap | None:
+        """The packages passing all filters, or None without any filter.
+
+        Packages need at least the given development status, any of the
+        topics and all of the classifiers, and none of the excluded
+        classifiers. The flags keep only the packages they hold for if true,
+        and only the others if false.
+        """
+        if (
+            dev_status is None
+            and not (topics or classifiers or exclude)
+            and prerelease is None
+            and abandoned is None
+            and kind is None
+        ):
+            return None
+
+        package_ids = self.all
+        if dev_status is not None:
+            package_ids &= self.dev_status_at_least(dev_status)
+        if topics:
+            package_ids &= FrozenBitMap().union(
+                *(self.matching(f"Topic{SEPARATOR}{topic}") for topic in topics)
+            )
+        for classifier in classifiers:
+            package_ids &= self.matching(classifier)
+        for classifier in exclude:
+            package_ids -= self.matching(classifier)
+        for flag, value in [("prerelease", prerelease), ("abandoned", abandoned)]:
+            if value is True:
+                package_ids &= self.flagged(flag)
+            elif value is False:
+                package_ids -= self.flagged(flag)
+        if kind is not None:
+            package_ids &= self.flagged(kind)
+
+        return package_ids
+
+    def facets(self, package_ids: FrozenBitMap, limit: int = FACET_LIMIT) -> Facets:
+        """The most common classifiers, licenses and requires_python buckets
+        among the packages, by intersecting bitmaps."""
+        return Facets(
+            classifiers=top_counts(
+                zip(self.classifiers, self.package_ids), package_ids, limit
+            ),
+            licenses=top_counts(self.licenses.items(), package_ids, limit),
+            requires_python=top_counts(
+                self.requires_python.items(), package_ids, limit
+            ),
+        )
+
+
+def bitmaps(links: Iterable[tuple[K, int]]) -> dict[K, FrozenBitMap]:
+    package_ids: dict[K, BitMap] = defaultdict(BitMap)
+    for value, package_id in links:
+        package_ids[value].add(package_id)
+
+    return {value: FrozenBitMap(ids) for value, ids in package_ids.items()}
+
+
+def top_counts(
+    buckets: Iterable[tuple[str, FrozenBitMap]], package_ids: FrozenBitMap, limit: int
+) -> list[FacetCount]:
+    counts = (
+        (value, package_ids.intersection_cardinality(ids)) for value, ids in buckets
+    )
+    top = heapq.nsmallest(
+        limit,
+        ((value, count) for value, count in counts if count > 0),
+        key=lambda item: (-item[1], item[0]),
+    )
+
+    return [FacetCount(value=value, count=count) for value, count in top]
+
+
+async def load_classifier_index(
+    session: AsyncSession, generation: int
+) -> ClassifierIndex:
+    links = (
+        await session.exec(
+            select(col(Classifier.name), col(ClassifierPackageLink.package_id)).join(
+                ClassifierPackageLink,
+                col(ClassifierPackageLink.classifier_id) == col(Classifier.id),
+            )
+        )
+    ).all()
+    package_ids = (await session.exec(select(col(Package.id)))).all()
+    licenses = (
+        await session.exec(
+            select(LICENSE_BUCKET, col(Package.id)).where(LICENSE_BUCKET.is_not(None))
+        )
+    ).all()
+    requires_python = (
+        await session.exec(
+            select(REQUIRES_PYTHON_BUCKET, col(Package.id)).where(
+                REQUIRES_PYTHON_BUCKET.is_not(None)
+            )
+        )
+    ).all()
+
+    flags: list[tuple[str, int]] = []
+    for flag, column in FLAG_COLUMNS.items():
+        flag_ids = (await session.exec(select(col(Package.id)).where(column))).all()
+        flags.extend((flag, package_id) for package_id in flag_ids)
+    # served by the (dev_status, id) index
+    dev_status = (
+        await session.exec(
+            select(col(Package.dev_status), col(Package.id)).where(
+                col(Package.dev_status).is_not(None)
+            )
+        )
+    ).all()
+
+    return await asyncio.to_thread(
+        ClassifierIndex,
+        [(name, package_id) for name, package_id in links],
+        package_ids,
+        generation,
+        [(license, package_id) for license, package_id in licenses],
+        [(bucket, package_id) for bucket, package_id in requires_python],
+        flags,
+        [(status, package_id) for status, package_id in dev_status],
+    )
+
+
+_classifier_index = ClassifierIndex([])
+
+
+def classifier_index() -> ClassifierIndex:
+    return _classifier_index
+
+
+def set_classifier_index(index: ClassifierIndex):
+    global _classifier_index
+
+    _classifier_index = index
@@ -1,66 +1,528 @@
+import asyncio
+import base64
+import json
 import logging
-from collections.abc import AsyncGenerator, Generator
+import math
+import os
+from collections.abc import AsyncGenerator, Iterable, Sequence
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Any, Literal
 
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from sqlmodel import Session, col, desc, func, select
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import TypeAdapter
+from pyroaring import FrozenBitMap
+from sqlalchemy import ARRAY, Integer, Row, any_, literal
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import col, desc, func, select, text, tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from petshop.db import engine
-from petshop.models import Download, Package, PackagePublic
+from petshop.api.cache import ResponseCache, reset_response_cache, response_cache
+from petshop.api.classifiers import (
+    ClassifierIndex,
+    PackageKind,
+    classifier_index,
+    load_classifier_index,
+    set_classifier_index,
+)
+from petshop.api.responses import (
+    COMPRESSION_MINIMUM_SIZE,
+    ImmutableStaticFiles,
+    accepted_encoding,
+    compress,
+    generation_etag,
+    is_not_modified,
+)
+from petshop.api.search import search_condition, search_rank
+from petshop.api.suggest import (
+    MAX_SUGGESTIONS,
+    SuggestionIndex,
+    load_suggestion_index,
+    set_suggestion_index,
+    suggestion_index,
+)
+from petshop.db import async_engine, dispose_async_engines
+from petshop.models import (
+    DataGeneration,
+    DownloadsTotal,
+    Facets,
+    Package,
+    PackageListItem,
+    PackagePage,
+    PackagePublic,
+    PackageScore,
+    normalize_name,
+)
 
 FRONTEND_ROOT = Path(__file__).parent.parent.parent.resolve().joinpath("frontend/dist")
 RESULTS_PER_PAGE = 25
+# filters keeping at most this many packages look them up by id, others are
+# applied while scanning the ranking in chunks of at most MAX_SCAN_CHUNK_SIZE,
+# and at most MAX_SCANNED_ROWS per request
+FILTER_LOOKUP_LIMIT = 2000
+MAX_SCAN_CHUNK_SIZE = 10000
+MAX_SCANNED_ROWS = 100000
+# facets are left out of searches matching more packages, or taking longer
+MAX_FACET_RESULTS = 100000
+FACETS_TIMEOUT = 0.2
+# the body of pages requested without a cursor, as before paging by cursor
+PACKAGE_LIST = TypeAdapter(list[PackageListItem])
 
 logger = logging.getLogger(__name__)
 
 
+async def refresh_suggestion_index(force: bool = False):
+    async with AsyncSession(async_engine("api")) as session:
+        generation = await data_generation(session)
+        if force or generation != suggestion_index().generation:
+            logger.info(f"loading suggestion index for generation {generation}")
+            set_suggestion_index(await load_suggestion_index(session, generation))
+
+
+async def refresh_classifier_index(force: bool = False):
+    async with AsyncSession(async_engine("api")) as session:
+        generation = await data_generation(session)
+        if force or generation != classifier_index().generation:
+            logger.info(f"loading classifier index for generation {generation}")
+            set_classifier_index(await load_classifier_index(session, generation))
+
+
+async def refresh_suggestion_index_periodically(interval: float):
+    # swaps in new indexes once an import has bumped the data generation
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_suggestion_index()
+        except Exception:
+            logger.exception("failed to refresh suggestion index")
+        try:
+            await refresh_classifier_index()
+        except Exception:
+            logger.exception("failed to refresh classifier index")
+
+
 @asynccontextmanager
 async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
     load_dotenv()  # pyright: ignore[reportUnusedCallResult]
+    await refresh_suggestion_index(force=True)
+    await refresh_classifier_index(force=True)
+    refresher = asyncio.create_task(
+        refresh_suggestion_index_periodically(
+            float(os.environ.get("API_SUGGEST_REFRESH_INTERVAL", "60"))
+        )
+    )
     yield
+    refresher.cancel()
+    await dispose_async_engines()
+    reset_response_cache()
+    set_suggestion_index(SuggestionIndex([]))
+    set_classifier_index(ClassifierIndex([]))
 
 
-def session() -> Generator[Session, None]:
-    with Session(engine()) as session:
+async def session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine("api")) as session:
         yield session
 
 
 app = FastAPI(lifespan=lifespan)
 api = FastAPI()
 app.mount("/api", api)
-app.mount("/", StaticFiles(directory=FRONTEND_ROOT, html=True), name="frontend")
+app.mount(
+    "/",
+    ImmutableStaticFiles(directory=FRONTEND_ROOT, html=True, check_dir=False),
+    name="frontend",
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins="*",
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# responses that are already compressed, like cached API responses, pass
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+
+Sort = Literal["relevance", "downloads", "popularity", "trending"]
+# the score columns by sort mode, each served by a (score DESC, package_id
+# DESC) index of its view
+SORT_COLUMNS = {
+    "downloads": DownloadsTotal.downloads_total,
+    "popularity": PackageScore.popularity,
+    "trending": PackageScore.growth,
+}
+
+
+def resolve_sort(q: str, sort: Sort | None) -> Sort:
+    # search results are ranked by relevance unless sorted otherwise, and
+    # without a search term there is no relevance to rank by
+    if sort is None or (sort == "relevance" and not q):
+        return "relevance" if q else "downloads"
+
+    return sort
+
+
+def encode_cursor(sort: Sort, sort_key: float, package_id: int) -> str:
+    payload = json.dumps([sort, sort_key, package_id]).encode()
+
+    return base64.urlsafe_b64encode(payload).decode()
 
 
-@api.get("/packages", response_model=list[PackagePublic])
-def read_packages(
-    session: Annotated[Session, Depends(session)],
+def decode_cursor(cursor: str, sort: Sort) -> tuple[float, int]:
+    """The position of the cursor, which has to be of the same sort mode, as
+    the sort keys of different modes are not comparable."""
+    try:
+        cursor_sort, sort_key, package_id = json.loads(base64.urlsafe_b64decode(cursor))
+        if not isinstance(sort_key, (int, float)) or not isinstance(package_id, int):
+            raise ValueError(cursor)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(
+            status_code=400, detail=f"cursor of sort {cursor_sort}, not {sort}"
+        )
+
+    return sort_key, package_id
+
+
+def packages_statement(
     q: str = "",
+    cursor: str | None = None,
     page: int = 0,
+    sort: Sort | None = None,
+    package_ids: Iterable[int] | None = None,
+    limit: int = RESULTS_PER_PAGE + 1,
 ):
+    sort = resolve_sort(q, sort)
+    sort_key = search_rank(q) if sort == "relevance" else col(SORT_COLUMNS[sort])
+    # break ties by the package id of the view of the sort key, so that
+    # Postgres walks that index without sorting
+    package_id = col(
+        PackageScore.package_id
+        if sort in ("popularity", "trending")
+        else DownloadsTotal.package_id
+    )
+    # only the columns of PackageListItem, leaving descriptions and arrays
     statement = (
-        select(Package, func.sum(col(Download.downloads)).label("downloads_total"))
-        .join(Download)
-        .group_by(col(Package.id))
-        .order_by(desc("downloads_total"))
+        select(
+            col(Package.id),
+            col(Package.name),
+            col(DownloadsTotal.downloads_total),
+            sort_key.label("sort_key"),
+        )
+        .join(DownloadsTotal, col(DownloadsTotal.package_id) == col(Package.id))
+        .order_by(desc(sort_key), desc(package_id))
     )
+    if sort in ("popularity", "trending"):
+        statement = statement.join(
+            PackageScore, col(PackageScore.package_id) == col(Package.id)
+        )
     if q:
         logger.info(f"search term: %{q}")
-        statement = statement.where(col(Package.name).like(f"{q}%"))
-    statement = statement.limit(RESULTS_PER_PAGE).offset(page * RESULTS_PER_PAGE)
-    result = session.exec(statement)
-
-    return [
-        {"downloads_total": downloads_total, **package.model_dump()}
-        for package, downloads_total in result
-    ]
+        statement = statement.where(search_condition(q))
+    if package_ids is not None:
+        statement = statement.where(
+            col(Package.id) == any_(literal(list(package_ids), ARRAY(Integer)))
+        )
+
+    # fetch one extra row to find out whether there is a next page
+    statement = statement.limit(limit)
+    if cursor:
+        # seek past the last row of the previous page
+        statement = statement.where(
+            tuple_(sort_key, package_id) < tuple_(*decode_cursor(cursor, sort))
+        )
+    else:
+        statement = statement.offset(page * RESULTS_PER_PAGE)
+
+    return statement
+
+
+async def data_generation(session: AsyncSession) -> int:
+    generation = (await session.exec(select(DataGeneration.generation))).first()
+
+    return generation or 0
+
+
+def to_page(rows: Sequence[Row[Any]], sort: Sort) -> PackagePage:
+    next_cursor = None
+    if len(rows) > RESULTS_PER_PAGE:
+        rows = rows[:RESULTS_PER_PAGE]
+        next_cursor = encode_cursor(sort, rows[-1].sort_key, rows[-1].id)
+
+    return PackagePage(
+        packages=[PackageListItem.model_validate(row._mapping) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+async def packages_page(
+    session: AsyncSession, q: str, cursor: str | None, page: int, sort: Sort | None
+) -> PackagePage:
+    return to_page(
+        (await session.exec(packages_statement(q, cursor, page, sort))).all(),
+        resolve_sort(q, sort),
+    )
+
+
+async def filtered_packages_page(
+    session: AsyncSession,
+    q: str,
+    cursor: str | None,
+    page: int,
+    sort: Sort | None,
+    package_ids: FrozenBitMap,
+    share: float,
+) -> PackagePage:
+    """Like packages_page(), but only with the given packages.
+
+    Few packages are passed to Postgres to look up. Otherwise the ranking
+    is scanned in chunks, keeping the rows of the given packages, with
+    chunks sized by the `share` of packages the filter keeps so that a
+    single chunk usually suffices.
+
+    The scan stops after MAX_SCANNED_ROWS, with the packages found so far
+    and a cursor continuing the scan, so a page of a rare filter may come
+    short of RESULTS_PER_PAGE or even empty.
+    """
+    sort = resolve_sort(q, sort)
+    if len(package_ids) <= FILTER_LOOKUP_LIMIT:
+        statement = packages_statement(q, cursor, page, sort, package_ids)
+        return to_page((await session.exec(statement)).all(), sort)
+
+    # paging by number skips the rows of the previous pages here
+    skip = 0 if cursor else page * RESULTS_PER_PAGE
+    wanted = skip + RESULTS_PER_PAGE + 1
+    chunk_size = min(math.ceil(2 * wanted / max(share, 1e-6)), MAX_SCAN_CHUNK_SIZE)
+
+    rows: list[Row[Any]] = []
+    scanned_rows = 0
+    while True:
+        statement = packages_statement(q, cursor, sort=sort, limit=chunk_size)
+        chunk = (await session.exec(statement)).all()
+        scanned_rows += len(chunk)
+        rows.extend(row for row in chunk if row.id in package_ids)
+        if len(rows) >= wanted or len(chunk) < chunk_size:
+            break
+        cursor = encode_cursor(sort, chunk[-1].sort_key, chunk[-1].id)
+        if scanned_rows >= MAX_SCANNED_ROWS:
+            # fewer than a page, continued after the last scanned row
+            package_page = to_page(rows[skip:], sort)
+            package_page.next_cursor = cursor
+            return package_page
+        chunk_size = min(
+            2 * chunk_size, MAX_SCAN_CHUNK_SIZE, MAX_SCANNED_ROWS - scanned_rows
+        )
+
+    return to_page(rows[skip:wanted], sort)
+
+
+async def search_package_ids(q: str) -> FrozenBitMap | None:
+    """The ids of all packages matching the search term, or None if there
+    are more than MAX_FACET_RESULTS."""
+    # a session of its own, so that the search runs alongside the page query
+    async with AsyncSession(async_engine("api")) as session:
+        await session.exec(  # pyright: ignore[reportCallIssue]
+            text(f"SET LOCAL statement_timeout = {int(FACETS_TIMEOUT * 1000)}")
+        )
+        package_ids = (
+            await session.exec(
+                select(col(Package.id))
+                .where(search_condition(q))
+                .limit(MAX_FACET_RESULTS + 1)
+            )
+        ).all()
+
+    if len(package_ids) > MAX_FACET_RESULTS:
+        return None
+
+    return FrozenBitMap(package_ids)
+
+
+async def package_facets(
+    index: ClassifierIndex, q: str, package_ids: FrozenBitMap | None
+) -> Facets | None:
+    """Count the matching packages per classifier, license and
+    requires_python bucket."""
+    if package_ids is None:
+        package_ids = index.all
+    if q:
+        search_ids = await search_package_ids(q)
+        if search_ids is None:
+            return None
+        package_ids &= search_ids
+
+    return await asyncio.to_thread(index.facets, package_ids)
+
+
+async def facets_until(
+    facets: asyncio.Task[Facets | None], deadline: float
+) -> tuple[Facets | None, bool]:
+    """The facets, and whether they were dropped for taking too long, unlike
+    facets left out of searches matching too many packages."""
+    try:
+        async with asyncio.timeout_at(deadline):
+            return await facets, False
+    except TimeoutError:
+        logger.warning("facets timed out")
+    except DBAPIError:
+        # the statement timeout of the search
+        logger.warning("facets failed", exc_info=True)
+
+    return None, True
+
+
+@api.get("/packages", response_model=PackagePage | list[PackageListItem])
+async def read_packages(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(session)],
+    cache: Annotated[ResponseCache, Depends(response_cache)],
+    index: Annotated[ClassifierIndex, Depends(classifier_index)],
+    q: str = "",
+    page: int = 0,
+    cursor: str | None = None,
+    sort: Sort | None = None,
+    dev_status: Annotated[int | None, Query(ge=1, le=7)] = None,
+    topic: Annotated[list[str], Query()] = [],
+    classifier: Annotated[list[str], Query()] = [],
+    exclude: Annotated[list[str], Query()] = [],
+    prerelease: bool | None = None,
+    abandoned: bool | None = None,
+    kind: PackageKind | None = None,
+):
+    """List packages, optionally searched, sorted and filtered by classifiers.
+
+    Filters keep packages with at least the development status, any of the
+    topics (without the "Topic :: " prefix), all of the classifiers and none
+    of the excluded ones. Each also matches the classifiers below it.
+    `prerelease` and `abandoned` keep only the packages flagged so if true,
+    and only the others if false, `kind` only apps or libraries.
+
+    Pages requested by `page` number are a list of packages. Passing a
+    `cursor`, empty for the first page, returns a PackagePage instead, with
+    the cursor of the next page.
+
+    The first PackagePage counts the results per classifier, license and
+    requires_python bucket in `facets`. They are counted alongside the page
+    and left out if they are not done FACETS_TIMEOUT seconds after it
+    started, in which case the page is not cached.
+    """
+    generation = await cache.generation(lambda: data_generation(session))
+    # results only change with imports, so clients may revalidate them cheaply
+    headers = {
+        "ETag": generation_etag(generation),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if is_not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    encoding = accepted_encoding(request)
+    # the page number is ignored when paging by cursor
+    paged_by_cursor = cursor is not None
+    if paged_by_cursor:
+        page = 0
+    key = cache.key(
+        generation,
+        "packages",
+        q,
+        sort,
+        dev_status,
+        topic,
+        classifier,
+        exclude,
+        prerelease,
+        abandoned,
+        kind,
+        cursor,
+        page,
+        encoding,
+    )
+
+    content = cache.get(key)
+    if content is None:
+        package_ids = index.filter(
+            dev_status, topic, classifier, exclude, prerelease, abandoned, kind
+        )
+        facets = None
+        facets_dropped = False
+        if paged_by_cursor and not cursor:
+            deadline = asyncio.get_running_loop().time() + FACETS_TIMEOUT
+            facets = asyncio.create_task(package_facets(index, q, package_ids))
+
+        try:
+            if package_ids is None:
+                package_page = await packages_page(session, q, cursor, page, sort)
+            else:
+                package_page = await filtered_packages_page(
+                    session,
+                    q,
+                    cursor,
+                    page,
+                    sort,
+                    package_ids,
+                    len(package_ids) / max(len(index.all), 1),
+                )
+            if facets is not None:
+                package_page.facets, facets_dropped = await facets_until(
+                    facets, deadline
+                )
+        finally:
+            if facets is not None:
+                facets.cancel()
+        if paged_by_cursor:
+            content = package_page.model_dump_json().encode()
+        else:
+            content = PACKAGE_LIST.dump_json(package_page.packages)
+        # compressing once per cache entry is cheap enough to skip the
+        # minimum size the middleware applies
+        if encoding is not None:
+            content = compress(content, encoding)
+        if facets_dropped:
+            # neither cached nor revalidated, so the next request counts the
+            # facets again
+            del headers["ETag"]
+            headers["Cache-Control"] = "no-store"
+        else:
+            cache.set(key, content)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    return Response(content, media_type="application/json", headers=headers)
+
+
+@api.get("/packages/{name}", response_model=PackagePublic)
+async def read_package(session: Annotated[AsyncSession, Depends(session)], name: str):
+    # packages imported since the last refresh of the view have no total yet
+    row = (
+        await session.exec(
+            select(Package, func.coalesce(DownloadsTotal.downloads_total, 0))
+            .outerjoin(
+                DownloadsTotal, col(DownloadsTotal.package_id) == col(Package.id)
+            )
+            .where(col(Package.normalized_name) == normalize_name(name))
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="package not found")
+
+    package, downloads_total = row
+
+    return {"downloads_total": downloads_total, **package.model_dump()}
+
+
+@api.get("/suggest", response_model=list[str])
+async def read_suggestions(
+    index: Annotated[SuggestionIndex, Depends(suggestion_index)],
+    q: str,
+    limit: Annotated[int, Query(ge=1, le=MAX_SUGGESTIONS)] = MAX_SUGGESTIONS,
+):
+    return index.suggest(q, limit)
+
+
+@api.get("/cache")
+async def read_cache_stats(cache: Annotated[ResponseCache, Depends(response_cache)]):
+    return cache.stats()
@@ -0,0 +1,97 @@
+import gzip
+import os
+from pathlib import Path
+
+import brotli
+from fastapi import Request, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Scope
+
+# responses smaller than this are not worth the compression overhead
+COMPRESSION_MINIMUM_SIZE = 1000
+# in order of preference among equally accepted encodings
+ENCODINGS = ["br", "gzip"]
+
+
+def generation_etag(generation: int) -> str:
+    # weak, because compressed and uncompressed bodies share the tag
+    return f'W/"{generation}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def encoding_qualities(accept_encoding: str) -> dict[str, float]:
+    """The quality of each coding in an Accept-Encoding header, e.g.
+    {"gzip": 1.0, "br": 0.0} for "gzip, br;q=0"."""
+    qualities: dict[str, float] = {}
+    for element in accept_encoding.split(","):
+        coding, *parameters = [part.strip() for part in element.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    return qualities
+
+
+def accepted_encoding(request: Request) -> str | None:
+    """The best of ENCODINGS the client accepts, or None for identity."""
+    qualities = encoding_qualities(request.headers.get("accept-encoding", ""))
+    # "*" stands for all codings not listed
+    default_quality = qualities.get("*", 0.0)
+
+    best_encoding, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, default_quality)
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+
+    return best_encoding
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content)
+
+    return gzip.compress(content, compresslevel=6)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Serves the frontend build with caching headers.
+
+    Vite puts a content hash into the names of the files in `assets/`, so
+    browsers may keep them forever. Everything else, most importantly
+    `index.html`, which refers to the current assets, is revalidated.
+    """
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike[str],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+
+        relative_path = Path(full_path).relative_to(Path(str(self.directory)).resolve())
+        if relative_path.parts[0] == "assets":
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+
+        return response
@@ -0,0 +1,51 @@
+from sqlalchemy import ColumnElement
+from sqlmodel import Float, case, cast, col, func, literal_column, or_
+
+from petshop.models import DownloadsTotal, Package, normalize_name
+
+
+def escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def text_query(q: str) -> ColumnElement[str]:
+    # package names are indexed without stemming, summaries and keywords with
+    # english stemming, so match the search term against both
+    return func.websearch_to_tsquery(literal_column("'simple'::regconfig"), q).op("||")(
+        func.websearch_to_tsquery(literal_column("'english'::regconfig"), q)
+    )
+
+
+def search_condition(q: str) -> ColumnElement[bool]:
+    """Match packages by full text, by normalized or infix name, or by fuzzy
+    name similarity.
+
+    Each branch is backed by a GIN index, so Postgres combines them with a
+    BitmapOr instead of scanning the package table.
+    """
+    return or_(
+        col(Package.normalized_name) == normalize_name(q),
+        col(Package.search_vector).op("@@")(text_query(q)),
+        col(Package.name).ilike(f"%{escape_like(q)}%", escape="\\"),
+        col(Package.name).op("%")(q),
+    )
+
+
+def search_rank(q: str) -> ColumnElement[float]:
+    """Blend text relevance with popularity.
+
+    Relevance is the sum of the full-text rank, the trigram similarity of the
+    name and a bonus for an exact name match. It is scaled by the logarithm of
+    the download count, so a popular package wins among similarly relevant
+    matches, but cannot bury an exact match of an unknown one.
+    """
+    relevance = (
+        func.ts_rank_cd(col(Package.search_vector), text_query(q))
+        + func.similarity(col(Package.name), q)
+        + case((col(Package.normalized_name) == normalize_name(q), 1.0), else_=0.0)
+    )
+    popularity = func.log(
+        cast(col(DownloadsTotal.downloads_total) + 10, Float(precision=53))
+    )
+
+    return cast(relevance, Float(precision=53)) * popularity
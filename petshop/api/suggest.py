@@ -0,0 +1,105 @@
+import asyncio
+import heapq
+from bisect import bisect_left
+from collections.abc import Iterable
+from itertools import groupby
+
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from petshop.models import DownloadsTotal, Package, normalize_name
+
+# prefixes matching at most this many names are ranked by scanning them
+SCAN_LIMIT = 64
+MAX_SUGGESTIONS = 10
+
+
+class SuggestionIndex:
+    """Completes package names by prefix, most downloaded first.
+
+    Names are kept sorted by their normalized form, so the names matching a
+    prefix are a contiguous range found by bisection. For prefixes matching
+    more than SCAN_LIMIT names, the best MAX_SUGGESTIONS are precomputed;
+    shorter ranges are cheap enough to rank on each call.
+    """
+
+    def __init__(self, packages: Iterable[tuple[str, int]], generation: int = 0):
+        self.generation = generation
+        entries = sorted(
+            (normalize_name(name), name, downloads) for name, downloads in packages
+        )
+        self.keys = [key for key, _, _ in entries]
+        self.names = [name for _, name, _ in entries]
+        self.downloads = [downloads for _, _, downloads in entries]
+        self.top: dict[str, list[int]] = {}
+        self._build(0, len(self.keys), 0)
+
+    def _best(self, indexes: Iterable[int]) -> list[int]:
+        return heapq.nlargest(
+            MAX_SUGGESTIONS, indexes, key=lambda i: (self.downloads[i], -i)
+        )
+
+    def _build(self, lo: int, hi: int, depth: int) -> list[int]:
+        if hi - lo <= SCAN_LIMIT:
+            return self._best(range(lo, hi))
+
+        # split the range by the next character; a name equal to the prefix
+        # sorts first and has none
+        best: list[int] = []
+        start = lo
+        for char, group in groupby(
+            range(lo, hi), key=lambda i: self.keys[i][depth : depth + 1]
+        ):
+            end = start + sum(1 for _ in group)
+            if char:
+                best.extend(self._build(start, end, depth + 1))
+            else:
+                best.extend(self._best(range(start, end)))
+            start = end
+
+        best = self._best(best)
+        self.top[self.keys[lo][:depth]] = best
+
+        return best
+
+    def suggest(self, q: str, limit: int = MAX_SUGGESTIONS) -> list[str]:
+        prefix = normalize_name(q)
+        if not prefix:
+            return []
+
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\U0010ffff", lo)
+        if hi - lo > SCAN_LIMIT:
+            best = self.top[prefix]
+        else:
+            best = self._best(range(lo, hi))
+
+        return [self.names[i] for i in best[:limit]]
+
+
+async def load_suggestion_index(
+    session: AsyncSession, generation: int
+) -> SuggestionIndex:
+    rows = (
+        await session.exec(
+            select(col(Package.name), col(DownloadsTotal.downloads_total)).join(
+                DownloadsTotal, col(DownloadsTotal.package_id) == col(Package.id)
+            )
+        )
+    ).all()
+
+    # building takes a while for all of PyPI, keep serving requests meanwhile
+    return await asyncio.to_thread(SuggestionIndex, rows, generation)
+
+
+_suggestion_index = SuggestionIndex([])
+
+
+def suggestion_index() -> SuggestionIndex:
+    return _suggestion_index
+
+
+def set_suggestion_index(index: SuggestionIndex):
+    global _suggestion_index
+
+    _suggestion_index = index
@@ -1,18 +1,165 @@
+import logging
 import os
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any, TypeVar
 
+from dateutil.relativedelta import relativedelta
 from sqlalchemy import Engine
-from sqlmodel import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import create_engine, text
 
-_engine = None
+from petshop.models import ViewBase
 
+T = TypeVar("T")
 
-def engine() -> Engine:
-    global _engine
+# Defaults per workload. Every setting can be overridden from the environment,
+# either for one profile (DATABASE_API_POOL_SIZE) or for all (DATABASE_POOL_SIZE).
+ENGINE_PROFILES: dict[str, dict[str, Any]] = {
+    "default": {},
+    # many short queries: keep connections warm, check them before use and
+    # prepare the few distinct statements server-side right away
+    "api": {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_pre_ping": True,
+        "statement_timeout": 5000,
+        "prepare_threshold": 1,
+    },
+    # few long-running bulk statements, mostly one-off SQL
+    "importer": {
+        "pool_size": 2,
+        "max_overflow": 4,
+        "statement_timeout": 0,
+        "prepare_threshold": None,
+    },
+}
 
-    if not _engine:
-        _engine = create_engine(os.environ["DATABASE_URL"], echo=True)
+_engines: dict[str, Engine] = {}
+_async_engines: dict[str, AsyncEngine] = {}
 
-    return _engine
+logger = logging.getLogger(__name__)
+
+
+def parse_bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def parse_optional_int(value: str) -> int | None:
+    return None if value.lower() in ("", "none") else int(value)
+
+
+def setting(profile: str, name: str, parse: Callable[[str], T], default: T) -> T:
+    value = os.environ.get(
+        f"DATABASE_{profile.upper()}_{name.upper()}",
+        os.environ.get(f"DATABASE_{name.upper()}"),
+    )
+    if value is None:
+        return ENGINE_PROFILES[profile].get(name, default)
+
+    return parse(value)
+
+
+def engine_options(profile: str) -> dict[str, Any]:
+    statement_timeout = setting(profile, "statement_timeout", parse_optional_int, None)
+    prepare_threshold = setting(profile, "prepare_threshold", parse_optional_int, 5)
+
+    connect_args: dict[str, Any] = {"prepare_threshold": prepare_threshold}
+    if statement_timeout is not None:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+
+    return {
+        "echo": setting(profile, "echo", parse_bool, False),
+        "pool_size": setting(profile, "pool_size", int, 5),
+        "max_overflow": setting(profile, "max_overflow", int, 10),
+        "pool_pre_ping": setting(profile, "pool_pre_ping", parse_bool, False),
+        "connect_args": connect_args,
+    }
+
+
+def create_profile_engine(profile: str) -> Engine:
+    """Create an engine with a QueuePool sized and checked by the profile."""
+    logger.debug(f"creating {profile} engine")
+
+    return create_engine(os.environ["DATABASE_URL"], **engine_options(profile))
+
+
+def engine(profile: str = "default") -> Engine:
+    if profile not in _engines:
+        _engines[profile] = create_profile_engine(profile)
+
+    return _engines[profile]
+
+
+def async_engine(profile: str = "default") -> AsyncEngine:
+    """Like engine(), but for psycopg async connections.
+
+    Always uses the SQLAlchemy pool, because pooled asyncio connections belong
+    to the event loop they were opened in. Call dispose_async_engines() before
+    that loop ends.
+    """
+    if profile not in _async_engines:
+        logger.debug(f"creating {profile} async engine")
+        _async_engines[profile] = create_async_engine(
+            os.environ["DATABASE_URL"], **engine_options(profile)
+        )
+
+    return _async_engines[profile]
+
+
+async def dispose_async_engines():
+    while _async_engines:
+        _, async_engine = _async_engines.popitem()
+        await async_engine.dispose()
+
+
+def refresh_materialized_views(sqlmodel_engine: Engine, concurrently: bool = True):
+    # CONCURRENTLY keeps the views readable during the refresh, but needs a
+    # unique index on each view and cannot be used on an unpopulated view.
+    with sqlmodel_engine.begin() as connection:
+        for view in ViewBase.__all_views__():
+            logger.info(f"refreshing materialized view {view.__tablename__}")
+            connection.execute(
+                text(
+                    f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}{view.__tablename__}"
+                )
+            )
+
+
+def download_partition_name(month: datetime) -> str:
+    return f"download_{month:%Y_%m}"
+
+
+def create_download_partition(sqlmodel_engine: Engine, month: datetime):
+    """Create the partition of the download table for the month, if missing.
+
+    Importers call this before writing a month, so that partitions for new
+    months appear as they are imported.
+    """
+    month_end = month + relativedelta(months=1)
+    with sqlmodel_engine.begin() as connection:
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {download_partition_name(month)}"
+                " PARTITION OF download"
+                f" FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{month_end:%Y-%m-%d}')"
+            )
+        )
+
+
+def bump_data_generation(sqlmodel_engine: Engine):
+    # the row is upserted, so a truncated table starts over at generation 1
+    with sqlmodel_engine.begin() as connection:
+        generation = connection.execute(
+            text(
+                "INSERT INTO datageneration (id, generation, updated_at)"
+                " VALUES (1, 1, now())"
+                " ON CONFLICT (id) DO UPDATE"
+                " SET generation = datageneration.generation + 1, updated_at = now()"
+                " RETURNING generation"
+            )
+        ).scalar_one()
+    logger.info(f"bumped data generation to {generation}")
 
 
 # class CreateMaterializedView(DDLElement):
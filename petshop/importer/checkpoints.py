@@ -0,0 +1,104 @@
+import json
+import re
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import Connection, Engine
+from sqlmodel import Session, col, delete, select, text
+
+from petshop.models import ImportCheckpoint
+
+SPLIT_UNIT = re.compile(r"^(\d{4}-\d{2}) split (\d+)/(\d+)$")
+
+
+class PackagePosition(NamedTuple):
+    """The last imported row of a packages query, ordered by upload time and name."""
+
+    upload_time: datetime
+    name: str
+
+    def to_json(self) -> str:
+        return json.dumps([self.upload_time.isoformat(), self.name])
+
+    @classmethod
+    def from_json(cls, value: str) -> "PackagePosition":
+        upload_time, name = json.loads(value)
+
+        return cls(datetime.fromisoformat(upload_time), name)
+
+
+def month_unit(month: datetime) -> str:
+    return f"{month:%Y-%m}"
+
+
+def split_unit(month: datetime, split: int, number_of_splits: int) -> str:
+    return f"{month_unit(month)} split {split + 1}/{number_of_splits}"
+
+
+def packages_unit(upload_time_after: datetime) -> str:
+    return f"since {upload_time_after.isoformat()}"
+
+
+def save_checkpoint(
+    connection: Connection, importer: str, unit: str, position: str | None = None
+):
+    """Save a checkpoint in the transaction that imported the unit."""
+    connection.execute(
+        text(
+            """
+            INSERT INTO importcheckpoint (importer, unit, position, updated_at)
+            VALUES (:importer, :unit, :position, now())
+            ON CONFLICT (importer, unit) DO UPDATE
+            SET position = EXCLUDED.position, updated_at = EXCLUDED.updated_at
+            """
+        ),
+        {"importer": importer, "unit": unit, "position": position},
+    )
+
+
+def get_checkpoints(
+    sqlmodel_engine: Engine, importer: str, prefix: str = ""
+) -> dict[str, str | None]:
+    with Session(sqlmodel_engine) as session:
+        statement = select(ImportCheckpoint).where(
+            ImportCheckpoint.importer == importer,
+            col(ImportCheckpoint.unit).startswith(prefix, autoescape=True),
+        )
+
+        return {
+            checkpoint.unit: checkpoint.position
+            for checkpoint in session.exec(statement)
+        }
+
+
+def delete_checkpoints(connection: Connection, importer: str, prefix: str = ""):
+    connection.execute(
+        delete(ImportCheckpoint).where(
+            col(ImportCheckpoint.importer) == importer,
+            col(ImportCheckpoint.unit).startswith(prefix, autoescape=True),
+        )
+    )
+
+
+def get_completed_months(sqlmodel_engine: Engine) -> set[datetime]:
+    return {
+        datetime.strptime(unit, "%Y-%m")
+        for unit, position in get_checkpoints(sqlmodel_engine, "downloads").items()
+        if position is None and not SPLIT_UNIT.match(unit)
+    }
+
+
+def get_completed_splits(
+    sqlmodel_engine: Engine, month: datetime
+) -> tuple[int | None, set[int]]:
+    """Return how the month was split by an interrupted import, and the
+    splits it finished."""
+    number_of_splits = None
+    splits: set[int] = set()
+    for unit in get_checkpoints(sqlmodel_engine, "downloads", f"{month_unit(month)} "):
+        match = SPLIT_UNIT.match(unit)
+        if match:
+            splits.add(int(match[2]) - 1)
+            number_of_splits = int(match[3])
+
+    return number_of_splits, splits
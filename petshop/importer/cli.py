@@ -1,13 +1,92 @@
 import logging
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from typing import cast
 
 import click
 from dateutil.relativedelta import relativedelta
 from dotenv import load_dotenv
+from google.cloud.bigquery import Client
 
-from petshop.importer.import_downloads import get_incomplete_months, import_downloads
-from petshop.importer.import_packages import import_packages
+from petshop.db import bump_data_generation, engine, refresh_materialized_views
+from petshop.importer.checkpoints import get_completed_months
+from petshop.importer.enrich_packages import enrich_packages, update_abandoned_flags
+from petshop.importer.import_downloads import (
+    get_downloads,
+    get_incomplete_months,
+    import_downloads,
+    reset_download_checkpoints,
+)
+from petshop.importer.import_packages import get_upload_time_after, import_packages
+from petshop.importer.planner import (
+    format_bytes,
+    format_month_plan,
+    parse_bytes,
+    plan_month,
+    plan_packages,
+    within_budget,
+)
+from petshop.importer.result_cache import CachingClient, ResultCache, format_entry
+from petshop.importer.score_features import DEFAULT_MONTHS, update_score_features
+from petshop.importer.utils import split_month
+
+
+def validate_budget(
+    ctx: click.Context, param: click.Parameter, value: str | None
+) -> int | None:
+    if value is None:
+        return None
+
+    try:
+        return parse_bytes(value)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+
+def bigquery_client(cache: bool = False) -> Client:
+    client = Client(project=os.environ["GOOGLE_CLOUD_PROJECT"])
+    if cache:
+        return cast(Client, CachingClient(client, ResultCache()))
+
+    return client
+
+
+def months_between(month_start: datetime, month_end: datetime) -> list[datetime]:
+    months: list[datetime] = []
+    month = month_start
+    while month <= month_end:
+        months.append(month)
+        month += relativedelta(months=1)
+
+    return months
+
+
+plan_option = click.option(
+    "--plan",
+    is_flag=True,
+    default=False,
+    help="Print the estimated BigQuery bytes per query and exit",
+)
+cache_option = click.option(
+    "--cache",
+    is_flag=True,
+    default=False,
+    help="Replay BigQuery results from the local result cache, and fill it",
+)
+restart_option = click.option(
+    "--restart",
+    is_flag=True,
+    default=False,
+    help="Discard the checkpoints of interrupted or finished imports and start over",
+)
+budget_option = click.option(
+    "--budget",
+    envvar="BIGQUERY_BYTES_BUDGET",
+    callback=validate_budget,
+    help="Maximum bytes BigQuery may process in this run, e.g. 500G",
+)
 
 
 @click.group()
@@ -21,8 +100,51 @@ def cli(debug: bool):
 
 @cli.add_command
 @click.command()
-def packages():
-    import_packages()
+@click.option(
+    "--bulk",
+    is_flag=True,
+    default=False,
+    help="Upsert packages in batches via COPY instead of row by row",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    default=False,
+    help="Probe for changed packages first, and skip the import without any",
+)
+@plan_option
+@budget_option
+@cache_option
+@restart_option
+def packages(
+    bulk: bool,
+    incremental: bool,
+    plan: bool,
+    budget: int | None,
+    cache: bool,
+    restart: bool,
+):
+    client = bigquery_client(cache)
+    upload_time_after = get_upload_time_after(engine("importer"))
+    query_plans = plan_packages(client, upload_time_after, incremental)
+    for query_plan in query_plans:
+        click.echo(
+            f"{query_plan.description}: {format_bytes(query_plan.bytes_processed)}"
+        )
+
+    total = sum(query_plan.bytes_processed for query_plan in query_plans)
+    if budget is not None and total > budget:
+        raise click.ClickException(
+            f"estimated {format_bytes(total)} exceed the budget of {format_bytes(budget)}"
+        )
+    if plan:
+        return
+
+    import_packages(
+        bulk=bulk, incremental=incremental, bigquery_client=client, restart=restart
+    )
+    refresh_materialized_views(engine("importer"))
+    bump_data_generation(engine("importer"))
 
 
 # def validate_month(ctx: click.Context, param: str, month: str) -> datetime:
@@ -36,12 +158,171 @@ def packages():
 @click.command()
 @click.argument("month_start", type=click.DateTime(formats=["%Y-%m"]))
 @click.argument("month_end", type=click.DateTime(formats=["%Y-%m"]))
-def downloads(month_start: datetime, month_end: datetime):
-    """Import downloads for MONTH."""
-    month = month_start
-    while month <= month_end:
-        import_downloads(month)
-        month += relativedelta(months=1)
+@click.option(
+    "--streaming",
+    is_flag=True,
+    default=False,
+    help="Resolve and upsert downloads in SQL with constant memory",
+)
+@click.option(
+    "--replace",
+    is_flag=True,
+    default=False,
+    help="Like --streaming, but swap in a new partition per month atomically",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of BigQuery month splits to fetch concurrently",
+)
+@click.option(
+    "--parallel-months",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of months to import concurrently",
+)
+@plan_option
+@budget_option
+@cache_option
+@restart_option
+def downloads(
+    month_start: datetime,
+    month_end: datetime,
+    streaming: bool,
+    replace: bool,
+    workers: int,
+    parallel_months: int,
+    plan: bool,
+    budget: int | None,
+    cache: bool,
+    restart: bool,
+):
+    """Import downloads from MONTH_START to MONTH_END.
+
+    Months that were imported after they ended are skipped, and an
+    interrupted streaming import of a month resumes with its missing splits.
+    """
+    client = bigquery_client(cache)
+    months = months_between(month_start, month_end)
+    if restart:
+        if not plan:
+            for month in months:
+                reset_download_checkpoints(engine("importer"), month)
+    else:
+        completed_months = get_completed_months(engine("importer"))
+        if skipped := [month for month in months if month in completed_months]:
+            click.echo(
+                f"skipping imported months: {', '.join(f'{m:%Y-%m}' for m in skipped)}"
+            )
+        months = [month for month in months if month not in completed_months]
+        if not months:
+            return
+
+    month_plans = [plan_month(client, month, min_splits=workers) for month in months]
+    for month_plan in month_plans:
+        click.echo(format_month_plan(month_plan))
+
+    # import the leading months that fit the budget, rather than nothing
+    affordable_plans = within_budget(month_plans, budget)
+    if not affordable_plans:
+        raise click.ClickException(
+            f"the first month alone exceeds the budget of {format_bytes(cast(int, budget))}"
+        )
+    if len(affordable_plans) < len(month_plans):
+        click.echo(
+            f"budget of {format_bytes(cast(int, budget))} only covers"
+            f" {affordable_plans[-1].month:%Y-%m} and earlier",
+            err=True,
+        )
+    if plan:
+        return
+
+    with ThreadPoolExecutor(max_workers=parallel_months) as executor:
+        imports = [
+            executor.submit(
+                import_downloads,
+                month_plan.month,
+                streaming,
+                workers,
+                month_plan.number_of_splits,
+                client,
+                replace,
+            )
+            for month_plan in affordable_plans
+        ]
+        for future in as_completed(imports):
+            future.result()
+            # bump only after the refresh, so that the API does not cache the
+            # stale view under the new generation
+            refresh_materialized_views(engine("importer"))
+            bump_data_generation(engine("importer"))
+
+
+@cli.group()
+def cache():
+    """Manage the local cache of BigQuery results."""
+
+
+@cache.command(name="list")
+def list_cache():
+    """List cached results."""
+    for entry in ResultCache().entries():
+        click.echo(format_entry(entry))
+
+
+@cache.command()
+@click.option(
+    "--expired", is_flag=True, default=False, help="Only purge expired results"
+)
+def purge(expired: bool):
+    """Delete cached results."""
+    click.echo(f"purged {ResultCache().purge(expired_only=expired)} results")
+
+
+@cache.command()
+@click.argument("month_start", type=click.DateTime(formats=["%Y-%m"]))
+@click.argument("month_end", type=click.DateTime(formats=["%Y-%m"]))
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Split months like `downloads --workers` does, to share its cache keys",
+)
+def warm(month_start: datetime, month_end: datetime, workers: int):
+    """Cache the download queries from MONTH_START to MONTH_END."""
+    client = bigquery_client(cache=True)
+    for month in months_between(month_start, month_end):
+        month_plan = plan_month(client, month, min_splits=workers)
+        for start_time, end_time in split_month(
+            month.year, month.month, month_plan.number_of_splits
+        ):
+            get_downloads(client, start_time, end_time)
+
+
+@cli.add_command
+@click.command()
+@click.option(
+    "--months",
+    type=click.IntRange(min=2),
+    default=DEFAULT_MONTHS,
+    help="Number of months of downloads to compute the features from",
+)
+def features(months: int):
+    """Compute ranking features from the imported downloads, and flag
+    abandoned packages by them."""
+    update_score_features(engine("importer"), months)
+    with engine("importer").begin() as connection:
+        update_abandoned_flags(connection)
+    bump_data_generation(engine("importer"))
+
+
+@cli.add_command
+@click.command()
+def enrich():
+    """Derive the flags of all packages, like after importing packages."""
+    enrich_packages(engine("importer"))
+    bump_data_generation(engine("importer"))
 
 
 @cli.add_command
@@ -0,0 +1,82 @@
+# pyright: reportUnknownVariableType=false,reportUnknownMemberType=false,reportUnknownArgumentType=false
+"""Transforms on Arrow record batches, to COPY BigQuery results into Postgres
+without creating Python objects per row."""
+
+from collections.abc import Iterable, Iterator
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+from psycopg import Copy
+
+CSV_WRITE_OPTIONS = pa_csv.WriteOptions(include_header=False)
+
+
+def chunked(
+    batches: Iterable[pa.RecordBatch], rows: int
+) -> Iterator[list[pa.RecordBatch]]:
+    """Regroup batches into chunks of `rows` rows, slicing without copying."""
+    chunk: list[pa.RecordBatch] = []
+    size = 0
+    for batch in batches:
+        offset = 0
+        while offset < batch.num_rows:
+            length = min(rows - size, batch.num_rows - offset)
+            chunk.append(batch.slice(offset, length))
+            size += length
+            offset += length
+            if size == rows:
+                yield chunk
+                chunk = []
+                size = 0
+
+    if chunk:
+        yield chunk
+
+
+def normalize_names(names: pa.Array | pa.ChunkedArray) -> pa.Array | pa.ChunkedArray:
+    # the same as petshop.models.normalize_name
+    return pc.utf8_lower(
+        pc.replace_substring_regex(names, pattern="[-_.]+", replacement="-")
+    )
+
+
+def postgres_array_literals(lists: pa.ListArray) -> pa.Array:
+    """Format a list array as Postgres array literals like `{"a","b"}`."""
+    lists = lists.cast(pa.list_(pa.string()))
+    # flatten() skips the values hidden behind null lists, so rebuild the
+    # lists from offsets that are relative to the flattened values
+    values = lists.flatten()
+    escaped = pc.replace_substring(
+        pc.replace_substring(values, pattern="\\", replacement="\\\\"),
+        pattern='"',
+        replacement='\\"',
+    )
+    quoted = pc.fill_null(pc.binary_join_element_wise('"', escaped, '"', ""), "NULL")
+    offsets = pc.subtract(lists.offsets, lists.offsets[0])
+    elements = pa.ListArray.from_arrays(offsets, quoted, mask=lists.is_null())
+
+    return pc.binary_join_element_wise("{", pc.binary_join(elements, ","), "}", "")
+
+
+def to_copyable(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """Convert columns the CSV writer cannot handle, or Postgres cannot read."""
+    columns: list[pa.Array] = []
+    for column in batch.columns:
+        if pa.types.is_list(column.type) or pa.types.is_large_list(column.type):
+            column = postgres_array_literals(column)
+        elif pa.types.is_timestamp(column.type):
+            # Postgres reads at most microseconds
+            column = column.cast(pa.timestamp("us", column.type.tz))
+        elif pa.types.is_null(column.type):
+            column = column.cast(pa.string())
+        columns.append(column)
+
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+def copy_batch(copy: Copy, batch: pa.RecordBatch):
+    """Write a batch to a `COPY ... FROM STDIN (FORMAT csv)` stream."""
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(to_copyable(batch), sink, CSV_WRITE_OPTIONS)
+    copy.write(memoryview(sink.getvalue()))
@@ -0,0 +1,226 @@
+"""Flags of packages derived from their metadata and downloads.
+
+They are stored on the package table, so that filters read indexed columns
+instead of parsing versions and classifiers per row:
+
+- is_prerelease: the latest version is a PEP 440 pre- or development release
+- dev_status: the highest "Development Status :: N - ..." classifier
+- is_app, is_library: classifiers of end-user applications or of libraries,
+  which may both hold
+- is_abandoned: no upload in ABANDONED_MONTHS and downloads that decline or
+  stopped, see petshop.importer.score_features
+"""
+
+import datetime
+import logging
+import time
+from typing import cast
+
+import psycopg
+import pyarrow as pa
+from packaging.version import InvalidVersion, Version
+from sqlalchemy import Connection, Engine
+from sqlmodel import text
+
+from petshop.importer.columnar import copy_batch
+
+ABANDONED_MONTHS = 24
+DEV_STATUS_PATTERN = r"^Development Status :: (\d) - "
+APP_CLASSIFIERS = [
+    "Environment :: Console",
+    "Environment :: MacOS X",
+    "Environment :: Win32 (MS Windows)",
+    "Environment :: X11 Applications",
+    "Intended Audience :: End Users/Desktop",
+]
+LIBRARY_CLASSIFIERS = [
+    "Topic :: Software Development :: Libraries",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def is_prerelease(version: str) -> bool | None:
+    try:
+        return Version(version).is_prerelease
+    except InvalidVersion:
+        return None
+
+
+def changed_packages(upload_time_after: datetime.datetime | None) -> str:
+    if upload_time_after is None:
+        return ""
+
+    return "WHERE package.upload_time >= :upload_time_after"
+
+
+def create_flags_staging(connection: Connection):
+    connection.execute(
+        text(
+            """
+            CREATE TEMPORARY TABLE flags_staging (
+              id integer PRIMARY KEY,
+              is_prerelease boolean,
+              dev_status smallint,
+              is_app boolean,
+              is_library boolean
+            ) ON COMMIT DROP
+            """
+        )
+    )
+
+
+def stage_prerelease_flags(
+    connection: Connection,
+    upload_time_after: datetime.datetime | None = None,
+    batch_size: int = 50000,
+):
+    """Parse the versions in Python, and copy the flags back in batches."""
+    # all versions are read before the copy, which needs the connection
+    versions = connection.execute(
+        text(f"SELECT id, version FROM package {changed_packages(upload_time_after)}"),
+        {"upload_time_after": upload_time_after},
+        execution_options={"stream_results": True},
+    ).partitions(batch_size)
+    batches = [
+        pa.RecordBatch.from_pydict(
+            {
+                "id": pa.array([id for id, _ in rows], pa.int32()),
+                "is_prerelease": pa.array(
+                    [is_prerelease(version) for _, version in rows], pa.bool_()
+                ),
+            }
+        )
+        for rows in versions
+    ]
+
+    cursor = cast(psycopg.Connection, connection.connection.driver_connection).cursor()
+    with cursor.copy(
+        "COPY flags_staging (id, is_prerelease) FROM STDIN (FORMAT csv)"
+    ) as copy:
+        for batch in batches:
+            copy_batch(copy, batch)
+
+
+def stage_classifier_flags(connection: Connection):
+    connection.execute(
+        text(
+            """
+            UPDATE flags_staging
+            SET dev_status = flags.dev_status,
+              is_app = flags.is_app,
+              is_library = flags.is_library
+            FROM (
+              SELECT
+                flags_staging.id,
+                max(CAST(substring(classifier.name FROM :dev_status_pattern) AS smallint))
+                  AS dev_status,
+                coalesce(bool_or(classifier.name LIKE ANY(:app_patterns)), false)
+                  AS is_app,
+                coalesce(bool_or(classifier.name LIKE ANY(:library_patterns)), false)
+                  AS is_library
+              FROM flags_staging
+              LEFT OUTER JOIN classifierpackagelink
+                ON classifierpackagelink.package_id = flags_staging.id
+              LEFT OUTER JOIN classifier
+                ON classifier.id = classifierpackagelink.classifier_id
+              GROUP BY flags_staging.id
+            ) AS flags
+            WHERE flags_staging.id = flags.id
+            """
+        ),
+        {
+            "dev_status_pattern": DEV_STATUS_PATTERN,
+            # a classifier or any below it
+            "app_patterns": [
+                pattern
+                for name in APP_CLASSIFIERS
+                for pattern in (name, f"{name} :: %")
+            ],
+            "library_patterns": [
+                pattern
+                for name in LIBRARY_CLASSIFIERS
+                for pattern in (name, f"{name} :: %")
+            ],
+        },
+    )
+
+
+def update_flags(connection: Connection):
+    """Write the staged flags, and flag abandoned packages among all packages,
+    since packages become abandoned without changing.
+
+    Updating a row rewrites all its index entries, as the flags are indexed,
+    so every package is written at most once, and only if a flag changed.
+    """
+    connection.execute(
+        text(
+            """
+            UPDATE package
+            SET is_prerelease = flags.is_prerelease,
+              dev_status = flags.dev_status,
+              is_app = flags.is_app,
+              is_library = flags.is_library,
+              is_abandoned = flags.is_abandoned
+            FROM (
+              SELECT
+                package.id,
+                CASE WHEN flags_staging.id IS NULL THEN package.is_prerelease
+                  ELSE flags_staging.is_prerelease END AS is_prerelease,
+                CASE WHEN flags_staging.id IS NULL THEN package.dev_status
+                  ELSE flags_staging.dev_status END AS dev_status,
+                CASE WHEN flags_staging.id IS NULL THEN package.is_app
+                  ELSE flags_staging.is_app END AS is_app,
+                CASE WHEN flags_staging.id IS NULL THEN package.is_library
+                  ELSE flags_staging.is_library END AS is_library,
+                package.upload_time < localtimestamp - make_interval(months => :months)
+                  AND (
+                    coalesce(packagefeatures.rolling_mean, 0) = 0
+                    OR packagefeatures.slope < 0
+                  ) AS is_abandoned
+              FROM package
+              LEFT OUTER JOIN flags_staging ON flags_staging.id = package.id
+              LEFT OUTER JOIN packagefeatures
+                ON packagefeatures.package_id = package.id
+            ) AS flags
+            WHERE package.id = flags.id
+              AND (
+                package.is_prerelease,
+                package.dev_status,
+                package.is_app,
+                package.is_library,
+                package.is_abandoned
+              ) IS DISTINCT FROM (
+                flags.is_prerelease,
+                flags.dev_status,
+                flags.is_app,
+                flags.is_library,
+                flags.is_abandoned
+              )
+            """
+        ),
+        {"months": ABANDONED_MONTHS},
+    )
+
+
+def update_abandoned_flags(connection: Connection):
+    """Only flag abandoned packages, e.g. after computing score features."""
+    create_flags_staging(connection)
+    update_flags(connection)
+
+
+def enrich_packages(
+    sqlmodel_engine: Engine, upload_time_after: datetime.datetime | None = None
+):
+    """Derive the flags of the packages uploaded since `upload_time_after`,
+    or of all packages, and flag abandoned packages, in one transaction."""
+    start_time = time.perf_counter()
+
+    with sqlmodel_engine.begin() as connection:
+        create_flags_staging(connection)
+        stage_prerelease_flags(connection, upload_time_after)
+        stage_classifier_flags(connection)
+        update_flags(connection)
+
+    end_time = time.perf_counter()
+    logger.info(f"🟢 enriched packages in {end_time - start_time} seconds")
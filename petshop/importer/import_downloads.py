@@ -1,33 +1,75 @@
 # pyright: reportUnknownVariableType=false,reportUnknownMemberType=false,reportUnknownArgumentType=false
 import logging
 import os
+import queue
+import threading
 import time
 import uuid
-from collections.abc import Generator
+from collections import Counter
+from collections.abc import Generator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
-from typing import cast
+from typing import NamedTuple, cast
 
+import psycopg
+import pyarrow as pa
 from dateutil.relativedelta import relativedelta
 from dotenv import load_dotenv
-from google.cloud.bigquery import Client, QueryJobConfig, Row, ScalarQueryParameter
+from google.cloud.bigquery import (
+    Client,
+    QueryJob,
+    QueryJobConfig,
+    Row,
+    ScalarQueryParameter,
+)
 from google.cloud.bigquery.table import RowIterator
-from sqlalchemy import Engine
+from psycopg.errors import LockNotAvailable
+from sqlalchemy import Connection, Engine
+from sqlalchemy.exc import OperationalError
 from sqlmodel import TIMESTAMP, Integer, Session, String, column, select, text
 
-from petshop.db import engine
-from petshop.importer.utils import split_month
-from petshop.models import Download, Package
+from petshop.db import create_download_partition, download_partition_name, engine
+from petshop.importer.checkpoints import (
+    delete_checkpoints,
+    get_completed_splits,
+    month_unit,
+    save_checkpoint,
+    split_unit,
+)
+from petshop.importer.columnar import copy_batch, normalize_names
+from petshop.importer.utils import MAXIMUM_BYTES_BILLED, split_month
+from petshop.models import Download, Package, normalize_name
 
 MIN_DATE = datetime(2016, 1, 1, 0, 0, 0)
+# pypi.file_downloads is partitioned by day on field timestamp, therefore
+# it’s cheaper to split by month than by other means
+DEFAULT_NUMBER_OF_SPLITS = 5
+# arbitrary key of the advisory lock serializing partition swaps
+SWAP_PARTITION_LOCK = 7_290_601
+SWAP_LOCK_TIMEOUT = "5s"
+SWAP_ATTEMPTS = 5
+# record batches each worker fetches ahead of the import of its split
+MAX_BUFFERED_BATCHES = 4
+
+DOWNLOADS_QUERY = """
+    SELECT
+      project as package_name,
+      COUNT(project) AS downloads
+    FROM `bigquery-public-data.pypi.file_downloads`
+    WHERE timestamp >= @timestamp_start
+      AND timestamp < @timestamp_end
+    GROUP BY project
+"""
 
 logger = logging.getLogger(__name__)
 
 
 def get_package_ids_by_name(session: Session) -> dict[str, int]:
-    statement = select(Package.name, Package.id)
+    """Map normalized package names to package ids."""
+    statement = select(Package.normalized_name, Package.id)
     packages = session.exec(statement).all()
 
-    return {package[0]: cast(int, package[1]) for package in packages}
+    return {cast(str, package[0]): cast(int, package[1]) for package in packages}
 
 
 def get_downloads_by_package_id(
@@ -38,10 +80,18 @@ def get_downloads_by_package_id(
     return {download.package_id: download for download in downloads}
 
 
-def get_downloads_paged(client: Client, year: int, month: int) -> Generator[Row, None]:
-    # pypi.file_downloads is partitioned by day on field timestamp
-    # therefore it’s cheaper to split by month than by other means.
-    month_splits = split_month(year, month, number_of_splits=5)
+class DownloadCount(NamedTuple):
+    package_name: str
+    downloads: int
+
+
+def get_downloads_paged(
+    client: Client,
+    year: int,
+    month: int,
+    number_of_splits: int = DEFAULT_NUMBER_OF_SPLITS,
+) -> Generator[Row, None]:
+    month_splits = split_month(year, month, number_of_splits)
 
     for start_time, end_time in month_splits:
         rows = get_downloads(client, start_time, end_time)
@@ -50,53 +100,205 @@ def get_downloads_paged(client: Client, year: int, month: int) -> Generator[Row,
             yield row
 
 
+def count_downloads(query_job: QueryJob) -> Counter[str]:
+    rows = query_job.result()
+    logger.info(
+        f"bigquery job {rows.job_id}: resultset contains {rows.total_rows} rows"
+    )
+
+    counts: Counter[str] = Counter()
+    for row in rows:
+        counts[row.package_name] += row.downloads
+
+    return counts
+
+
+def get_downloads_concurrently(
+    client: Client,
+    year: int,
+    month: int,
+    workers: int,
+    number_of_splits: int = DEFAULT_NUMBER_OF_SPLITS,
+) -> Generator[DownloadCount, None]:
+    # submitting a job does not wait for it, so BigQuery runs all splits at
+    # once while the workers page through whichever result is ready
+    query_jobs = [
+        query_downloads(client, start_time, end_time)
+        for start_time, end_time in split_month(year, month, number_of_splits)
+    ]
+
+    downloads: Counter[str] = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for counts in as_completed(
+            executor.submit(count_downloads, query_job) for query_job in query_jobs
+        ):
+            downloads.update(counts.result())
+
+    for package_name, count in downloads.items():
+        yield DownloadCount(package_name, count)
+
+
+def get_download_rows(
+    client: Client,
+    month: datetime,
+    workers: int = 1,
+    number_of_splits: int = DEFAULT_NUMBER_OF_SPLITS,
+) -> Iterator[Row | DownloadCount]:
+    if workers > 1:
+        return get_downloads_concurrently(
+            client, month.year, month.month, workers, number_of_splits
+        )
+
+    return get_downloads_paged(client, month.year, month.month, number_of_splits)
+
+
+def put_until_stopped(
+    batches: queue.Queue[pa.RecordBatch | BaseException | None],
+    item: pa.RecordBatch | BaseException | None,
+    stop: threading.Event,
+) -> bool:
+    """Wait for room in the queue, unless the import stopped."""
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def fetch_download_batches(
+    query_job: QueryJob,
+    batches: queue.Queue[pa.RecordBatch | BaseException | None],
+    stop: threading.Event,
+):
+    """Put the record batches of the query's result into the queue as they
+    arrive, then None, or the exception that ended the fetch."""
+    try:
+        if stop.is_set():
+            return
+        rows = query_job.result()
+        logger.info(
+            f"bigquery job {rows.job_id}: resultset contains {rows.total_rows} rows"
+        )
+        for batch in rows.to_arrow_iterable():
+            if batch.num_rows > 0 and not put_until_stopped(batches, batch, stop):
+                return
+        put_until_stopped(batches, None, stop)
+    except Exception as exception:
+        put_until_stopped(batches, exception, stop)
+
+
+def queued_batches(
+    batches: queue.Queue[pa.RecordBatch | BaseException | None],
+) -> Iterator[pa.RecordBatch]:
+    while (batch := batches.get()) is not None:
+        if isinstance(batch, BaseException):
+            raise batch
+        yield batch
+
+
+def get_download_split_batches(
+    client: Client,
+    month: datetime,
+    splits: list[int],
+    workers: int = 1,
+    number_of_splits: int = DEFAULT_NUMBER_OF_SPLITS,
+) -> Iterator[tuple[int, Iterable[pa.RecordBatch]]]:
+    """Fetch the given splits of a month as Arrow record batches, per split.
+
+    With several workers, each fetches a split at most MAX_BUFFERED_BATCHES
+    ahead of the import, and the splits are yielded in the given order, in
+    which the workers take them up. So the batches of each split have to be
+    consumed before those of the next one.
+    """
+    month_splits = list(split_month(month.year, month.month, number_of_splits))
+
+    if workers <= 1:
+        for split in splits:
+            yield split, get_downloads(client, *month_splits[split]).to_arrow_iterable()
+        return
+
+    query_jobs = {
+        split: query_downloads(client, *month_splits[split]) for split in splits
+    }
+    split_batches: dict[int, queue.Queue[pa.RecordBatch | BaseException | None]] = {
+        split: queue.Queue(maxsize=MAX_BUFFERED_BATCHES) for split in splits
+    }
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for split, query_job in query_jobs.items():
+                executor.submit(
+                    fetch_download_batches, query_job, split_batches[split], stop
+                )
+            for split in splits:
+                yield split, queued_batches(split_batches[split])
+        finally:
+            # releases workers waiting for room when the import failed
+            stop.set()
+            executor.shutdown(cancel_futures=True)
+
+
 def get_downloads(
     client: Client,
     start_time: datetime,
     end_time: datetime,
 ) -> RowIterator:
-    query = """
-        SELECT
-          project as package_name,
-          COUNT(project) AS downloads
-        FROM `bigquery-public-data.pypi.file_downloads`
-        WHERE timestamp >= @timestamp_start
-          AND timestamp < @timestamp_end
-        GROUP BY project
-    """
-    job_id = f"import-downloads-{uuid.uuid4()}"
+    rows = query_downloads(client, start_time, end_time).result()
+
     logger.info(
-        f"bigquery job {job_id}: requesting downloads from {start_time} to {end_time}"
+        f"bigquery job {rows.job_id}: resultset contains {rows.total_rows} rows"
     )
 
-    job_config = QueryJobConfig(
-        maximum_bytes_billed=1024 * 1024 * 1024 * 1024 - 1,  # < 1 TB
-        query_parameters=[
-            ScalarQueryParameter(
-                "timestamp_start", "TIMESTAMP", start_time.isoformat()
-            ),
-            ScalarQueryParameter("timestamp_end", "TIMESTAMP", end_time.isoformat()),
-        ],
-    )
-    query_job = client.query(query, job_config=job_config, job_id=job_id)
-    rows = query_job.result()
+    return rows
+
 
+def downloads_query_parameters(
+    start_time: datetime, end_time: datetime
+) -> list[ScalarQueryParameter]:
+    return [
+        ScalarQueryParameter("timestamp_start", "TIMESTAMP", start_time.isoformat()),
+        ScalarQueryParameter("timestamp_end", "TIMESTAMP", end_time.isoformat()),
+    ]
+
+
+def query_downloads(
+    client: Client,
+    start_time: datetime,
+    end_time: datetime,
+) -> QueryJob:
+    job_id = f"import-downloads-{uuid.uuid4()}"
     logger.info(
-        f"bigquery job {rows.job_id}: resultset contains {rows.total_rows} rows"
+        f"bigquery job {job_id}: requesting downloads from {start_time} to {end_time}"
     )
 
-    return rows
+    job_config = QueryJobConfig(
+        maximum_bytes_billed=MAXIMUM_BYTES_BILLED,
+        query_parameters=downloads_query_parameters(start_time, end_time),
+    )
+    return client.query(DOWNLOADS_QUERY, job_config=job_config, job_id=job_id)
 
 
 def update_downloads(
     bigquery_client: Client,
     month: datetime,
     sqlmodel_engine: Engine,
+    workers: int = 1,
+    number_of_splits: int = DEFAULT_NUMBER_OF_SPLITS,
 ):
+    """Import downloads in place through the ORM, row by row.
+
+    Readers may see a partially updated month meanwhile, so this is meant for
+    small runs; stream_update_downloads() with `replace` swaps in a complete
+    month at once.
+    """
     import_time = datetime.now(timezone.utc)
+    create_download_partition(sqlmodel_engine, month)
 
     logger.info("Importing PyPI downloads per package from Google BigQuery")
-    download_rows = get_downloads_paged(bigquery_client, month.year, month.month)
+    download_rows = get_download_rows(bigquery_client, month, workers, number_of_splits)
 
     with Session(sqlmodel_engine) as session:
         logger.debug("loading package info")
@@ -114,7 +316,7 @@ def update_downloads(
         count_not_found = 0
 
         for count_processed, row in enumerate(download_rows):
-            package_id = package_ids_by_name.get(row.package_name)
+            package_id = package_ids_by_name.get(normalize_name(row.package_name))
             if not package_id:
                 logger.debug(f"package {row.package_name} does not exist, skipping")
                 count_not_found += 1
@@ -138,6 +340,8 @@ def update_downloads(
                 downloads_by_package_id[package_id] = download
 
         session.add_all(downloads_by_package_id.values())
+        if is_final(month, import_time):
+            save_checkpoint(session.connection(), "downloads", month_unit(month))
         session.commit()
 
         logger.info(
@@ -145,19 +349,324 @@ def update_downloads(
         )
 
 
-def import_downloads(month: datetime):
+def is_final(month: datetime, import_time: datetime) -> bool:
+    """Whether the month was over at import time, so that its counts are final."""
+    return import_time.replace(tzinfo=None) >= month + relativedelta(months=1)
+
+
+def load_download_split(
+    sqlmodel_engine: Engine,
+    month: datetime,
+    split: int,
+    number_of_splits: int,
+    batches: Iterable[pa.RecordBatch],
+):
+    """Copy the downloads of one split into downloadsplit and checkpoint it."""
+    with sqlmodel_engine.begin() as connection:
+        cursor = cast(
+            psycopg.Connection, connection.connection.driver_connection
+        ).cursor()
+
+        count_copied = 0
+        with cursor.copy(
+            "COPY downloadsplit (month, normalized_name, downloads) FROM STDIN (FORMAT csv)"
+        ) as copy:
+            for batch in batches:
+                split_batch = pa.RecordBatch.from_arrays(
+                    [
+                        pa.repeat(pa.scalar(month, pa.timestamp("us")), batch.num_rows),
+                        normalize_names(batch.column("package_name")),
+                        batch.column("downloads"),
+                    ],
+                    names=["month", "normalized_name", "downloads"],
+                )
+                copy_batch(copy, split_batch)
+                count_copied += batch.num_rows
+
+        save_checkpoint(
+            connection, "downloads", split_unit(month, split, number_of_splits)
+        )
+
+    logger.info(
+        f"copied {count_copied} download rows of split {split + 1}/{number_of_splits}"
+    )
+
+
+def reset_download_checkpoints(sqlmodel_engine: Engine, month: datetime):
+    with sqlmodel_engine.begin() as connection:
+        connection.execute(
+            text("DELETE FROM downloadsplit WHERE month = :month"), {"month": month}
+        )
+        delete_checkpoints(connection, "downloads", month_unit(month))
+
+
+def upsert_month(
+    connection: Connection, month: datetime, import_time: datetime
+) -> tuple[int, int]:
+    """Upsert the month from downloadsplit, in place, and return the numbers
+    of created and updated rows."""
+    # the statement sees the month as it was before the upsert, which
+    # tells updated from created rows (xmax is not available on partitions)
+    count_created, count_updated = connection.execute(
+        text(
+            """
+            WITH fresh AS (
+              SELECT package.id AS package_id, sum(downloadsplit.downloads) AS downloads
+              FROM downloadsplit
+              JOIN package ON package.normalized_name = downloadsplit.normalized_name
+              WHERE downloadsplit.month = :month
+              GROUP BY package.id
+            ),
+            existing AS (
+              SELECT count(*) AS count
+              FROM download JOIN fresh USING (package_id)
+              WHERE download.month = :month
+            ),
+            upserted AS (
+              INSERT INTO download (imported_at, package_id, month, downloads)
+              SELECT :import_time, package_id, :month, downloads FROM fresh
+              ON CONFLICT (package_id, month) DO UPDATE
+              SET imported_at = EXCLUDED.imported_at, downloads = EXCLUDED.downloads
+              RETURNING package_id
+            )
+            SELECT (SELECT count(*) FROM upserted) - existing.count, existing.count
+            FROM existing
+            """
+        ),
+        {"import_time": import_time, "month": month},
+    ).one()
+    # reset counts of packages without downloads in this import, because
+    # we’re always updating the whole month
+    connection.execute(
+        text(
+            """
+            UPDATE download SET downloads = 0
+            WHERE month = :month AND imported_at < :import_time
+            """
+        ),
+        {"import_time": import_time, "month": month},
+    )
+
+    return count_created, count_updated
+
+
+def build_month_partition(
+    connection: Connection, month: datetime, import_time: datetime
+) -> int:
+    """Build a replacement for the partition of the month from downloadsplit.
+
+    Constraints and the primary key are added upfront, so that attaching it
+    reuses them instead of validating the partition while download is locked.
+    """
+    partition = download_partition_name(month)
+    month_end = month + relativedelta(months=1)
+
+    connection.execute(text(f"DROP TABLE IF EXISTS {partition}_new"))
+    connection.execute(
+        text(f"CREATE TABLE {partition}_new (LIKE download INCLUDING DEFAULTS)")
+    )
+    count_inserted = connection.execute(
+        text(
+            f"""
+            INSERT INTO {partition}_new (package_id, month, imported_at, downloads)
+            SELECT package.id, :month, :import_time, sum(downloadsplit.downloads)
+            FROM downloadsplit
+            JOIN package ON package.normalized_name = downloadsplit.normalized_name
+            WHERE downloadsplit.month = :month
+            GROUP BY package.id
+            """
+        ),
+        {"import_time": import_time, "month": month},
+    ).rowcount
+    connection.execute(
+        text(
+            f"""
+            ALTER TABLE {partition}_new
+              ADD CONSTRAINT {partition}_new_pkey PRIMARY KEY (package_id, month),
+              ADD FOREIGN KEY (package_id) REFERENCES package (id),
+              ADD CONSTRAINT {partition}_new_month_check
+                CHECK (month >= '{month:%Y-%m-%d}' AND month < '{month_end:%Y-%m-%d}')
+            """
+        )
+    )
+
+    return count_inserted
+
+
+def swap_month_partition(connection: Connection, month: datetime):
+    """Swap the partition of the month for the one build_month_partition() built.
+
+    This locks download until the transaction ends, so it should end soon.
+    Readers see either the old or the new month, never a mix.
+    """
+    partition = download_partition_name(month)
+    month_end = month + relativedelta(months=1)
+
+    # months imported in parallel swap one at a time, instead of deadlocking
+    # on their locks on download
+    connection.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"), {"key": SWAP_PARTITION_LOCK}
+    )
+    # give up instead of queueing every reader of download behind a long
+    # running query
+    connection.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+    connection.execute(text(f"ALTER TABLE download DETACH PARTITION {partition}"))
+    connection.execute(
+        text(
+            f"ALTER TABLE download ATTACH PARTITION {partition}_new"
+            f" FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{month_end:%Y-%m-%d}')"
+        )
+    )
+    connection.execute(text(f"DROP TABLE {partition}"))
+    connection.execute(text(f"ALTER TABLE {partition}_new RENAME TO {partition}"))
+    connection.execute(
+        text(f"ALTER INDEX {partition}_new_pkey RENAME TO {partition}_pkey")
+    )
+    connection.execute(
+        text(f"ALTER TABLE {partition} DROP CONSTRAINT {partition}_new_month_check")
+    )
+
+
+def finish_month(connection: Connection, month: datetime, import_time: datetime):
+    """Drop the downloads of the month from downloadsplit, with its checkpoints."""
+    connection.execute(
+        text("DELETE FROM downloadsplit WHERE month = :month"), {"month": month}
+    )
+    delete_checkpoints(connection, "downloads", month_unit(month))
+    # the running month is imported again, until its counts are final
+    if is_final(month, import_time):
+        save_checkpoint(connection, "downloads", month_unit(month))
+
+
+def replace_month(sqlmodel_engine: Engine, month: datetime, import_time: datetime):
+    """Swap in the partition of the month and finish it, retrying when the
+    locks on download are not granted in time."""
+    for attempt in range(1, SWAP_ATTEMPTS + 1):
+        try:
+            with sqlmodel_engine.begin() as connection:
+                swap_month_partition(connection, month)
+                finish_month(connection, month, import_time)
+            return
+        except OperationalError as error:
+            if not isinstance(error.orig, LockNotAvailable) or attempt == SWAP_ATTEMPTS:
+                raise
+            logger.warning(
+                f"swapping partition of {month_unit(month)} timed out, attempt {attempt} of {SWAP_ATTEMPTS}"
+            )
+            time.sleep(attempt)
+
+
+def stream_update_downloads(
+    bigquery_client: Client,
+    month: datetime,
+    sqlmodel_engine: Engine,
+    workers: int = 1,
+    number_of_splits: int = DEFAULT_NUMBER_OF_SPLITS,
+    replace: bool = False,
+):
+    """Import downloads without loading packages or downloads into Python.
+
+    The BigQuery results are fetched as Arrow record batches, whose names are
+    normalized column-wise and copied as CSV into downloadsplit, one
+    transaction and checkpoint per split. A rerun after an interruption only
+    fetches the splits that are missing. Package names are resolved and the
+    month is upserted in SQL, so memory stays flat regardless of the number
+    of packages. With `replace`, a new partition of the month is built
+    instead, and swapped for the old one in a short transaction of its own.
+    """
+    import_time = datetime.now(timezone.utc)
+    create_download_partition(sqlmodel_engine, month)
+
+    logger.info("Streaming PyPI downloads per package from Google BigQuery")
+
+    checkpointed_splits, completed_splits = get_completed_splits(sqlmodel_engine, month)
+    if checkpointed_splits is not None:
+        # other splits would overlap the finished ones
+        number_of_splits = checkpointed_splits
+        logger.info(
+            f"resuming after {len(completed_splits)} of {number_of_splits} splits"
+        )
+    pending_splits = [
+        split for split in range(number_of_splits) if split not in completed_splits
+    ]
+
+    for split, batches in get_download_split_batches(
+        bigquery_client, month, pending_splits, workers, number_of_splits
+    ):
+        load_download_split(sqlmodel_engine, month, split, number_of_splits, batches)
+
+    # with `replace`, the new partition is built and committed on its own,
+    # so that only the swap locks download
+    with sqlmodel_engine.begin() as connection:
+        count_processed = connection.execute(
+            text("SELECT count(*) FROM downloadsplit WHERE month = :month"),
+            {"month": month},
+        ).scalar_one()
+        if replace:
+            count_created = build_month_partition(connection, month, import_time)
+            count_updated = 0
+        else:
+            count_created, count_updated = upsert_month(connection, month, import_time)
+        count_not_found = connection.execute(
+            text(
+                """
+                SELECT count(*) FROM downloadsplit
+                WHERE month = :month AND NOT EXISTS (
+                  SELECT 1 FROM package
+                  WHERE package.normalized_name = downloadsplit.normalized_name
+                )
+                """
+            ),
+            {"month": month},
+        ).scalar_one()
+        if not replace:
+            finish_month(connection, month, import_time)
+
+    if replace:
+        replace_month(sqlmodel_engine, month, import_time)
+
+    logger.info(
+        f"🟢 processed {count_processed} downloads: {count_created} created, {count_updated} updated, {count_not_found} packages not found"
+    )
+
+
+def import_downloads(
+    month: datetime,
+    streaming: bool = False,
+    workers: int = 1,
+    number_of_splits: int = DEFAULT_NUMBER_OF_SPLITS,
+    bigquery_client: Client | None = None,
+    replace: bool = False,
+):
     load_dotenv()  # pyright: ignore[reportUnusedCallResult]
 
     logger.info(f"Importing downloads for {month.isoformat()}")
 
-    google_project = os.environ["GOOGLE_CLOUD_PROJECT"]
-    bigquery_client = Client(project=google_project)
+    if bigquery_client is None:
+        bigquery_client = Client(project=os.environ["GOOGLE_CLOUD_PROJECT"])
 
     start_time = time.perf_counter()
-    update_downloads(bigquery_client, month, engine())
+    sqlmodel_engine = engine("importer")
+    if streaming or replace:
+        stream_update_downloads(
+            bigquery_client,
+            month,
+            sqlmodel_engine,
+            workers=workers,
+            number_of_splits=number_of_splits,
+            replace=replace,
+        )
+    else:
+        update_downloads(
+            bigquery_client,
+            month,
+            sqlmodel_engine,
+            workers=workers,
+            number_of_splits=number_of_splits,
+        )
     end_time = time.perf_counter()
 
-    logging.info(f"importing took {end_time-start_time} seconds")
+    logging.info(f"importing took {end_time - start_time} seconds")
 
 
 def get_incomplete_months() -> list[datetime]:
@@ -175,7 +684,7 @@ def get_incomplete_months() -> list[datetime]:
         column("downloads", Integer),
     )
 
-    with Session(engine()) as session:
+    with Session(engine("importer")) as session:
         rows = session.exec(statement).all()  # pyright: ignore[reportArgumentType,reportCallIssue]
 
         return [row for row in rows]
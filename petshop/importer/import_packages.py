@@ -2,15 +2,35 @@
 import datetime
 import logging
 import os
+from collections.abc import Iterable, Iterator
 from typing import cast
 
+import psycopg
+import pyarrow as pa
+import pyarrow.compute as pc
 from google.cloud.bigquery import Client, QueryJobConfig, ScalarQueryParameter
 from google.cloud.bigquery.table import RowIterator
 from sqlalchemy import Engine
-from sqlmodel import Session, select
+from sqlmodel import Session, col, func, select, text
 
 from petshop.db import engine
-from petshop.models import Classifier, Package
+from petshop.importer.checkpoints import (
+    PackagePosition,
+    delete_checkpoints,
+    get_checkpoints,
+    packages_unit,
+    save_checkpoint,
+)
+from petshop.importer.columnar import chunked, copy_batch
+from petshop.importer.enrich_packages import enrich_packages
+from petshop.importer.utils import MAXIMUM_BYTES_BILLED
+from petshop.models import (
+    PACKAGE_NORMALIZED_NAME,
+    Classifier,
+    ImportRun,
+    Package,
+    normalize_name,
+)
 
 # roughly 5 years before project start - do not change light-handedly!
 PACKAGE_UPLOAD_TIME_AFTER = datetime.datetime(2020, 1, 1, 0, 0, 0)
@@ -18,7 +38,44 @@ PACKAGE_UPLOAD_TIME_AFTER = datetime.datetime(2020, 1, 1, 0, 0, 0)
 logger = logging.getLogger(__name__)
 
 
-def get_packages(client: Client, upload_time_after: datetime.datetime) -> RowIterator:
+# BigQuery bills the whole upload_time column no matter the LIMIT, which is
+# still far less than the columns of the packages query, compare the dry-run
+# estimates of the "changed packages probe" in petshop.importer.planner. The
+# watermark is the latest upload already imported, so only later ones count.
+PACKAGES_CHANGED_QUERY = """
+SELECT 1 AS changed
+FROM `bigquery-public-data.pypi.distribution_metadata`
+WHERE upload_time > @upload_time_after
+LIMIT 1
+"""
+
+
+def packages_changed_query_parameters(
+    upload_time_after: datetime.datetime,
+) -> list[ScalarQueryParameter]:
+    return [
+        ScalarQueryParameter("upload_time_after", "TIMESTAMP", upload_time_after),
+    ]
+
+
+def packages_changed(client: Client, upload_time_after: datetime.datetime) -> bool:
+    job_config = QueryJobConfig(
+        maximum_bytes_billed=MAXIMUM_BYTES_BILLED,
+        query_parameters=packages_changed_query_parameters(upload_time_after),
+    )
+    rows = client.query(PACKAGES_CHANGED_QUERY, job_config=job_config).result()
+    changed = bool(rows.total_rows)
+
+    logger.info(
+        f"packages {'changed' if changed else 'unchanged'} since {upload_time_after.isoformat()}"
+    )
+
+    return changed
+
+
+def packages_query(
+    upload_time_after: datetime.datetime,
+) -> tuple[str, list[ScalarQueryParameter]]:
     query = """
     SELECT
         name,
@@ -63,12 +120,19 @@ def get_packages(client: Client, upload_time_after: datetime.datetime) -> RowIte
     FROM `bigquery-public-data.pypi.distribution_metadata`
     WHERE upload_time >= @upload_time_after
     GROUP BY name
-    ORDER BY upload_time ASC
+    ORDER BY upload_time ASC, name ASC
     """
+    query_parameters = [
+        ScalarQueryParameter("upload_time_after", "TIMESTAMP", upload_time_after),
+    ]
+
+    return query, query_parameters
+
+
+def get_packages(client: Client, upload_time_after: datetime.datetime) -> RowIterator:
+    query, query_parameters = packages_query(upload_time_after)
     job_config = QueryJobConfig(
-        query_parameters=[
-            ScalarQueryParameter("upload_time_after", "TIMESTAMP", upload_time_after),
-        ]
+        maximum_bytes_billed=MAXIMUM_BYTES_BILLED, query_parameters=query_parameters
     )
     query_job = client.query(query, job_config=job_config)
     rows = query_job.result()
@@ -80,15 +144,92 @@ def get_packages(client: Client, upload_time_after: datetime.datetime) -> RowIte
 
 def get_latest_update_time(sqlmodel_engine: Engine) -> datetime.datetime | None:
     with Session(sqlmodel_engine) as session:
-        statement = select(Package.upload_time).order_by(Package.upload_time.desc())  # pyright: ignore[reportAttributeAccessIssue]
-        upload_time = session.exec(statement).first()
+        # served from the end of ix_package_upload_time
+        statement = select(func.max(Package.upload_time))
+        upload_time = session.exec(statement).one()
 
         return upload_time
 
 
+def get_import_watermark(
+    sqlmodel_engine: Engine, importer: str = "packages"
+) -> datetime.datetime | None:
+    with Session(sqlmodel_engine) as session:
+        statement = (
+            select(ImportRun.watermark)
+            .where(ImportRun.importer == importer)
+            .order_by(col(ImportRun.finished_at).desc())
+            .limit(1)
+        )
+
+        return session.exec(statement).first()
+
+
+def record_import_run(
+    sqlmodel_engine: Engine,
+    started_at: datetime.datetime,
+    watermark: datetime.datetime | None,
+    importer: str = "packages",
+):
+    with Session(sqlmodel_engine) as session:
+        session.add(
+            ImportRun(
+                importer=importer,
+                started_at=started_at,
+                finished_at=datetime.datetime.now(datetime.timezone.utc),
+                watermark=watermark,
+            )
+        )
+        session.commit()
+
+
+def get_package_position(
+    sqlmodel_engine: Engine, checkpoint_unit: str | None
+) -> PackagePosition | None:
+    if checkpoint_unit is None:
+        return None
+
+    position = get_checkpoints(sqlmodel_engine, "packages", checkpoint_unit).get(
+        checkpoint_unit
+    )
+    if position is None:
+        return None
+
+    resume_after = PackagePosition.from_json(position)
+    logger.info(f"resuming after {resume_after.name} ({resume_after.upload_time})")
+
+    return resume_after
+
+
+def skip_imported_batches(
+    batches: Iterable[pa.RecordBatch], resume_after: PackagePosition | None
+) -> Iterator[pa.RecordBatch]:
+    """Drop the rows up to `resume_after` from batches ordered by upload time and name."""
+    for batch in batches:
+        if resume_after is not None:
+            upload_times = batch.column("upload_time")
+            upload_time = pa.scalar(resume_after.upload_time, upload_times.type)
+            batch = batch.filter(
+                pc.or_(
+                    pc.greater(upload_times, upload_time),
+                    pc.and_(
+                        pc.equal(upload_times, upload_time),
+                        pc.greater(batch.column("name"), resume_after.name),
+                    ),
+                )
+            )
+        if batch.num_rows > 0:
+            yield batch
+
+
 def update_packages(
-    sqlmodel_engine: Engine, package_rows: RowIterator, commit_every_nth_row: int = 5000
+    sqlmodel_engine: Engine,
+    package_rows: RowIterator,
+    commit_every_nth_row: int = 5000,
+    checkpoint_unit: str | None = None,
 ):
+    resume_after = get_package_position(sqlmodel_engine, checkpoint_unit)
+
     with Session(sqlmodel_engine) as session:
         classifiers_by_name = {
             classifier.name: classifier
@@ -98,9 +239,16 @@ def update_packages(
         keys = [cast(str, field.name) for field in package_rows.schema]
 
         for index, row in enumerate(package_rows):
+            position = PackagePosition(row.upload_time, row.name)
+            if resume_after is not None and position <= resume_after:
+                continue
+
             logger.debug(f"Processing {row.name} {row.version} ({row.upload_time})")
 
-            statement = select(Package).where(Package.name == row.name)
+            # renamed packages keep their id, even if only the case changed
+            statement = select(Package).where(
+                Package.normalized_name == normalize_name(row.name)
+            )
             package = session.exec(statement).first()
 
             if package:
@@ -118,24 +266,198 @@ def update_packages(
 
             if index > 0 and index % commit_every_nth_row == 0:
                 logger.info(f"🟢 committing {commit_every_nth_row} rows")
+                if checkpoint_unit is not None:
+                    save_checkpoint(
+                        session.connection(),
+                        "packages",
+                        checkpoint_unit,
+                        position.to_json(),
+                    )
                 session.commit()
 
         logger.info("🟢 committing leftover rows")
         session.commit()
 
 
-def import_packages():
-    sqlmodel_engine = engine()
+def bulk_update_packages(
+    sqlmodel_engine: Engine,
+    package_rows: RowIterator,
+    batch_size: int = 10000,
+    checkpoint_unit: str | None = None,
+):
+    """Upsert packages through a staging table, batch by batch.
 
-    google_project = os.environ["GOOGLE_CLOUD_PROJECT"]
-    bigquery_client = Client(project=google_project)
+    Rows are fetched as Arrow record batches and copied into the staging
+    table as CSV, so no Python objects are created per row or value. With a
+    checkpoint unit, each batch saves the position of its last row, and the
+    rows up to the saved position are skipped.
+    """
+    resume_after = get_package_position(sqlmodel_engine, checkpoint_unit)
+    keys = [cast(str, field.name) for field in package_rows.schema]
+    package_columns = [
+        column.name for column in Package.__table__.columns if column.name in keys
+    ]
+    column_list = ", ".join(package_columns)
+    update_list = ", ".join(
+        f"{column} = EXCLUDED.{column}" for column in package_columns
+    )
+
+    with sqlmodel_engine.connect() as connection:
+        cursor = cast(
+            psycopg.Connection, connection.connection.driver_connection
+        ).cursor()
+
+        batches = skip_imported_batches(package_rows.to_arrow_iterable(), resume_after)
+        for chunk in chunked(batches, batch_size):
+            connection.execute(
+                text(
+                    f"""
+                    CREATE TEMPORARY TABLE package_staging ON COMMIT DROP AS
+                    SELECT {column_list} FROM package WITH NO DATA
+                    """
+                )
+            )
+            connection.execute(
+                text(
+                    "ALTER TABLE package_staging ADD COLUMN classifiers_array varchar[]"
+                )
+            )
+
+            with cursor.copy(
+                f"COPY package_staging ({', '.join(keys)}) FROM STDIN (FORMAT csv)"
+            ) as copy:
+                for batch in chunk:
+                    copy_batch(copy, batch.select(keys))
+
+            # BigQuery groups by name, which may differ in case or separators
+            # for the same package, so keep only the latest spelling. Packages
+            # without a new upload are left alone, and their rows are dropped
+            # from the staging table with those of other spellings, so that
+            # their classifiers are not relinked either
+            connection.execute(
+                text(
+                    f"""
+                    WITH upserted AS (
+                      INSERT INTO package ({column_list})
+                      SELECT DISTINCT ON ({PACKAGE_NORMALIZED_NAME}) {column_list}
+                      FROM package_staging
+                      ORDER BY {PACKAGE_NORMALIZED_NAME}, upload_time DESC
+                      ON CONFLICT (normalized_name) DO UPDATE SET {update_list}
+                      WHERE package.upload_time IS DISTINCT FROM EXCLUDED.upload_time
+                      RETURNING name
+                    )
+                    DELETE FROM package_staging
+                    WHERE NOT EXISTS (
+                      SELECT 1 FROM upserted WHERE upserted.name = package_staging.name
+                    )
+                    """
+                )
+            )
+            connection.execute(
+                text(
+                    """
+                    INSERT INTO classifier (name)
+                    SELECT DISTINCT classifier_name
+                    FROM package_staging, unnest(classifiers_array) AS classifier_name
+                    WHERE NOT EXISTS (
+                      SELECT 1 FROM classifier WHERE classifier.name = classifier_name
+                    )
+                    """
+                )
+            )
+            connection.execute(
+                text(
+                    """
+                    DELETE FROM classifierpackagelink
+                    USING package, package_staging
+                    WHERE classifierpackagelink.package_id = package.id
+                      AND package.name = package_staging.name
+                    """
+                )
+            )
+            connection.execute(
+                text(
+                    """
+                    INSERT INTO classifierpackagelink (classifier_id, package_id)
+                    SELECT DISTINCT classifier.id, package.id
+                    FROM package_staging
+                    JOIN package ON package.name = package_staging.name
+                    CROSS JOIN unnest(package_staging.classifiers_array) AS classifier_name
+                    JOIN classifier ON classifier.name = classifier_name
+                    """
+                )
+            )
+            if checkpoint_unit is not None:
+                last_row = chunk[-1].slice(chunk[-1].num_rows - 1).to_pylist()[0]
+                position = PackagePosition(last_row["upload_time"], last_row["name"])
+                save_checkpoint(
+                    connection, "packages", checkpoint_unit, position.to_json()
+                )
+            connection.commit()
+
+            logger.info(f"🟢 committed {sum(batch.num_rows for batch in chunk)} rows")
 
-    upload_time_after = (
-        get_latest_update_time(sqlmodel_engine) or PACKAGE_UPLOAD_TIME_AFTER
+
+def get_upload_time_after(sqlmodel_engine: Engine) -> datetime.datetime:
+    return (
+        get_import_watermark(sqlmodel_engine)
+        or get_latest_update_time(sqlmodel_engine)
+        or PACKAGE_UPLOAD_TIME_AFTER
     )
+
+
+def import_packages(
+    bulk: bool = False,
+    incremental: bool = False,
+    bigquery_client: Client | None = None,
+    restart: bool = False,
+):
+    """Import packages uploaded since the watermark of the last run.
+
+    In incremental mode, a cheap probe checks for uploads since the watermark
+    first, and the packages query is skipped without any.
+
+    An interrupted import resumes after the last committed package, unless
+    `restart` is set. The query is the same, so `--cache` replays it for free.
+
+    Afterwards, the flags of the imported packages are derived, see
+    petshop.importer.enrich_packages.
+    """
+    sqlmodel_engine = engine("importer")
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+
+    google_project = os.environ["GOOGLE_CLOUD_PROJECT"]
+    if bigquery_client is None:
+        bigquery_client = Client(project=google_project)
+
+    upload_time_after = get_upload_time_after(sqlmodel_engine)
     logger.info(
         f"Importing PyPI packages from Google BigQuery (project: {google_project}, starting: {upload_time_after.isoformat()})"
     )
 
-    package_rows = get_packages(bigquery_client, upload_time_after)
-    update_packages(sqlmodel_engine, package_rows)
+    checkpoint_unit = packages_unit(upload_time_after)
+    with sqlmodel_engine.begin() as connection:
+        # positions are only meaningful for the same query
+        for unit in get_checkpoints(sqlmodel_engine, "packages"):
+            if restart or unit != checkpoint_unit:
+                delete_checkpoints(connection, "packages", unit)
+
+    if not incremental or packages_changed(bigquery_client, upload_time_after):
+        package_rows = get_packages(bigquery_client, upload_time_after)
+        if bulk:
+            bulk_update_packages(
+                sqlmodel_engine, package_rows, checkpoint_unit=checkpoint_unit
+            )
+        else:
+            update_packages(
+                sqlmodel_engine, package_rows, checkpoint_unit=checkpoint_unit
+            )
+
+    enrich_packages(sqlmodel_engine, upload_time_after)
+    record_import_run(
+        sqlmodel_engine,
+        started_at,
+        get_latest_update_time(sqlmodel_engine) or upload_time_after,
+    )
+    with sqlmodel_engine.begin() as connection:
+        delete_checkpoints(connection, "packages", checkpoint_unit)
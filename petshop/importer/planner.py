@@ -0,0 +1,173 @@
+import math
+import re
+from calendar import monthrange
+from collections.abc import Sequence
+from datetime import datetime
+from typing import NamedTuple
+
+from dateutil.relativedelta import relativedelta
+from google.cloud.bigquery import (
+    ArrayQueryParameter,
+    Client,
+    QueryJobConfig,
+    ScalarQueryParameter,
+)
+
+from petshop.importer.import_downloads import (
+    DOWNLOADS_QUERY,
+    downloads_query_parameters,
+)
+from petshop.importer.import_packages import (
+    PACKAGES_CHANGED_QUERY,
+    packages_changed_query_parameters,
+    packages_query,
+)
+from petshop.importer.utils import MAXIMUM_BYTES_BILLED, split_month
+
+BYTE_UNITS = ["B", "KiB", "MiB", "GiB", "TiB", "PiB"]
+
+
+class QueryPlan(NamedTuple):
+    description: str
+    bytes_processed: int
+
+
+class MonthPlan(NamedTuple):
+    month: datetime
+    splits: list[QueryPlan]
+
+    @property
+    def number_of_splits(self) -> int:
+        return len(self.splits)
+
+    @property
+    def bytes_processed(self) -> int:
+        return sum(split.bytes_processed for split in self.splits)
+
+
+def format_bytes(value: int) -> str:
+    size = float(value)
+    unit = BYTE_UNITS[0]
+    for unit in BYTE_UNITS:
+        if size < 1024 or unit == BYTE_UNITS[-1]:
+            break
+        size /= 1024
+
+    return f"{size:.1f} {unit}"
+
+
+def parse_bytes(value: str) -> int:
+    """Parse sizes like `500G` or `1.5TiB` into bytes, with binary units."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)(?:i?B)?\s*", value, re.I)
+    if not match:
+        raise ValueError(f"invalid size: {value}")
+
+    number, unit = match.groups()
+
+    return int(float(number) * 1024 ** "BKMGTP".index(unit.upper() or "B"))
+
+
+def estimate_bytes(
+    client: Client,
+    query: str,
+    query_parameters: Sequence[ScalarQueryParameter | ArrayQueryParameter],
+) -> int:
+    # dry runs are free and report the bytes the query would be billed for
+    job_config = QueryJobConfig(
+        dry_run=True, use_query_cache=False, query_parameters=query_parameters
+    )
+    query_job = client.query(query, job_config=job_config)
+
+    return query_job.total_bytes_processed or 0
+
+
+def plan_month(
+    client: Client,
+    month: datetime,
+    min_splits: int = 1,
+    max_bytes_per_query: int = MAXIMUM_BYTES_BILLED,
+) -> MonthPlan:
+    """Split a month into as few download queries as stay below the limit.
+
+    More splits than that only add jobs, but `min_splits` allows to keep
+    concurrent workers busy. A split cannot be shorter than a day, which is
+    the partition size of pypi.file_downloads.
+    """
+    month_bytes = estimate_bytes(
+        client,
+        DOWNLOADS_QUERY,
+        downloads_query_parameters(month, month + relativedelta(months=1)),
+    )
+    _, days_in_month = monthrange(month.year, month.month)
+    number_of_splits = min(
+        max(math.ceil(month_bytes / max_bytes_per_query), min_splits, 1),
+        days_in_month,
+    )
+
+    splits = [
+        QueryPlan(
+            f"downloads {start_time:%Y-%m-%d} to {end_time:%Y-%m-%d}",
+            estimate_bytes(
+                client,
+                DOWNLOADS_QUERY,
+                downloads_query_parameters(start_time, end_time),
+            ),
+        )
+        for start_time, end_time in split_month(
+            month.year, month.month, number_of_splits
+        )
+    ]
+
+    return MonthPlan(month, splits)
+
+
+def plan_packages(
+    client: Client, upload_time_after: datetime, incremental: bool = False
+) -> list[QueryPlan]:
+    plans: list[QueryPlan] = []
+    if incremental:
+        plans.append(
+            QueryPlan(
+                "changed packages probe",
+                estimate_bytes(
+                    client,
+                    PACKAGES_CHANGED_QUERY,
+                    packages_changed_query_parameters(upload_time_after),
+                ),
+            )
+        )
+
+    # estimated as if the probe found changes
+    query, query_parameters = packages_query(upload_time_after)
+    plans.append(QueryPlan("packages", estimate_bytes(client, query, query_parameters)))
+
+    return plans
+
+
+def within_budget(plans: Sequence[MonthPlan], budget: int | None) -> list[MonthPlan]:
+    """Return the leading months whose queries fit into the budget together."""
+    if budget is None:
+        return list(plans)
+
+    affordable: list[MonthPlan] = []
+    total = 0
+    for plan in plans:
+        total += plan.bytes_processed
+        if total > budget:
+            break
+        affordable.append(plan)
+
+    return affordable
+
+
+def format_month_plan(plan: MonthPlan) -> str:
+    lines = [
+        f"{plan.month:%Y-%m}: {plan.number_of_splits} splits,"
+        f" {format_bytes(plan.bytes_processed)}"
+    ]
+    lines.extend(
+        f"  {split.description}: {format_bytes(split.bytes_processed)}"
+        for split in plan.splits
+    )
+
+    return "\n".join(lines)
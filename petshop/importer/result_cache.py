@@ -0,0 +1,257 @@
+# pyright: reportUnknownVariableType=false,reportUnknownMemberType=false,reportUnknownArgumentType=false
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import pyarrow as pa
+from google.cloud.bigquery import Client, QueryJob, QueryJobConfig, Row, SchemaField
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_directory() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME", Path.home().joinpath(".cache"))
+
+    return Path(os.environ.get("BIGQUERY_CACHE_DIR", Path(cache_home, "petshop")))
+
+
+def default_ttl() -> timedelta:
+    return timedelta(days=float(os.environ.get("BIGQUERY_CACHE_TTL_DAYS", "30")))
+
+
+class CacheEntry(NamedTuple):
+    key: str
+    query: str
+    parameters: list[dict[str, Any]]
+    columns: list[str]
+    rows: int
+    created_at: datetime
+    expires_at: datetime
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at <= datetime.now(timezone.utc)
+
+
+class ResultCache:
+    """BigQuery result sets stored as Arrow IPC files.
+
+    Entries are keyed by the query text and its parameters and listed in a
+    manifest with their expiry time. Arrow IPC rather than Parquet, because
+    it can be memory-mapped and read back without decoding or copying.
+    """
+
+    def __init__(self, directory: Path | None = None, ttl: timedelta | None = None):
+        self.directory = directory or default_cache_directory()
+        self.ttl = ttl or default_ttl()
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory.joinpath("manifest.json")
+
+    def path(self, key: str) -> Path:
+        return self.directory.joinpath(f"{key}.arrow")
+
+    def key(self, query: str, parameters: list[dict[str, Any]]) -> str:
+        payload = json.dumps([query, parameters], sort_keys=True)
+
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def entries(self) -> list[CacheEntry]:
+        try:
+            manifest = json.loads(self.manifest_path.read_text())
+        except FileNotFoundError:
+            return []
+
+        return [
+            CacheEntry(
+                **{
+                    **entry,
+                    "created_at": datetime.fromisoformat(entry["created_at"]),
+                    "expires_at": datetime.fromisoformat(entry["expires_at"]),
+                }
+            )
+            for entry in manifest.values()
+        ]
+
+    def _write_manifest(self, entries: Iterable[CacheEntry]):
+        manifest = {
+            entry.key: {
+                **entry._asdict(),
+                "created_at": entry.created_at.isoformat(),
+                "expires_at": entry.expires_at.isoformat(),
+            }
+            for entry in entries
+        }
+        temporary_path = self.manifest_path.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(manifest, indent=2))
+        temporary_path.replace(self.manifest_path)
+
+    def entry(self, key: str) -> CacheEntry | None:
+        entry = next((entry for entry in self.entries() if entry.key == key), None)
+        if entry is None or entry.is_expired or not self.path(key).exists():
+            return None
+
+        return entry
+
+    def get(self, key: str) -> tuple[CacheEntry, pa.Table] | None:
+        entry = self.entry(key)
+        if entry is None:
+            return None
+
+        return entry, self.read(key)
+
+    def read(self, key: str) -> pa.Table:
+        # the table references the mapped pages instead of copying them
+        with pa.memory_map(str(self.path(key))) as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def put(
+        self,
+        key: str,
+        query: str,
+        parameters: list[dict[str, Any]],
+        columns: list[str],
+        batches: Iterable[pa.RecordBatch],
+    ) -> tuple[CacheEntry, pa.Table]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path(key).with_suffix(f".{threading.get_ident()}.tmp")
+
+        rows = 0
+        writer = None
+        for batch in batches:
+            if writer is None:
+                writer = pa.ipc.new_file(str(temporary_path), batch.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        if writer is None:
+            # an empty result has no batches to take the schema from
+            schema = pa.schema([(column, pa.null()) for column in columns])
+            writer = pa.ipc.new_file(str(temporary_path), schema)
+        writer.close()
+        temporary_path.replace(self.path(key))
+
+        created_at = datetime.now(timezone.utc)
+        entry = CacheEntry(
+            key, query, parameters, columns, rows, created_at, created_at + self.ttl
+        )
+        with self._lock:
+            entries = [other for other in self.entries() if other.key != key]
+            self._write_manifest([*entries, entry])
+        logger.info(f"cached {rows} rows of query {key[:12]}")
+
+        return entry, self.read(key)
+
+    def purge(self, expired_only: bool = False) -> int:
+        with self._lock:
+            entries = self.entries()
+            purged = [e for e in entries if e.is_expired or not expired_only]
+            for entry in purged:
+                self.path(entry.key).unlink(missing_ok=True)
+            self._write_manifest(e for e in entries if e not in purged)
+
+        return len(purged)
+
+
+def format_entry(entry: CacheEntry) -> str:
+    parameters = ", ".join(
+        f"{parameter['name']}={parameter['parameterValue'].get('value', '[...]')}"
+        for parameter in entry.parameters
+    )
+    status = "expired" if entry.is_expired else f"expires {entry.expires_at:%Y-%m-%d}"
+
+    return f"{entry.key[:12]}  {entry.rows:>9} rows  {status}  {parameters}"
+
+
+class CachedRowIterator:
+    """Iterates the rows of a cached table like a BigQuery RowIterator."""
+
+    def __init__(self, entry: CacheEntry, table: pa.Table, job_id: str | None):
+        self.table = table
+        self.schema = [SchemaField(column, "STRING") for column in entry.columns]
+        self.total_rows = table.num_rows
+        self.job_id = job_id
+
+    def __iter__(self) -> Iterator[Row]:
+        field_to_index = {field.name: index for index, field in enumerate(self.schema)}
+        for batch in self.table.to_batches():
+            for values in zip(*(column.to_pylist() for column in batch.columns)):
+                yield Row(values, field_to_index)
+
+    def to_arrow_iterable(self) -> Iterator[pa.RecordBatch]:
+        return iter(self.table.to_batches())
+
+
+class CachedQueryJob:
+    def __init__(
+        self,
+        client: Client,
+        cache: ResultCache,
+        query: str,
+        job_config: QueryJobConfig | None,
+        job_id: str | None,
+    ):
+        self.client = client
+        self.cache = cache
+        self.query = query
+        self.job_config = job_config
+        self.parameters = [
+            parameter.to_api_repr()
+            for parameter in (job_config.query_parameters if job_config else [])
+        ]
+        self.key = cache.key(query, self.parameters)
+        self.query_job = None
+        if cache.entry(self.key) is None:
+            # submit right away, so that BigQuery runs cache misses concurrently
+            self.query_job = self.submit(job_id)
+        self.job_id = self.query_job.job_id if self.query_job else job_id
+
+    def submit(self, job_id: str | None) -> QueryJob:
+        return self.client.query(self.query, job_config=self.job_config, job_id=job_id)
+
+    def result(self) -> CachedRowIterator:
+        cached = self.cache.get(self.key)
+        if cached is None:
+            # the entry may also have expired since the job was created
+            query_job = self.query_job or self.submit(self.job_id)
+            rows = query_job.result()
+            cached = self.cache.put(
+                self.key,
+                self.query,
+                self.parameters,
+                [field.name for field in rows.schema],
+                rows.to_arrow_iterable(),
+            )
+        else:
+            logger.info(f"bigquery job {self.job_id}: replaying cached result")
+
+        return CachedRowIterator(*cached, self.job_id)
+
+
+class CachingClient:
+    """Answers queries from a ResultCache, and BigQuery only on cache misses.
+
+    Dry runs always go to BigQuery, since they are free.
+    """
+
+    def __init__(self, client: Client, cache: ResultCache):
+        self.client = client
+        self.cache = cache
+
+    def query(
+        self,
+        query: str,
+        job_config: QueryJobConfig | None = None,
+        job_id: str | None = None,
+    ) -> QueryJob | CachedQueryJob:
+        if job_config is not None and job_config.dry_run:
+            return self.client.query(query, job_config=job_config, job_id=job_id)
+
+        return CachedQueryJob(self.client, self.cache, query, job_config, job_id)
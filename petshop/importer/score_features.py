@@ -0,0 +1,238 @@
+# pyright: reportUnknownVariableType=false,reportUnknownMemberType=false,reportUnknownArgumentType=false
+"""Ranking features of packages, computed from their monthly downloads.
+
+The downloads of the last months are copied out of Postgres once and laid
+out as a dense (package × month) matrix, so that every feature is a handful
+of vectorized operations over all packages at once, instead of a window
+function evaluated per package and month.
+"""
+
+import io
+import logging
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple, cast
+
+import numpy as np
+import psycopg
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+from sqlalchemy import Connection, Engine
+from sqlmodel import text
+
+from petshop.importer.columnar import copy_batch
+from petshop.models import SCORE_DOWNLOADS_HALF_LIFE_MONTHS
+
+# older downloads weigh less than 1/1000 with the default half-life
+DEFAULT_MONTHS = 60
+# the window of the slope and of the z-score of the latest month
+TREND_MONTHS = 12
+ROLLING_MEAN_MONTHS = 3
+
+# the latest month imported after it was over, like in PackageScore
+REFERENCE_MONTH_QUERY = """
+SELECT coalesce(
+  max(month) FILTER (WHERE imported_at >= month + interval '1 month'),
+  max(month)
+)
+FROM download
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadMatrix(NamedTuple):
+    """Downloads per package (rows, by package id) and month (columns, the
+    latest month last)."""
+
+    package_ids: np.ndarray
+    reference_month: datetime
+    downloads: np.ndarray
+
+
+class ScoreFeatures(NamedTuple):
+    package_ids: np.ndarray
+    decayed_downloads: np.ndarray
+    rolling_mean: np.ndarray
+    slope: np.ndarray
+    zscore: np.ndarray
+
+
+def get_reference_month(connection: Connection) -> datetime | None:
+    return connection.execute(text(REFERENCE_MONTH_QUERY)).scalar_one()
+
+
+def load_download_matrix(
+    connection: Connection, reference_month: datetime, months: int = DEFAULT_MONTHS
+) -> DownloadMatrix:
+    """Copy the downloads of the `months` months up to the reference month
+    out of Postgres, and scatter them into a dense matrix.
+
+    Postgres sends a message per row copied, which costs more than the
+    aggregation, so the months and downloads are copied as one row per
+    package with space-separated lists that Arrow splits column-wise.
+
+    The matrix takes 8 bytes per package and month, so about 240 MB for
+    500k packages over 60 months.
+    """
+    reference_date = f"DATE '{reference_month:%Y-%m-%d}'"
+    # COPY takes no parameters, so the month and the number of months are
+    # formatted into the query
+    query = f"""
+        COPY (
+          SELECT
+            package_id,
+            string_agg(({reference_date} - CAST(month AS date))::text, ' ') AS days_ago,
+            string_agg(downloads::text, ' ') AS downloads
+          FROM download
+          WHERE month <= {reference_date}
+            AND month > {reference_date} - interval '{int(months)} months'
+          GROUP BY package_id
+          ORDER BY package_id
+        ) TO STDOUT (FORMAT csv)
+    """
+    buffer = io.BytesIO()
+    cursor = cast(psycopg.Connection, connection.connection.driver_connection).cursor()
+    with cursor.copy(query) as copy:
+        for data in copy:
+            buffer.write(data)
+    if buffer.tell() == 0:
+        return DownloadMatrix(
+            np.array([], dtype=np.int64), reference_month, np.zeros((0, months))
+        )
+    buffer.seek(0)
+
+    table = pa_csv.read_csv(
+        buffer,
+        read_options=pa_csv.ReadOptions(
+            column_names=["package_id", "days_ago", "downloads"]
+        ),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={
+                "package_id": pa.int64(),
+                "days_ago": pa.string(),
+                "downloads": pa.string(),
+            }
+        ),
+    )
+    days_ago = pc.split_pattern(table.column("days_ago"), " ")
+    rows = np.repeat(
+        np.arange(table.num_rows), pc.list_value_length(days_ago).to_numpy()
+    )
+    month_of_row = (
+        np.datetime64(reference_month, "D")
+        - pc.list_flatten(days_ago).cast(pa.int64()).to_numpy()
+    ).astype("datetime64[M]")
+    months_ago = (np.datetime64(reference_month, "M") - month_of_row).astype(np.int64)
+    values = pc.list_flatten(pc.split_pattern(table.column("downloads"), " "))
+
+    downloads = np.zeros((table.num_rows, months))
+    # (package_id, month) is the primary key, so no cell is written twice
+    downloads[rows, months - 1 - months_ago] = values.cast(pa.float64()).to_numpy()
+
+    return DownloadMatrix(
+        table.column("package_id").to_numpy(), reference_month, downloads
+    )
+
+
+def compute_score_features(
+    matrix: DownloadMatrix,
+    half_life: float = SCORE_DOWNLOADS_HALF_LIFE_MONTHS,
+    trend_months: int = TREND_MONTHS,
+    rolling_mean_months: int = ROLLING_MEAN_MONTHS,
+) -> ScoreFeatures:
+    """Compute the features of all packages from the latest month backwards.
+
+    - decayed_downloads: downloads weighted by 0.5 ** (months ago / half-life)
+    - rolling_mean: the mean of the latest `rolling_mean_months` months
+    - slope: the least squares slope over the latest `trend_months` months,
+      in downloads per month
+    - zscore: how far the latest month deviates from the `trend_months`
+      months before, in standard deviations, or 0 without any deviation
+    """
+    downloads = matrix.downloads
+    months = downloads.shape[1]
+    months_ago = np.arange(months - 1, -1, -1)
+
+    decayed_downloads = downloads @ (0.5 ** (months_ago / half_life))
+
+    rolling_mean = downloads[:, -rolling_mean_months:].mean(axis=1)
+
+    trend = downloads[:, -trend_months:]
+    x = np.arange(trend.shape[1], dtype=np.float64)
+    x -= x.mean()
+    slope = (trend - trend.mean(axis=1, keepdims=True)) @ x / (x @ x)
+
+    history = downloads[:, -trend_months - 1 : -1]
+    if history.shape[1] == 0:
+        zscore = np.zeros(len(downloads))
+    else:
+        mean = history.mean(axis=1)
+        std = history.std(axis=1)
+        zscore = np.divide(
+            downloads[:, -1] - mean,
+            std,
+            out=np.zeros(len(downloads)),
+            where=std > 0,
+        )
+
+    return ScoreFeatures(
+        matrix.package_ids, decayed_downloads, rolling_mean, slope, zscore
+    )
+
+
+def write_score_features(
+    connection: Connection, features: ScoreFeatures, computed_at: datetime
+):
+    """Replace all features with a single COPY."""
+    batch = pa.RecordBatch.from_arrays(
+        [
+            pa.array(features.package_ids),
+            pa.array(features.decayed_downloads),
+            pa.array(features.rolling_mean),
+            pa.array(features.slope),
+            pa.array(features.zscore),
+            pa.repeat(
+                pa.scalar(computed_at, pa.timestamp("us")), len(features.package_ids)
+            ),
+        ],
+        names=[
+            "package_id",
+            "decayed_downloads",
+            "rolling_mean",
+            "slope",
+            "zscore",
+            "computed_at",
+        ],
+    )
+    connection.execute(text("DELETE FROM packagefeatures"))
+    cursor = cast(psycopg.Connection, connection.connection.driver_connection).cursor()
+    with cursor.copy(
+        f"COPY packagefeatures ({', '.join(batch.schema.names)}) FROM STDIN (FORMAT csv)"
+    ) as copy:
+        copy_batch(copy, batch)
+
+
+def update_score_features(sqlmodel_engine: Engine, months: int = DEFAULT_MONTHS):
+    """Recompute the score features of all packages, in one transaction."""
+    start_time = time.perf_counter()
+    computed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    with sqlmodel_engine.begin() as connection:
+        reference_month = get_reference_month(connection)
+        if reference_month is None:
+            logger.info("no downloads imported, skipping score features")
+            return
+
+        logger.info(
+            f"loading {months} months of downloads up to {reference_month:%Y-%m}"
+        )
+        matrix = load_download_matrix(connection, reference_month, months)
+        features = compute_score_features(matrix)
+        write_score_features(connection, features, computed_at)
+
+    end_time = time.perf_counter()
+    logger.info(
+        f"🟢 computed score features of {len(features.package_ids)} packages in {end_time - start_time} seconds"
+    )
@@ -4,6 +4,8 @@ from datetime import date, datetime
 
 from dateutil.relativedelta import relativedelta
 
+MAXIMUM_BYTES_BILLED = 1024 * 1024 * 1024 * 1024 - 1  # < 1 TB
+
 
 def month_list(start: datetime, end: datetime) -> Iterator[date]:
     month = start
@@ -1,8 +1,19 @@
 # pyright: reportUnknownVariableType=false,reportUnknownMemberType=false,reportUnknownArgumentType=false
+import re
 from datetime import datetime
 from typing import Any, Type
 
-from sqlalchemy import Selectable, TableClause
+from sqlalchemy import (
+    ColumnElement,
+    Computed,
+    Selectable,
+    SmallInteger,
+    TableClause,
+    and_,
+    literal_column,
+    true,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import registry
 from sqlalchemy.util import classproperty
 from sqlalchemy_utils import create_materialized_view
@@ -11,9 +22,11 @@ from sqlmodel import (
     Column,
     Field,
     Index,
+    Float,
     Relationship,
     SQLModel,
     String,
+    cast,
     col,
     func,
 )
@@ -62,14 +75,31 @@ class Classifier(Base, table=True):
     )
 
 
+# weighted so that matches in the name rank above the summary and keywords
+PACKAGE_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A')"
+    " || setweight(to_tsvector('english', coalesce(summary, '')), 'B')"
+    " || setweight(to_tsvector('english', coalesce(keywords, '')), 'C')"
+)
+
+
+# https://peps.python.org/pep-0503/#normalized-names
+PACKAGE_NORMALIZED_NAME = "lower(regexp_replace(name, '[-_.]+', '-', 'g'))"
+
+
+def normalize_name(name: str) -> str:
+    # the same as PACKAGE_NORMALIZED_NAME
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
 class PackageBase(Base):
-    name: str = Field(index=True)
+    name: str = Field(index=True, unique=True)
     version: str
     summary: str | None
     description: str | None
     description_content_type: str | None
     home_page: str | None
-    upload_time: datetime
+    upload_time: datetime = Field(index=True)
 
 
 class Package(PackageBase, table=True):
@@ -105,6 +135,31 @@ class Package(PackageBase, table=True):
     blake2_256_digest: str | None
     license_expression: str | None
     license_files: list[str] | None = Field(sa_column=Column(ARRAY(String)))
+    normalized_name: str | None = Field(
+        default=None,
+        exclude=True,
+        sa_column=Column(
+            String,
+            Computed(PACKAGE_NORMALIZED_NAME, persisted=True),
+            index=True,
+            unique=True,
+        ),
+    )
+    search_vector: str | None = Field(
+        default=None,
+        exclude=True,
+        sa_column=Column(
+            TSVECTOR, Computed(PACKAGE_SEARCH_VECTOR, persisted=True), nullable=True
+        ),
+    )
+
+    # derived by petshop.importer.enrich_packages, with partial indexes on the
+    # packages they hold for
+    is_prerelease: bool | None = Field(default=None, exclude=True)
+    dev_status: int | None = Field(default=None, exclude=True, sa_type=SmallInteger)
+    is_abandoned: bool | None = Field(default=None, exclude=True)
+    is_app: bool | None = Field(default=None, exclude=True)
+    is_library: bool | None = Field(default=None, exclude=True)
 
     classifiers: list["Classifier"] = Relationship(
         back_populates="packages", link_model=ClassifierPackageLink
@@ -113,20 +168,112 @@ class Package(PackageBase, table=True):
     downloads: list["Download"] = Relationship(back_populates="package")
 
 
+class PackagePublic(PackageBase):
+    id: int
+    downloads_total: int
+
+
+class PackageListItem(SQLModel):
+    id: int
+    name: str
+    downloads_total: int
+
+
+class FacetCount(SQLModel):
+    value: str
+    count: int
+
+
+class Facets(SQLModel):
+    classifiers: list[FacetCount]
+    licenses: list[FacetCount]
+    requires_python: list[FacetCount]
+
+
+class PackagePage(SQLModel):
+    packages: list[PackageListItem]
+    next_cursor: str | None
+    # only on the first page, and left out when counting takes too long
+    facets: Facets | None = None
+
+
 class Download(Base, table=True):
-    id: int | None = Field(default=None, primary_key=True)
+    """Downloads of a package in a month.
+
+    The table is partitioned by month, see petshop.db.create_download_partition.
+    The primary key of a partitioned table has to include the partition key.
+    """
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (month)"}
+
+    package_id: int = Field(foreign_key="package.id", primary_key=True)
+    month: datetime = Field(primary_key=True)
     imported_at: datetime
-    package_id: int = Field(foreign_key="package.id", index=True)
     package: Package = Relationship(back_populates="downloads")
-    month: datetime
     downloads: int
 
 
+class ImportRun(Base, table=True):
+    """A finished importer run and the high-water mark it reached."""
+
+    id: int | None = Field(default=None, primary_key=True)
+    importer: str = Field(index=True)
+    started_at: datetime
+    finished_at: datetime
+    watermark: datetime | None
+
+
+class ImportCheckpoint(Base, table=True):
+    """A part of an import that a rerun can skip or resume from.
+
+    Units without a position are finished; otherwise the position tells
+    where to resume within the unit.
+    """
+
+    importer: str = Field(primary_key=True)
+    unit: str = Field(primary_key=True)
+    position: str | None
+    updated_at: datetime
+
+
+class DownloadSplit(Base, table=True):
+    """Downloads of a finished split of a month that is still being imported."""
+
+    id: int | None = Field(default=None, primary_key=True)
+    month: datetime = Field(index=True)
+    normalized_name: str
+    downloads: int
+
+
+class PackageFeatures(Base, table=True):
+    """Ranking features of a package, computed from its monthly downloads by
+    petshop.importer.score_features."""
+
+    package_id: int = Field(foreign_key="package.id", primary_key=True)
+    decayed_downloads: float
+    rolling_mean: float
+    slope: float
+    zscore: float
+    computed_at: datetime
+
+
+class DataGeneration(Base, table=True):
+    """A counter the importers bump once an import is visible to the API.
+
+    It lives in the database, so API processes notice imports run from the
+    CLI and drop responses they cached for the previous generation.
+    """
+
+    id: int | None = Field(default=None, primary_key=True)
+    generation: int
+    updated_at: datetime
+
+
 class DownloadsTotal(ViewBase, table=True):
     __view_query__: Selectable = (
         select(
             col(Package.id).label("package_id"),
-            func.sum(Download.downloads).label("downloads_total"),
+            func.coalesce(func.sum(Download.downloads), 0).label("downloads_total"),
         )
         .join(Download, isouter=True)
         .group_by(col(Package.id))
@@ -136,5 +283,125 @@ class DownloadsTotal(ViewBase, table=True):
             "downloads_total_package_id_fkey",
             "package_id",
             unique=True,
+        ),
+        Index(
+            "ix_downloadstotal_downloads_total",
+            literal_column("downloads_total").desc(),
+            literal_column("package_id").desc(),
+        ),
+    ]
+
+
+# downloads of a month count half as much every half-life before the latest
+# complete month
+SCORE_DOWNLOADS_HALF_LIFE_MONTHS = 6
+# a release counts half as much every half-life before the latest month
+SCORE_RECENCY_HALF_LIFE_DAYS = 730
+# added to the downloads of the previous month, so that a package going from
+# 1 to 100 downloads does not trend above one going from 100k to 200k
+SCORE_GROWTH_SMOOTHING = 1000
+
+
+def month_index(month: Any) -> ColumnElement[float]:
+    # in double precision, because power() of numerics is slow
+    return cast(
+        func.extract("year", month) * 12 + func.extract("month", month),
+        Float(precision=53),
+    )
+
+
+# the latest month imported after it was over, or the running one before that
+score_reference = select(
+    func.coalesce(
+        func.max(Download.month).filter(
+            col(Download.imported_at)
+            >= col(Download.month) + literal_column("interval '1 month'")
+        ),
+        func.max(Download.month),
+        func.date_trunc("month", func.localtimestamp()),
+    ).label("month")
+).cte("reference")
+score_months_ago = month_index(score_reference.c.month) - month_index(
+    col(Download.month)
+)
+score_decayed_downloads = func.coalesce(
+    func.sum(
+        col(Download.downloads)
+        * func.power(0.5, score_months_ago / SCORE_DOWNLOADS_HALF_LIFE_MONTHS)
+    ),
+    0,
+)
+score_recency = func.power(
+    0.5,
+    cast(
+        func.greatest(
+            func.extract("epoch", score_reference.c.month - col(Package.upload_time)),
+            0,
+        ),
+        Float(precision=53),
+    )
+    / (SCORE_RECENCY_HALF_LIFE_DAYS * 24 * 60 * 60),
+)
+score_last_month = func.coalesce(
+    func.sum(col(Download.downloads)).filter(score_months_ago == 0), 0
+)
+score_previous_month = func.coalesce(
+    func.sum(col(Download.downloads)).filter(score_months_ago == 1), 0
+)
+
+
+class PackageScore(ViewBase, table=True):
+    """Precomputed ranking scores of each package.
+
+    - decayed_downloads: monthly downloads, weighted down exponentially by age
+    - growth: downloads of the latest complete month relative to the month
+      before
+    - recency: 1 for a release in the latest month, halving with age
+    - popularity: decayed downloads, weighted down to half by an old release
+
+    Ages are relative to the latest complete month rather than to the time
+    of the refresh, so the scores only change with imports.
+    """
+
+    __view_query__: Selectable = (
+        select(
+            col(Package.id).label("package_id"),
+            cast(score_decayed_downloads, Float(precision=53)).label(
+                "decayed_downloads"
+            ),
+            cast(
+                (score_last_month - score_previous_month)
+                / (score_previous_month + float(SCORE_GROWTH_SMOOTHING)),
+                Float(precision=53),
+            ).label("growth"),
+            cast(score_recency, Float(precision=53)).label("recency"),
+            cast(
+                score_decayed_downloads * (1 + score_recency) / 2,
+                Float(precision=53),
+            ).label("popularity"),
+        )
+        .select_from(Package)
+        .join(score_reference, true())
+        .join(
+            Download,
+            and_(
+                col(Download.package_id) == col(Package.id),
+                col(Download.month) <= score_reference.c.month,
+            ),
+            isouter=True,
         )
+        .group_by(col(Package.id), score_reference.c.month)
+    )
+    __view_indexes__: list[Index] = [
+        Index("ix_packagescore_package_id", "package_id", unique=True),
+        Index(
+            "ix_packagescore_popularity",
+            literal_column("popularity").desc(),
+            literal_column("package_id").desc(),
+        ),
+        Index(
+            "ix_packagescore_growth",
+            literal_column("growth").desc(),
+            literal_column("package_id").desc(),
+        ),
     ]
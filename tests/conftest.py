@@ -1,7 +1,124 @@
+from collections.abc import Generator
+from datetime import datetime
+from typing import Callable
+
 import pytest
 from dotenv import load_dotenv
+from sqlmodel import Session, text
+
+from petshop.db import engine, refresh_materialized_views
+from petshop.models import Base, Classifier, Download, Package
 
 
 @pytest.fixture(scope="session", autouse=True)
 def load_test_env():
     load_dotenv(".env-test")  # pyright: ignore[reportUnusedCallResult]
+
+
+def truncate_tables():
+    table_names = ", ".join(table.name for table in Base.metadata.sorted_tables)
+
+    with engine().begin() as connection:
+        connection.execute(text(f"TRUNCATE {table_names} RESTART IDENTITY CASCADE"))
+
+    refresh_materialized_views(engine(), concurrently=False)
+
+
+@pytest.fixture
+def session() -> Generator[Session, None, None]:
+    truncate_tables()
+
+    with Session(engine()) as session:
+        yield session
+
+
+@pytest.fixture
+def create_classifier(session: Session) -> Callable[[str], Classifier]:
+    def create_classifier(name: str) -> Classifier:
+        classifier = Classifier(name=name)
+        session.add(classifier)
+        session.commit()
+        session.refresh(classifier)
+        # Classifier(name="Development Status :: 5 - Production/Stable"),
+        # Classifier(name="Operating System :: POSIX :: Linux"),
+
+        return classifier
+
+    return create_classifier
+
+
+@pytest.fixture
+def create_package(
+    session: Session,
+) -> Callable[[str, datetime, list[Classifier]], Package]:
+    def create_package(
+        name: str, upload_time: datetime, classifiers: list[Classifier] = []
+    ) -> Package:
+        package = Package(
+            name=name,
+            upload_time=upload_time,
+            metadata_version="METADATA_VERSION",
+            version="VERSION",
+            summary="SUMMARY",
+            description="DESCRIPTION",
+            description_content_type="DESCRIPTION_CONTENT_TYPE",
+            author="AUTHOR",
+            author_email="AUTHOR_EMAIL",
+            maintainer="MAINTAINER",
+            maintainer_email="MAINTAINER_EMAIL",
+            license="LICENSE",
+            keywords="KEYWORDS",
+            classifiers=classifiers,
+            platform=["PLATFORM"],
+            home_page="HOME_PAGE",
+            download_url="DOWNLOAD_URL",
+            requires_python="REQUIRES_PYTHON",
+            requires=["REQUIRED A", "REQUIRED B"],
+            provides=["PROVIDES A", "PROVIDES B"],
+            obsoletes=["OBSOLETES A", "OBSOLETES B"],
+            requires_dist=["REQUIRES_DIST A"],
+            provides_dist=["PROVIDES_DIST A"],
+            obsoletes_dist=["OBSOLETES_DIST A"],
+            requires_external=["REQUIRES_EXTERNAL A"],
+            project_urls=["PROJECT_URL 1"],
+            uploaded_via="UPLOADED_VIA",
+            filename="FILENAME",
+            size=1000,
+            path="PATH",
+            python_version="PYTHON_VERSION",
+            packagetype="PACKAGETYPE",
+            comment_text="COMMENT_TEXT",
+            has_signature=True,
+            md5_digest="MD5_DIGEST",
+            sha256_digest="SHA256_DIGEST",
+            blake2_256_digest="BLAKE2_256_DIGEST",
+            license_expression="LICENSE_EXPRESSION",
+            license_files=["LICENSE_FILE"],
+        )
+        session.add(package)
+        session.commit()
+        session.refresh(package)
+        return package
+
+    return create_package
+
+
+@pytest.fixture
+def create_download(
+    session: Session,
+) -> Callable[[int, datetime, datetime, int], Download]:
+    def create_download(
+        package_id: int, month: datetime, imported_at: datetime, downloads: int = 1234
+    ) -> Download:
+        download = Download(
+            package_id=package_id,
+            month=month,
+            imported_at=imported_at,
+            downloads=downloads,
+        )
+        session.add(download)
+        session.commit()
+        session.refresh(download)
+        return download
+
+    return create_download
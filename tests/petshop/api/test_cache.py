@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from petshop.api.cache import MemoryBackend, ResponseCache
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", b"A")
+    backend.set("b", b"B")
+    assert backend.get("a") == b"A"
+
+    backend.set("c", b"C")
+
+    assert backend.get("a") == b"A"
+    assert backend.get("b") is None
+    assert backend.get("c") == b"C"
+
+
+def test_memory_backend_expires_entries(monkeypatch: pytest.MonkeyPatch):
+    now = 1000.0
+    monkeypatch.setattr("petshop.api.cache.time.monotonic", lambda: now)
+    backend = MemoryBackend(ttl=60)
+    backend.set("a", b"A")
+
+    now += 59
+    assert backend.get("a") == b"A"
+    now += 1
+    assert backend.get("a") is None
+    assert len(backend) == 0
+
+
+def test_response_cache_counts_hits_and_misses():
+    cache = ResponseCache(MemoryBackend())
+    key = cache.key(1, "packages", "requests", None, 0)
+
+    assert cache.get(key) is None
+    cache.set(key, b"[]")
+    assert cache.get(key) == b"[]"
+
+    assert cache.stats() == {
+        "generation": None,
+        "hits": 1,
+        "misses": 1,
+        "hit_ratio": 0.5,
+    }
+
+
+def test_response_cache_throttles_generation_checks(monkeypatch: pytest.MonkeyPatch):
+    now = 1000.0
+    monkeypatch.setattr("petshop.api.cache.time.monotonic", lambda: now)
+    cache = ResponseCache(MemoryBackend(), generation_check_interval=5)
+    generations = iter([1, 2])
+
+    async def load() -> int:
+        return next(generations)
+
+    assert asyncio.run(cache.generation(load)) == 1
+    now += 4
+    assert asyncio.run(cache.generation(load)) == 1
+    now += 1
+    assert asyncio.run(cache.generation(load)) == 2
@@ -0,0 +1,89 @@
+from petshop.api.classifiers import ClassifierIndex
+
+LINKS = [
+    ("Development Status :: 3 - Alpha", 1),
+    ("Development Status :: 4 - Beta", 2),
+    ("Development Status :: 5 - Production/Stable", 3),
+    ("Development Status :: 5 - Production/Stable", 4),
+    ("Topic :: Internet :: WWW/HTTP", 1),
+    ("Topic :: Internet :: WWW/HTTP :: WSGI", 3),
+    ("Topic :: Internet", 4),
+    ("Topic :: Internet Relay Chat", 5),
+    ("Topic :: Software Development :: Libraries", 3),
+    ("Framework :: Django", 4),
+    ("Framework :: Django :: 5.0", 2),
+]
+# derived from the Development Status classifiers above on import
+DEV_STATUS = [(3, 1), (4, 2), (5, 3), (5, 4)]
+
+
+def test_matching_includes_classifiers_below():
+    index = ClassifierIndex(LINKS, [6])
+
+    assert list(index.matching("Topic :: Internet")) == [1, 3, 4]
+    assert list(index.matching("Topic :: Internet :: WWW/HTTP")) == [1, 3]
+    assert list(index.matching("Topic :: Inter")) == []
+    assert list(index.all) == [1, 2, 3, 4, 5, 6]
+
+
+def test_filter_combines_filters():
+    index = ClassifierIndex(LINKS, [6], dev_status=DEV_STATUS)
+
+    assert index.filter() is None
+    assert list(index.filter(dev_status=4) or []) == [2, 3, 4]
+    assert list(index.filter(topics=["Internet", "Software Development"]) or []) == [
+        1,
+        3,
+        4,
+    ]
+    assert list(
+        index.filter(dev_status=4, topics=["Internet"], exclude=["Framework :: Django"])
+        or []
+    ) == [3]
+    assert list(
+        index.filter(classifiers=["Topic :: Internet", "Framework :: Django"]) or []
+    ) == [4]
+    assert list(index.filter(exclude=["Topic"]) or []) == [2, 6]
+
+
+def test_facets_count_packages_per_bucket():
+    index = ClassifierIndex(
+        LINKS,
+        [6],
+        licenses=[("MIT", 1), ("MIT", 2), ("BSD", 3)],
+        requires_python=[(">=3.9", 1), (">=3.12", 4)],
+    )
+
+    facets = index.facets(index.filter(topics=["Internet"]) or index.all, limit=3)
+
+    assert [(facet.value, facet.count) for facet in facets.classifiers] == [
+        ("Development Status :: 5 - Production/Stable", 2),
+        ("Development Status :: 3 - Alpha", 1),
+        ("Framework :: Django", 1),
+    ]
+    assert [(facet.value, facet.count) for facet in facets.licenses] == [
+        ("BSD", 1),
+        ("MIT", 1),
+    ]
+    assert [(facet.value, facet.count) for facet in facets.requires_python] == [
+        (">=3.12", 1),
+        (">=3.9", 1),
+    ]
+
+
+def test_filter_by_flags():
+    index = ClassifierIndex(
+        LINKS,
+        [6],
+        flags=[("prerelease", 1), ("abandoned", 2), ("app", 1), ("app", 3)],
+    )
+
+    assert list(index.filter(prerelease=True) or []) == [1]
+    assert list(index.filter(prerelease=False, abandoned=False) or []) == [
+        3,
+        4,
+        5,
+        6,
+    ]
+    assert list(index.filter(kind="app", prerelease=False) or []) == [3]
+    assert list(index.filter(kind="library") or []) == []
@@ -0,0 +1,777 @@
+import asyncio
+from collections.abc import Generator
+from datetime import datetime
+from typing import Any, Callable, cast
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, text
+
+from petshop.api.main import (
+    FILTER_LOOKUP_LIMIT,
+    RESULTS_PER_PAGE,
+    app,
+    encode_cursor,
+    packages_statement,
+    refresh_classifier_index,
+    refresh_suggestion_index,
+)
+from petshop.db import bump_data_generation, engine, refresh_materialized_views
+from petshop.importer.enrich_packages import enrich_packages
+from petshop.models import Classifier, Download, Package
+
+
+@pytest.fixture
+def client() -> Generator[TestClient, None, None]:
+    # entering the client runs the lifespan, which disposes of the async engine
+    # before the event loop of the client goes away
+    with TestClient(app) as client:
+        yield client
+
+
+def test_read_packages_orders_by_downloads_total(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    package_a = create_package("PACKAGE A", datetime(2024, 12, 1))
+    package_b = create_package("PACKAGE B", datetime(2024, 12, 2))
+    imported_at = datetime(2025, 1, 1)
+    create_download(package_a.id, datetime(2024, 11, 1), imported_at, 10)
+    create_download(package_a.id, datetime(2024, 12, 1), imported_at, 10)
+    create_download(package_b.id, datetime(2024, 12, 1), imported_at, 100)
+    refresh_materialized_views(engine())
+
+    response = client.get("/api/packages")
+
+    assert response.status_code == 200
+    assert [
+        (package["name"], package["downloads_total"]) for package in response.json()
+    ] == [("PACKAGE B", 100), ("PACKAGE A", 20)]
+
+
+def test_read_packages_serves_cached_responses_until_next_generation(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    package_a = create_package("PACKAGE A", datetime(2024, 12, 1))
+    package_b = create_package("PACKAGE B", datetime(2024, 12, 2))
+    imported_at = datetime(2025, 1, 1)
+    create_download(package_a.id, datetime(2024, 12, 1), imported_at, 10)
+    refresh_materialized_views(engine())
+
+    def names() -> list[str]:
+        response = client.get("/api/packages")
+        assert response.status_code == 200
+        return [package["name"] for package in response.json()]
+
+    assert names() == ["PACKAGE A", "PACKAGE B"]
+
+    create_download(package_b.id, datetime(2024, 12, 1), imported_at, 100)
+    refresh_materialized_views(engine())
+    assert names() == ["PACKAGE A", "PACKAGE B"]
+
+    bump_data_generation(engine())
+    assert names() == ["PACKAGE B", "PACKAGE A"]
+
+    stats = client.get("/api/cache").json()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_read_packages_answers_not_modified_within_a_generation(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+):
+    create_package("PACKAGE A", datetime(2024, 12, 1))
+    refresh_materialized_views(engine())
+
+    response = client.get("/api/packages")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert (
+        client.get("/api/packages", headers={"If-None-Match": etag}).status_code == 304
+    )
+
+    bump_data_generation(engine())
+
+    response = client.get("/api/packages", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_read_packages_compresses_responses(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+):
+    create_package("PACKAGE A", datetime(2024, 12, 1))
+    refresh_materialized_views(engine())
+
+    compressed = client.get("/api/packages", headers={"Accept-Encoding": "gzip"})
+    brotli = client.get("/api/packages", headers={"Accept-Encoding": "gzip, br"})
+    plain = client.get("/api/packages", headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert brotli.headers["content-encoding"] == "br"
+    assert "content-encoding" not in plain.headers
+    assert compressed.json() == brotli.json() == plain.json()
+
+
+def test_read_packages_lists_only_list_columns(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+):
+    package = create_package("PACKAGE A", datetime(2024, 12, 1))
+    refresh_materialized_views(engine())
+
+    response = client.get("/api/packages")
+
+    assert response.json() == [
+        {"id": package.id, "name": "PACKAGE A", "downloads_total": 0}
+    ]
+
+
+def test_read_package_returns_details(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    package = create_package("PACKAGE A", datetime(2024, 12, 1))
+    create_download(package.id, datetime(2024, 12, 1), datetime(2025, 1, 1), 10)
+    refresh_materialized_views(engine())
+
+    response = client.get("/api/packages/PACKAGE A")
+
+    assert response.status_code == 200
+    assert response.json()["description"] == "DESCRIPTION"
+    assert response.json()["downloads_total"] == 10
+    assert client.get("/api/packages/package a").json()["name"] == "PACKAGE A"
+    assert client.get("/api/packages/PACKAGE B").status_code == 404
+
+
+def test_read_package_returns_packages_missing_from_downloads_total(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    refresh_materialized_views(engine())
+    package = create_package("PACKAGE A", datetime(2024, 12, 1))
+    create_download(package.id, datetime(2024, 12, 1), datetime(2025, 1, 1), 10)
+
+    response = client.get("/api/packages/PACKAGE A")
+
+    assert response.status_code == 200
+    assert response.json()["downloads_total"] == 0
+
+
+def test_read_suggestions_completes_names_loaded_at_startup(
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    imported_at = datetime(2025, 1, 1)
+    for name, downloads in [("requests", 10), ("requests-mock", 20), ("pytest", 30)]:
+        package = create_package(name, datetime(2024, 12, 1))
+        create_download(package.id, datetime(2024, 12, 1), imported_at, downloads)
+    refresh_materialized_views(engine())
+
+    with TestClient(app) as client:
+        response = client.get("/api/suggest", params={"q": "Req"})
+
+    assert response.status_code == 200
+    assert response.json() == ["requests-mock", "requests"]
+
+
+def test_refresh_suggestion_index_swaps_in_new_generation(
+    session: Session,
+    client: TestClient,
+    create_package: Callable[[str, datetime], Package],
+):
+    create_package("requests", datetime(2024, 12, 1))
+    refresh_materialized_views(engine())
+
+    assert client.get("/api/suggest", params={"q": "req"}).json() == []
+
+    client.portal.call(refresh_suggestion_index)  # pyright: ignore[reportOptionalMemberAccess]
+    assert client.get("/api/suggest", params={"q": "req"}).json() == []
+
+    bump_data_generation(engine())
+    client.portal.call(refresh_suggestion_index)  # pyright: ignore[reportOptionalMemberAccess]
+    assert client.get("/api/suggest", params={"q": "req"}).json() == ["requests"]
+
+
+def test_read_packages_filters_by_name_prefix(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    package_a = create_package("requests", datetime(2024, 12, 1))
+    package_b = create_package("pytest", datetime(2024, 12, 2))
+    imported_at = datetime(2025, 1, 1)
+    create_download(package_a.id, datetime(2024, 12, 1), imported_at, 10)
+    create_download(package_b.id, datetime(2024, 12, 1), imported_at, 100)
+    refresh_materialized_views(engine())
+
+    response = client.get("/api/packages", params={"q": "req"})
+
+    assert [package["name"] for package in response.json()] == ["requests"]
+
+
+def create_ranked_packages(session: Session, count: int):
+    # package-1 has 1 download, package-2 has 2 downloads and so on
+    session.exec(  # pyright: ignore[reportCallIssue]
+        text(
+            """
+            INSERT INTO package (name, version, upload_time, md5_digest)
+            SELECT 'package-' || i, '1.0', '2024-12-01', 'MD5_DIGEST'
+            FROM generate_series(1, :count) AS i
+            """
+        ),
+        params={"count": count},
+    )
+    session.exec(  # pyright: ignore[reportCallIssue]
+        text(
+            """
+            INSERT INTO download (imported_at, package_id, month, downloads)
+            SELECT '2025-01-01', id, '2024-12-01', id
+            FROM package
+            """
+        )
+    )
+    session.commit()
+    refresh_materialized_views(engine())
+
+
+def test_read_packages_pages_with_cursor(client: TestClient, session: Session):
+    create_ranked_packages(session, RESULTS_PER_PAGE + 5)
+
+    first_page = client.get("/api/packages", params={"cursor": ""}).json()
+    second_page = client.get(
+        "/api/packages", params={"cursor": first_page["next_cursor"]}
+    ).json()
+
+    assert [package["downloads_total"] for package in first_page["packages"]] == list(
+        range(RESULTS_PER_PAGE + 5, 5, -1)
+    )
+    assert [package["downloads_total"] for package in second_page["packages"]] == [
+        5,
+        4,
+        3,
+        2,
+        1,
+    ]
+    assert second_page["next_cursor"] is None
+    assert (
+        second_page["packages"]
+        == client.get("/api/packages", params={"page": 1}).json()
+    )
+
+
+def test_read_packages_lists_numbered_pages(client: TestClient, session: Session):
+    create_ranked_packages(session, RESULTS_PER_PAGE + 5)
+
+    first_page = client.get("/api/packages").json()
+    enveloped_page = client.get("/api/packages", params={"cursor": ""}).json()
+
+    # clients from before cursors get the plain list of packages
+    assert first_page == enveloped_page["packages"]
+    assert len(client.get("/api/packages", params={"page": 1}).json()) == 5
+
+
+def test_read_packages_sorts_by_popularity_and_trend(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    imported_at = datetime(2025, 1, 1)
+    # popular long ago
+    legacy = create_package("LEGACY", datetime(2020, 1, 1))
+    create_download(cast(int, legacy.id), datetime(2022, 12, 1), imported_at, 5000)
+    create_download(cast(int, legacy.id), datetime(2024, 11, 1), imported_at, 300)
+    create_download(cast(int, legacy.id), datetime(2024, 12, 1), imported_at, 200)
+    # steady, and released recently
+    steady = create_package("STEADY", datetime(2024, 12, 1))
+    create_download(cast(int, steady.id), datetime(2024, 11, 1), imported_at, 1000)
+    create_download(cast(int, steady.id), datetime(2024, 12, 1), imported_at, 1000)
+    # growing fast
+    rising = create_package("RISING", datetime(2024, 12, 1))
+    create_download(cast(int, rising.id), datetime(2024, 11, 1), imported_at, 10)
+    create_download(cast(int, rising.id), datetime(2024, 12, 1), imported_at, 900)
+    refresh_materialized_views(engine())
+
+    def names(**params: str) -> list[str]:
+        response = client.get("/api/packages", params=params)
+        return [package["name"] for package in response.json()]
+
+    assert names() == ["LEGACY", "STEADY", "RISING"]
+    assert names(sort="downloads") == ["LEGACY", "STEADY", "RISING"]
+    assert names(sort="popularity") == ["STEADY", "RISING", "LEGACY"]
+    assert names(sort="trending") == ["RISING", "STEADY", "LEGACY"]
+    assert client.get("/api/packages", params={"sort": "age"}).status_code == 422
+
+
+def test_read_packages_pages_by_score_with_cursor(client: TestClient, session: Session):
+    create_ranked_packages(session, RESULTS_PER_PAGE + 5)
+
+    first_page = client.get(
+        "/api/packages", params={"sort": "popularity", "cursor": ""}
+    ).json()
+    second_page = client.get(
+        "/api/packages",
+        params={"sort": "popularity", "cursor": first_page["next_cursor"]},
+    ).json()
+
+    assert [package["downloads_total"] for package in second_page["packages"]] == [
+        5,
+        4,
+        3,
+        2,
+        1,
+    ]
+
+
+def create_classified_packages(
+    session: Session,
+    create_classifier: Callable[[str], Classifier],
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    alpha = create_classifier("Development Status :: 3 - Alpha")
+    stable = create_classifier("Development Status :: 5 - Production/Stable")
+    web = create_classifier("Topic :: Internet :: WWW/HTTP")
+    django = create_classifier("Framework :: Django")
+    for name, classifiers, downloads in [
+        ("flask", [stable, web], 50),
+        ("django", [stable, web, django], 40),
+        ("django-alpha", [alpha, web, django], 30),
+        ("numpy", [stable], 20),
+        ("unclassified", [], 10),
+    ]:
+        package = create_package(name, datetime(2024, 12, 1), classifiers)
+        create_download(
+            cast(int, package.id),
+            datetime(2024, 12, 1),
+            datetime(2025, 1, 1),
+            downloads,
+        )
+    enrich_packages(engine())
+    refresh_materialized_views(engine())
+    bump_data_generation(engine())
+
+
+@pytest.mark.parametrize("lookup_limit", [FILTER_LOOKUP_LIMIT, 0])
+def test_read_packages_filters_by_classifiers(
+    monkeypatch: pytest.MonkeyPatch,
+    client: TestClient,
+    session: Session,
+    create_classifier: Callable[[str], Classifier],
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+    lookup_limit: int,
+):
+    # with a limit of 0, filters are applied while scanning the ranking
+    monkeypatch.setattr("petshop.api.main.FILTER_LOOKUP_LIMIT", lookup_limit)
+    create_classified_packages(
+        session, create_classifier, create_package, create_download
+    )
+    client.portal.call(refresh_classifier_index, True)  # pyright: ignore[reportOptionalMemberAccess]
+
+    def names(**params: Any) -> list[str]:
+        response = client.get("/api/packages", params=params)
+        return [package["name"] for package in response.json()]
+
+    assert names(dev_status=4) == ["flask", "django", "numpy"]
+    assert names(topic="Internet") == ["flask", "django", "django-alpha"]
+    assert names(topic="Internet", exclude="Framework :: Django") == ["flask"]
+    assert names(dev_status=5, classifier=["Framework", "Topic"]) == ["django"]
+    assert names(q="django", dev_status=4) == ["django"]
+    assert names(exclude=["Development Status", "Topic"]) == ["unclassified"]
+    assert names(sort="popularity", dev_status=4, page=0) == [
+        "flask",
+        "django",
+        "numpy",
+    ]
+    assert client.get("/api/packages", params={"dev_status": 8}).status_code == 422
+
+
+@pytest.mark.parametrize("lookup_limit", [FILTER_LOOKUP_LIMIT, 0])
+def test_read_packages_pages_filtered_packages(
+    monkeypatch: pytest.MonkeyPatch,
+    client: TestClient,
+    session: Session,
+    create_classifier: Callable[[str], Classifier],
+    lookup_limit: int,
+):
+    monkeypatch.setattr("petshop.api.main.FILTER_LOOKUP_LIMIT", lookup_limit)
+    create_ranked_packages(session, 6 * RESULTS_PER_PAGE)
+    # every third package is stable
+    stable = create_classifier("Development Status :: 5 - Production/Stable")
+    session.exec(  # pyright: ignore[reportCallIssue]
+        text(
+            """
+            INSERT INTO classifierpackagelink (classifier_id, package_id)
+            SELECT :classifier_id, id FROM package WHERE id % 3 = 0
+            """
+        ),
+        params={"classifier_id": stable.id},
+    )
+    session.commit()
+    enrich_packages(engine())
+    bump_data_generation(engine())
+    client.portal.call(refresh_classifier_index, True)  # pyright: ignore[reportOptionalMemberAccess]
+
+    first_page = client.get(
+        "/api/packages", params={"dev_status": 5, "cursor": ""}
+    ).json()
+    second_page = client.get(
+        "/api/packages", params={"dev_status": 5, "cursor": first_page["next_cursor"]}
+    ).json()
+    numbered_page = client.get(
+        "/api/packages", params={"dev_status": 5, "page": 1}
+    ).json()
+
+    downloads = [
+        package["downloads_total"]
+        for page in [first_page, second_page]
+        for package in page["packages"]
+    ]
+    assert (
+        len(first_page["packages"])
+        == len(second_page["packages"])
+        == (RESULTS_PER_PAGE)
+    )
+    assert downloads == sorted(downloads, reverse=True)
+    assert all(count % 3 == 0 for count in downloads)
+    assert len(set(downloads)) == 2 * RESULTS_PER_PAGE
+    assert second_page["next_cursor"] is None
+    assert numbered_page == second_page["packages"]
+
+
+def test_read_packages_stops_scanning_for_rare_filters(
+    monkeypatch: pytest.MonkeyPatch,
+    client: TestClient,
+    session: Session,
+    create_classifier: Callable[[str], Classifier],
+):
+    monkeypatch.setattr("petshop.api.main.FILTER_LOOKUP_LIMIT", 0)
+    monkeypatch.setattr("petshop.api.main.MAX_SCAN_CHUNK_SIZE", 10)
+    monkeypatch.setattr("petshop.api.main.MAX_SCANNED_ROWS", 30)
+    create_ranked_packages(session, 100)
+    # only the 5 least downloaded packages are stable
+    stable = create_classifier("Development Status :: 5 - Production/Stable")
+    session.exec(  # pyright: ignore[reportCallIssue]
+        text(
+            """
+            INSERT INTO classifierpackagelink (classifier_id, package_id)
+            SELECT :classifier_id, id FROM package WHERE id <= 5
+            """
+        ),
+        params={"classifier_id": stable.id},
+    )
+    session.commit()
+    enrich_packages(engine())
+    bump_data_generation(engine())
+    client.portal.call(refresh_classifier_index, True)  # pyright: ignore[reportOptionalMemberAccess]
+
+    pages = [client.get("/api/packages", params={"dev_status": 5, "cursor": ""}).json()]
+    while pages[-1]["next_cursor"] is not None:
+        pages.append(
+            client.get(
+                "/api/packages",
+                params={"dev_status": 5, "cursor": pages[-1]["next_cursor"]},
+            ).json()
+        )
+
+    # 30 rows a request, so the packages turn up on the fourth page
+    assert [len(page["packages"]) for page in pages] == [0, 0, 0, 5]
+    assert [package["downloads_total"] for package in pages[-1]["packages"]] == [
+        5,
+        4,
+        3,
+        2,
+        1,
+    ]
+    assert client.get("/api/packages", params={"dev_status": 5}).json() == []
+
+
+def test_read_packages_filters_by_flags(
+    client: TestClient,
+    session: Session,
+    create_classifier: Callable[[str], Classifier],
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    create_classified_packages(
+        session, create_classifier, create_package, create_download
+    )
+    session.exec(  # pyright: ignore[reportCallIssue]
+        text(
+            """
+            UPDATE package SET
+              is_prerelease = name = 'django-alpha',
+              is_abandoned = name = 'unclassified',
+              is_app = name = 'flask',
+              is_library = name IN ('django', 'numpy')
+            """
+        )
+    )
+    session.commit()
+    bump_data_generation(engine())
+    client.portal.call(refresh_classifier_index, True)  # pyright: ignore[reportOptionalMemberAccess]
+
+    def names(**params: Any) -> list[str]:
+        response = client.get("/api/packages", params=params)
+        return [package["name"] for package in response.json()]
+
+    assert names(prerelease=True) == ["django-alpha"]
+    assert names(prerelease=False, abandoned=False) == ["flask", "django", "numpy"]
+    assert names(kind="library", topic="Internet") == ["django"]
+    assert client.get("/api/packages", params={"kind": "plugin"}).status_code == 422
+
+
+def test_read_packages_counts_facets_of_first_page(
+    monkeypatch: pytest.MonkeyPatch,
+    client: TestClient,
+    session: Session,
+    create_classifier: Callable[[str], Classifier],
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    create_classified_packages(
+        session, create_classifier, create_package, create_download
+    )
+    session.exec(  # pyright: ignore[reportCallIssue]
+        text(
+            """
+            UPDATE package SET
+              license_expression = CASE name WHEN 'flask' THEN 'BSD-3-Clause' END,
+              license = CASE name WHEN 'numpy' THEN repeat('LICENSE TEXT ', 10)
+                ELSE ' MIT ' END,
+              requires_python = CASE name WHEN 'unclassified' THEN NULL
+                WHEN 'numpy' THEN '>= 3.10, <4' ELSE '>=3.9' END
+            """
+        )
+    )
+    session.commit()
+    bump_data_generation(engine())
+    client.portal.call(refresh_classifier_index, True)  # pyright: ignore[reportOptionalMemberAccess]
+
+    def facets(**params: Any) -> dict[str, list[tuple[str, int]]] | None:
+        response = client.get("/api/packages", params={"cursor": "", **params}).json()
+        if response["facets"] is None:
+            return None
+        return {
+            name: [(facet["value"], facet["count"]) for facet in counts]
+            for name, counts in response["facets"].items()
+        }
+
+    assert facets() == {
+        "classifiers": [
+            ("Development Status :: 5 - Production/Stable", 3),
+            ("Topic :: Internet :: WWW/HTTP", 3),
+            ("Framework :: Django", 2),
+            ("Development Status :: 3 - Alpha", 1),
+        ],
+        "licenses": [("MIT", 3), ("BSD-3-Clause", 1)],
+        "requires_python": [(">=3.9", 3), (">=3.10", 1)],
+    }
+    assert facets(q="django", dev_status=4) == {
+        "classifiers": [
+            ("Development Status :: 5 - Production/Stable", 1),
+            ("Framework :: Django", 1),
+            ("Topic :: Internet :: WWW/HTTP", 1),
+        ],
+        "licenses": [("MIT", 1)],
+        "requires_python": [(">=3.9", 1)],
+    }
+
+    monkeypatch.setattr("petshop.api.main.MAX_FACET_RESULTS", 0)
+    assert facets(q="flask") is None
+
+
+def test_read_packages_leaves_out_slow_facets(
+    monkeypatch: pytest.MonkeyPatch, client: TestClient, session: Session
+):
+    create_ranked_packages(session, 1)
+
+    async def slow_facets(*args: Any):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr("petshop.api.main.package_facets", slow_facets)
+    monkeypatch.setattr("petshop.api.main.FACETS_TIMEOUT", 0.01)
+
+    response = client.get("/api/packages", params={"cursor": ""})
+
+    assert [package["name"] for package in response.json()["packages"]] == ["package-1"]
+    assert response.json()["facets"] is None
+    # the page without facets is neither cached nor revalidated
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+
+    monkeypatch.undo()
+    response = client.get("/api/packages", params={"cursor": ""})
+
+    assert response.json()["facets"] is not None
+    assert "etag" in response.headers
+
+
+def test_read_packages_rejects_invalid_cursor(client: TestClient, session: Session):
+    response = client.get("/api/packages", params={"cursor": "garbage"})
+
+    assert response.status_code == 400
+
+
+def test_read_packages_rejects_cursor_of_other_sort(
+    client: TestClient, session: Session
+):
+    create_ranked_packages(session, RESULTS_PER_PAGE + 5)
+    cursor = client.get(
+        "/api/packages", params={"sort": "popularity", "cursor": ""}
+    ).json()["next_cursor"]
+
+    response = client.get(
+        "/api/packages", params={"sort": "trending", "cursor": cursor}
+    )
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "cursor of sort popularity, not trending"
+    assert client.get("/api/packages", params={"cursor": cursor}).status_code == 400
+
+
+def rows_visited(session: Session, statement: Any) -> int:
+    """Largest number of rows produced by any node of the executed plan."""
+
+    def plan_rows(plan: dict[str, Any]) -> list[int]:
+        return [plan["Actual Rows"]] + [
+            rows for subplan in plan.get("Plans", []) for rows in plan_rows(subplan)
+        ]
+
+    sql = statement.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    result = session.exec(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).one()  # pyright: ignore[reportCallIssue,reportArgumentType]
+
+    return max(plan_rows(result[0][0]["Plan"]))
+
+
+def test_cursor_page_1000_costs_about_the_same_as_page_1(session: Session):
+    count = 1001 * RESULTS_PER_PAGE
+    create_ranked_packages(session, count)
+    session.exec(text("ANALYZE package, downloadstotal"))  # pyright: ignore[reportCallIssue]
+    # with downloads == package id, page 1000 starts right after this row
+    last_id_of_page_999 = count - 1000 * RESULTS_PER_PAGE + 1
+    cursor = encode_cursor("downloads", last_id_of_page_999, last_id_of_page_999)
+
+    first_page_rows = rows_visited(session, packages_statement())
+    cursor_page_rows = rows_visited(session, packages_statement(cursor=cursor))
+    offset_page_rows = rows_visited(session, packages_statement(page=1000))
+
+    assert first_page_rows == RESULTS_PER_PAGE + 1
+    assert cursor_page_rows <= first_page_rows
+    assert offset_page_rows > 1000 * RESULTS_PER_PAGE
+
+
+def create_search_packages(
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+    packages: list[tuple[str, str, int]],
+):
+    for name, summary, downloads in packages:
+        package = create_package(name, datetime(2024, 12, 1))
+        package.summary = summary
+        session.add(package)
+        session.commit()
+        create_download(
+            cast(int, package.id),
+            datetime(2024, 12, 1),
+            datetime(2025, 1, 1),
+            downloads,
+        )
+    refresh_materialized_views(engine())
+
+
+def search(client: TestClient, q: str, **params: str) -> list[str]:
+    response = client.get("/api/packages", params={"q": q, **params})
+
+    return [package["name"] for package in response.json()]
+
+
+def test_read_packages_searches_summary_name_infix_and_typos(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    create_search_packages(
+        session,
+        create_package,
+        create_download,
+        [
+            ("requests", "Python HTTP for Humans.", 1000),
+            ("django-rest-framework", "Web APIs for Django.", 100),
+            ("pytest", "simple powerful testing with Python", 10),
+        ],
+    )
+
+    assert search(client, "http") == ["requests"]
+    assert search(client, "rest") == ["django-rest-framework"]
+    assert search(client, "reqests") == ["requests"]
+    assert search(client, "50%_off") == []
+
+
+def test_read_packages_ranks_exact_name_above_popular_summary_match(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    create_search_packages(
+        session,
+        create_package,
+        create_download,
+        [
+            ("pytest-cov", "Pytest plugin for measuring coverage.", 100_000_000),
+            ("coverage", "Code coverage measurement for Python", 1000),
+        ],
+    )
+
+    assert search(client, "coverage") == ["coverage", "pytest-cov"]
+
+
+def test_read_packages_pages_search_results_with_cursor(
+    client: TestClient,
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    create_search_packages(
+        session,
+        create_package,
+        create_download,
+        [(f"flask-{i}", "Flask extension", i) for i in range(RESULTS_PER_PAGE + 5)],
+    )
+
+    first_page = client.get("/api/packages", params={"q": "flask", "cursor": ""}).json()
+    second_page = client.get(
+        "/api/packages", params={"q": "flask", "cursor": first_page["next_cursor"]}
+    ).json()
+
+    names = [package["name"] for package in first_page["packages"]] + [
+        package["name"] for package in second_page["packages"]
+    ]
+    assert len(names) == RESULTS_PER_PAGE + 5
+    assert set(names) == {f"flask-{i}" for i in range(RESULTS_PER_PAGE + 5)}
+    assert second_page["next_cursor"] is None
@@ -0,0 +1,62 @@
+import gzip
+from pathlib import Path
+
+import brotli
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from petshop.api.responses import ImmutableStaticFiles, accepted_encoding, compress
+
+
+def test_immutable_static_files_caches_hashed_assets_forever(tmp_path: Path):
+    tmp_path.joinpath("assets").mkdir()
+    tmp_path.joinpath("assets/index-1a2b3c.js").write_text("console.log('hi')")
+    tmp_path.joinpath("index.html").write_text("<html></html>")
+    app = FastAPI()
+    app.mount("/", ImmutableStaticFiles(directory=tmp_path, html=True))
+    client = TestClient(app)
+
+    asset = client.get("/assets/index-1a2b3c.js")
+    index = client.get("/")
+
+    assert asset.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert index.headers["cache-control"] == "no-cache"
+
+    revalidated = client.get("/", headers={"If-None-Match": index.headers["etag"]})
+
+    assert revalidated.status_code == 304
+    assert revalidated.headers["cache-control"] == "no-cache"
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, encoding",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip, deflate", "gzip"),
+        ("gzip, deflate, br", "br"),
+        ("br;q=0, gzip", "gzip"),
+        ("gzip;q=0, br;q=0", None),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("BR;Q=0.8, gzip;q=0.5", "br"),
+        ("*", "br"),
+        ("*;q=0.5, br;q=0", "gzip"),
+        ("gzip;q=invalid", None),
+        ("x-gzip", None),
+    ],
+)
+def test_accepted_encoding_weighs_qualities(accept_encoding: str, encoding: str | None):
+    request = Request(
+        {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    )
+
+    assert accepted_encoding(request) == encoding
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+def test_compress_round_trips(encoding: str):
+    content = b'{"packages": []}' * 100
+    decompress = brotli.decompress if encoding == "br" else gzip.decompress
+
+    assert decompress(compress(content, encoding)) == content
@@ -0,0 +1,41 @@
+from petshop.api.suggest import SCAN_LIMIT, SuggestionIndex
+from petshop.models import normalize_name
+
+
+def test_normalize_name():
+    assert normalize_name("Flask_SQLAlchemy") == "flask-sqlalchemy"
+    assert normalize_name("zope.interface") == "zope-interface"
+    assert normalize_name("a-_.b") == "a-b"
+
+
+def test_suggest_ranks_matches_by_downloads():
+    index = SuggestionIndex(
+        [
+            ("requests", 100),
+            ("requests-oauthlib", 50),
+            ("Requests_Mock", 70),
+            ("pytest", 1000),
+        ]
+    )
+
+    assert index.suggest("req") == ["requests", "Requests_Mock", "requests-oauthlib"]
+    assert index.suggest("requests-m") == ["Requests_Mock"]
+    assert index.suggest("Requests.") == ["Requests_Mock", "requests-oauthlib"]
+    assert index.suggest("req", limit=1) == ["requests"]
+    assert index.suggest("x") == []
+    assert index.suggest("") == []
+
+
+def test_suggest_uses_precomputed_ranking_for_common_prefixes():
+    packages = [(f"pkg-{i}", i) for i in range(SCAN_LIMIT * 20)]
+    packages.append(("pkg", 0))
+    packages.append(("other", 10**9))
+    index = SuggestionIndex(packages)
+
+    for prefix in ["p", "pkg", "pkg-", "pkg-1", "pkg-12"]:
+        expected = sorted(
+            (name for name, _ in packages if name.startswith(prefix)),
+            key=lambda name: -dict(packages)[name],
+        )[:10]
+        assert index.suggest(prefix) == expected
+    assert "pkg-" in index.top
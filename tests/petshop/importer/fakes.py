@@ -0,0 +1,94 @@
+from collections.abc import Iterator
+from typing import Any, Callable
+
+import pyarrow as pa
+from google.cloud.bigquery import ArrayQueryParameter, QueryJobConfig, Row, SchemaField
+
+
+class FakeRowIterator:
+    def __init__(
+        self,
+        rows: list[dict[str, Any]],
+        job_id: str | None = None,
+        client: "FakeClient | None" = None,
+    ):
+        self.schema = [SchemaField(key, "STRING") for key in (rows[0] if rows else {})]
+        self.rows = rows
+        self.job_id = job_id
+        self.total_rows = len(rows)
+        self.client = client
+
+    def __iter__(self) -> Iterator[Row]:
+        field_to_index = {field.name: index for index, field in enumerate(self.schema)}
+        for row in self.rows:
+            yield Row(list(row.values()), field_to_index)
+
+    def to_arrow_iterable(self, page_size: int = 2) -> Iterator[pa.RecordBatch]:
+        # like BigQuery, all pages share the schema of the whole result
+        if self.rows:
+            for batch in pa.Table.from_pylist(self.rows).to_batches(page_size):
+                if self.client is not None:
+                    self.client.fetched_batches += 1
+                yield batch
+
+
+class FakeQueryJob:
+    def __init__(
+        self,
+        client: "FakeClient",
+        rows: FakeRowIterator,
+        total_bytes_processed: int | None = None,
+    ):
+        self.client = client
+        self.rows = rows
+        self.job_id = rows.job_id
+        self.total_bytes_processed = total_bytes_processed
+
+    def result(self) -> FakeRowIterator:
+        self.client.events.append(("result", self.rows.job_id))
+
+        return self.rows
+
+
+class FakeClient:
+    """Answers queries with the rows `results` returns for the query parameters.
+
+    Dry runs are answered with the bytes `bytes_processed` returns instead.
+    """
+
+    def __init__(
+        self,
+        results: Callable[[dict[str, Any]], list[dict[str, Any]]],
+        bytes_processed: Callable[[dict[str, Any]], int] = lambda _: 0,
+    ):
+        self.results = results
+        self.bytes_processed = bytes_processed
+        self.queries: list[dict[str, Any]] = []
+        self.dry_runs: list[dict[str, Any]] = []
+        self.events: list[tuple[str, str | None]] = []
+        self.fetched_batches = 0
+
+    def query(
+        self,
+        query: str,
+        job_config: QueryJobConfig | None = None,
+        job_id: str | None = None,
+    ) -> FakeQueryJob:
+        params = {
+            parameter.name: parameter.values
+            if isinstance(parameter, ArrayQueryParameter)
+            else parameter.value
+            for parameter in (job_config.query_parameters if job_config else [])
+        }
+        if job_config and job_config.dry_run:
+            self.dry_runs.append(params)
+            self.events.append(("dry_run", job_id))
+
+            return FakeQueryJob(
+                self, FakeRowIterator([], job_id), self.bytes_processed(params)
+            )
+
+        self.queries.append(params)
+        self.events.append(("query", job_id))
+
+        return FakeQueryJob(self, FakeRowIterator(self.results(params), job_id, self))
@@ -0,0 +1,38 @@
+import pyarrow as pa
+
+from petshop.importer.columnar import (
+    chunked,
+    normalize_names,
+    postgres_array_literals,
+)
+from petshop.models import normalize_name
+
+
+def test_chunked_slices_batches_into_chunks_of_rows():
+    batches = [
+        pa.RecordBatch.from_pydict({"value": list(range(start, start + 3))})
+        for start in (0, 3)
+    ]
+
+    chunks = [
+        [batch.column("value").to_pylist() for batch in chunk]
+        for chunk in chunked(batches, 4)
+    ]
+
+    assert chunks == [[[0, 1, 2], [3]], [[4, 5]]]
+
+
+def test_normalize_names_is_normalize_name():
+    names = ["Flask_SQLAlchemy", "zope.interface", "A-_.b", "pip"]
+
+    normalized = normalize_names(pa.array(names))
+
+    assert normalized.to_pylist() == [normalize_name(name) for name in names]
+
+
+def test_postgres_array_literals_escapes_values():
+    lists = pa.array([['a "b"', "c\\d"], None, [], [None, "e,f"]]).slice(1)
+
+    literals = postgres_array_literals(lists)
+
+    assert literals.to_pylist() == [None, "{}", '{NULL,"e,f"}']
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from typing import Callable, cast
+
+import pytest
+from sqlmodel import Session, col, select
+
+from petshop.db import engine
+from petshop.importer.enrich_packages import enrich_packages, is_prerelease
+from petshop.models import Classifier, Package, PackageFeatures
+
+
+@pytest.mark.parametrize(
+    "version, expected",
+    [
+        ("1.0", False),
+        ("1.0.post1", False),
+        ("2.0rc1", True),
+        ("1.0a2", True),
+        ("1.0.dev3", True),
+        ("not a version", None),
+    ],
+)
+def test_is_prerelease_parses_pep_440_versions(version: str, expected: bool | None):
+    assert is_prerelease(version) == expected
+
+
+def test_enrich_packages_flags_packages(
+    session: Session,
+    create_classifier: Callable[[str], Classifier],
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+):
+    beta = create_classifier("Development Status :: 4 - Beta")
+    stable = create_classifier("Development Status :: 5 - Production/Stable")
+    console = create_classifier("Environment :: Console")
+    libraries = create_classifier(
+        "Topic :: Software Development :: Libraries :: Python Modules"
+    )
+    recently = datetime.now() - timedelta(days=30)
+    long_ago = datetime.now() - timedelta(days=3 * 365)
+    packages = {
+        "cli": create_package("cli", recently, [beta, console]),
+        "lib": create_package("lib", recently, [beta, stable, libraries]),
+        "both": create_package("both", long_ago, [console, libraries]),
+        "declining": create_package("declining", long_ago),
+        "steady": create_package("steady", long_ago),
+    }
+    for name, version in [("cli", "1.0"), ("lib", "2.0b1")]:
+        packages[name].version = version
+    for name, slope in [("declining", -5.0), ("steady", 0.0)]:
+        session.add(
+            PackageFeatures(
+                package_id=cast(int, packages[name].id),
+                decayed_downloads=100,
+                rolling_mean=10,
+                slope=slope,
+                zscore=0,
+                computed_at=datetime(2025, 1, 1),
+            )
+        )
+    session.commit()
+
+    enrich_packages(engine())
+
+    session.expire_all()
+    flags = {
+        package.name: (
+            package.is_prerelease,
+            package.dev_status,
+            package.is_app,
+            package.is_library,
+            package.is_abandoned,
+        )
+        for package in session.exec(select(Package))
+    }
+    assert flags == {
+        "cli": (False, 4, True, False, False),
+        "lib": (True, 5, False, True, False),
+        # "VERSION" is no PEP 440 version, and without downloads it is
+        # abandoned
+        "both": (None, None, True, True, True),
+        "declining": (None, None, False, False, True),
+        "steady": (None, None, False, False, False),
+    }
+
+
+def test_enrich_packages_derives_flags_of_uploads_after(
+    session: Session,
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+):
+    old = create_package("old", datetime(2024, 1, 1))
+    new = create_package("new", datetime(2024, 12, 1))
+    old.version = new.version = "1.0rc1"
+    session.commit()
+
+    enrich_packages(engine(), upload_time_after=datetime(2024, 6, 1))
+
+    prereleases = session.exec(
+        select(Package.name).where(col(Package.is_prerelease))
+    ).all()
+    assert prereleases == ["new"]
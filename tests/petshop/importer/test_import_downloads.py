@@ -1,127 +1,248 @@
-from collections.abc import Generator
+import time
 from datetime import datetime
-from typing import Callable
+from typing import Callable, cast
 
 import pytest
-from sqlmodel import Session
+from google.cloud.bigquery import Client
+from sqlmodel import Session, select, text
 
 from petshop.db import engine
-from petshop.importer.import_downloads import get_package_ids_by_name
-from petshop.models import Classifier, Download, Package
+from petshop.importer.checkpoints import (
+    get_checkpoints,
+    get_completed_months,
+    save_checkpoint,
+)
+from petshop.importer.import_downloads import (
+    get_download_split_batches,
+    get_downloads_concurrently,
+    get_package_ids_by_name,
+    stream_update_downloads,
+)
+from petshop.models import Download, DownloadSplit, Package
+from tests.petshop.importer.fakes import FakeClient
 
 
-@pytest.fixture
-def session() -> Generator[Session, None, None]:
-    with Session(engine()) as session:
-        yield session
+def test_get_package_ids_by_name(
+    session: Session, create_package: Callable[[str, datetime], Package]
+):
+    package_a = create_package("PACKAGE A", datetime(2024, 12, 1))
+    package_b = create_package("PACKAGE B", datetime(2024, 12, 2))
+    package_c = create_package("PACKAGE C", datetime(2024, 12, 3))
 
+    result = get_package_ids_by_name(session)
 
-@pytest.fixture
-def create_classifier(session: Session) -> Callable[[str], Classifier]:
-    def create_classifier(name: str) -> Classifier:
-        classifier = Classifier(name=name)
-        session.add(classifier)
-        session.commit()
-        session.refresh(classifier)
-        # Classifier(name="Development Status :: 5 - Production/Stable"),
-        # Classifier(name="Operating System :: POSIX :: Linux"),
+    assert result == {
+        "package a": package_a.id,
+        "package b": package_b.id,
+        "package c": package_c.id,
+    }
 
-        return classifier
 
-    return create_classifier
+def test_stream_update_downloads_upserts_month(
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    month = datetime(2024, 12, 1)
+    package_a = create_package("PACKAGE A", datetime(2024, 12, 1))
+    package_b = create_package("PACKAGE B", datetime(2024, 12, 2))
+    package_c = create_package("PACKAGE C", datetime(2024, 12, 3))
+    create_download(cast(int, package_a.id), month, datetime(2024, 12, 15), 1)
+    create_download(cast(int, package_c.id), month, datetime(2024, 12, 15), 1)
+    create_download(cast(int, package_c.id), datetime(2024, 11, 1), month, 7)
+    # every split of the month reports the same downloads
+    client = FakeClient(
+        lambda _: [
+            {"package_name": "PACKAGE A", "downloads": 10},
+            {"package_name": "PACKAGE B", "downloads": 20},
+            {"package_name": "UNKNOWN", "downloads": 30},
+        ]
+    )
+
+    stream_update_downloads(cast(Client, client), month, engine())
+
+    downloads = {
+        (download.package_id, download.month): download.downloads
+        for download in session.exec(select(Download))
+    }
+    assert downloads == {
+        (package_a.id, month): 50,
+        (package_b.id, month): 100,
+        (package_c.id, month): 0,
+        (package_c.id, datetime(2024, 11, 1)): 7,
+    }
 
 
-@pytest.fixture
-def create_package(
+def test_stream_update_downloads_replaces_partition_of_month(
     session: Session,
-) -> Callable[[str, datetime, list[Classifier]], Package]:
-    def create_package(
-        name: str, upload_time: datetime, classifiers: list[Classifier] = []
-    ) -> Package:
-        package = Package(
-            name=name,
-            upload_time=upload_time,
-            metadata_version="METADATA_VERSION",
-            version="VERSION",
-            summary="SUMMARY",
-            description="DESCRIPTION",
-            description_content_type="DESCRIPTION_CONTENT_TYPE",
-            author="AUTHOR",
-            author_email="AUTHOR_EMAIL",
-            maintainer="MAINTAINER",
-            maintainer_email="MAINTAINER_EMAIL",
-            license="LICENSE",
-            keywords="KEYWORDS",
-            classifiers=classifiers,
-            platform=["PLATFORM"],
-            home_page="HOME_PAGE",
-            download_url="DOWNLOAD_URL",
-            requires_python="REQUIRES_PYTHON",
-            requires=["REQUIRED A", "REQUIRED B"],
-            provides=["PROVIDES A", "PROVIDES B"],
-            obsoletes=["OBSOLETES A", "OBSOLETES B"],
-            requires_dist=["REQUIRES_DIST A"],
-            provides_dist=["PROVIDES_DIST A"],
-            obsoletes_dist=["OBSOLETES_DIST A"],
-            requires_external=["REQUIRES_EXTERNAL A"],
-            project_urls=["PROJECT_URL 1"],
-            uploaded_via="UPLOADED_VIA",
-            filename="FILENAME",
-            size=1000,
-            path="PATH",
-            python_version="PYTHON_VERSION",
-            packagetype="PACKAGETYPE",
-            comment_text="COMMENT_TEXT",
-            has_signature=True,
-            md5_digest="MD5_DIGEST",
-            sha256_digest="SHA256_DIGEST",
-            blake2_256_digest="BLAKE2_256_DIGEST",
-            license_expression="LICENSE_EXPRESSION",
-            license_files=["LICENSE_FILE"],
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    month = datetime(2024, 12, 1)
+    package_a = create_package("PACKAGE A", datetime(2024, 12, 1))
+    package_b = create_package("PACKAGE B", datetime(2024, 12, 2))
+    create_download(cast(int, package_a.id), month, datetime(2024, 12, 15), 1)
+    create_download(cast(int, package_b.id), month, datetime(2024, 12, 15), 1)
+    create_download(cast(int, package_b.id), datetime(2024, 11, 1), month, 7)
+    client = FakeClient(lambda _: [{"package_name": "PACKAGE A", "downloads": 10}])
+    # detaching the partition waits for every transaction reading download
+    session.commit()
+
+    for _ in range(2):
+        stream_update_downloads(cast(Client, client), month, engine(), replace=True)
+
+    downloads = {
+        (download.package_id, download.month): download.downloads
+        for download in session.exec(select(Download))
+    }
+    assert downloads == {
+        (package_a.id, month): 50,
+        (package_b.id, datetime(2024, 11, 1)): 7,
+    }
+    partitions = session.exec(
+        text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits"
+            " WHERE inhparent = 'download'::regclass AND inhrelid::regclass::text"
+            " LIKE 'download_2024_1_'"
         )
-        session.add(package)
-        session.commit()
-        session.refresh(package)
-        return package
+    ).all()
+    assert sorted(partitions) == [
+        ("download_2024_10",),
+        ("download_2024_11",),
+        ("download_2024_12",),
+    ]
 
-    return create_package
 
+def test_stream_update_downloads_matches_normalized_names(
+    session: Session, create_package: Callable[[str, datetime], Package]
+):
+    month = datetime(2024, 12, 1)
+    package = create_package("Flask_SQLAlchemy", datetime(2024, 12, 1))
+    client = FakeClient(
+        lambda _: [
+            {"package_name": "flask-sqlalchemy", "downloads": 10},
+            {"package_name": "Flask.SQLAlchemy", "downloads": 1},
+        ]
+    )
+
+    stream_update_downloads(cast(Client, client), month, engine())
+
+    downloads = [
+        (download.package_id, download.downloads)
+        for download in session.exec(select(Download))
+    ]
+    assert downloads == [(package.id, 55)]
+
+
+def test_get_downloads_concurrently_merges_counts_of_all_splits():
+    client = FakeClient(
+        lambda params: [
+            {"package_name": "PACKAGE A", "downloads": 1},
+            {
+                "package_name": f"PACKAGE {params['timestamp_start']:%Y-%m-%d}",
+                "downloads": 2,
+            },
+        ]
+    )
+
+    result = get_downloads_concurrently(cast(Client, client), 2024, 1, workers=3)
+
+    assert sorted(result) == [
+        ("PACKAGE 2024-01-01", 2),
+        ("PACKAGE 2024-01-06", 2),
+        ("PACKAGE 2024-01-12", 2),
+        ("PACKAGE 2024-01-18", 2),
+        ("PACKAGE 2024-01-24", 2),
+        ("PACKAGE A", 5),
+    ]
+    # all splits are submitted before the first result is awaited
+    assert [event for event, _ in client.events] == ["query"] * 5 + ["result"] * 5
+
+
+def test_get_download_split_batches_fetches_given_splits_concurrently():
+    client = FakeClient(
+        lambda params: [
+            {
+                "package_name": f"PACKAGE {params['timestamp_start']:%Y-%m-%d}",
+                "downloads": 2,
+            },
+        ]
+    )
+
+    batches = get_download_split_batches(
+        cast(Client, client), datetime(2024, 1, 1), [0, 3], workers=2
+    )
+
+    rows = {
+        split: [row for batch in split_batches for row in batch.to_pylist()]
+        for split, split_batches in batches
+    }
+    assert rows == {
+        0: [{"package_name": "PACKAGE 2024-01-01", "downloads": 2}],
+        3: [{"package_name": "PACKAGE 2024-01-18", "downloads": 2}],
+    }
 
-@pytest.fixture
-def create_download(
-    session: Session,
-) -> Callable[[int, datetime, datetime, int], Download]:
-    def create_download(
-        package_id: int, month: datetime, imported_at: datetime, downloads: int = 1234
-    ) -> Download:
-        download = Download(
-            package_id=package_id,
-            month=month,
-            imported_at=imported_at,
-            downloads=downloads,
-        )
-        session.add(download)
-        session.commit()
-        session.refresh(download)
-        return download
 
-    return create_download
+def test_get_download_split_batches_buffers_few_batches_per_split(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr("petshop.importer.import_downloads.MAX_BUFFERED_BATCHES", 1)
+    client = FakeClient(
+        lambda params: [
+            {"package_name": f"PACKAGE {i}", "downloads": i} for i in range(10)
+        ]
+    )
 
+    batches = get_download_split_batches(
+        cast(Client, client), datetime(2024, 1, 1), [0, 1], workers=2
+    )
+    split, split_batches = next(batches)
+    first_batch = next(iter(split_batches))
+    time.sleep(0.1)
 
-def test_get_package_ids_by_name(
-    session: Session, create_package: Callable[[str, datetime], Package]
-):
-    package_a = create_package("PACKAGE A", datetime(2024, 12, 1))
-    package_b = create_package("PACKAGE B", datetime(2024, 12, 2))
-    package_c = create_package("PACKAGE C", datetime(2024, 12, 3))
+    # of 5 batches per split, the one taken, one queued per split and one
+    # waiting for room per split
+    assert (split, first_batch.num_rows) == (0, 2)
+    assert client.fetched_batches == 5
 
-    result = get_package_ids_by_name(session)
+    batches.close()
 
-    assert result == {
-        "PACKAGE A": package_a.id,
-        "PACKAGE B": package_b.id,
-        "PACKAGE C": package_c.id,
-    }
+
+def test_stream_update_downloads_resumes_after_finished_splits(
+    session: Session, create_package: Callable[[str, datetime], Package]
+):
+    month = datetime(2024, 12, 1)
+    package = create_package("PACKAGE A", datetime(2024, 12, 1))
+    # an interrupted import of 3 splits finished the second one
+    session.add(DownloadSplit(month=month, normalized_name="package a", downloads=7))
+    with engine().begin() as connection:
+        save_checkpoint(connection, "downloads", "2024-12 split 2/3")
+    session.commit()
+    client = FakeClient(lambda _: [{"package_name": "PACKAGE A", "downloads": 10}])
+
+    stream_update_downloads(cast(Client, client), month, engine(), number_of_splits=5)
+
+    assert [f"{params['timestamp_start']:%Y-%m-%d}" for params in client.queries] == [
+        "2024-12-01",
+        "2024-12-20",
+    ]
+    downloads = [
+        (download.package_id, download.downloads)
+        for download in session.exec(select(Download))
+    ]
+    assert downloads == [(package.id, 27)]
+    assert session.exec(select(DownloadSplit)).all() == []
+    assert get_checkpoints(engine(), "downloads") == {"2024-12": None}
+    assert get_completed_months(engine()) == {month}
+
+
+def test_stream_update_downloads_does_not_complete_running_month(session: Session):
+    month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    client = FakeClient(lambda _: [])
+
+    stream_update_downloads(cast(Client, client), month, engine())
+
+    assert get_checkpoints(engine(), "downloads") == {}
 
 
 # def test_get_incomplete_months(
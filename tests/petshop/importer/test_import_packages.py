@@ -0,0 +1,225 @@
+from datetime import datetime, timezone
+from typing import Any, Callable, cast
+
+import pytest
+from google.cloud.bigquery import Client
+from google.cloud.bigquery.table import RowIterator
+from sqlmodel import Session, select
+
+from petshop.db import engine
+from petshop.importer.checkpoints import (
+    PackagePosition,
+    get_checkpoints,
+    save_checkpoint,
+)
+from petshop.importer.import_packages import (
+    PACKAGE_UPLOAD_TIME_AFTER,
+    bulk_update_packages,
+    get_import_watermark,
+    get_latest_update_time,
+    import_packages,
+    packages_changed,
+    record_import_run,
+)
+from petshop.models import Classifier, Package
+from tests.petshop.importer.fakes import FakeClient, FakeRowIterator
+
+
+def package_row(
+    name: str,
+    version: str,
+    classifiers: list[str],
+    upload_time: datetime = datetime(2024, 12, 1),
+) -> dict[str, Any]:
+    return {
+        "name": name,
+        "upload_time": upload_time,
+        "version": version,
+        "summary": f"{name} summary",
+        "md5_digest": "MD5_DIGEST",
+        "classifiers_array": classifiers,
+        "requires_dist": ["REQUIRES_DIST A", "REQUIRES_DIST B"],
+    }
+
+
+def test_bulk_update_packages_inserts_and_updates_packages(
+    session: Session,
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+    create_classifier: Callable[[str], Classifier],
+):
+    stable = create_classifier("Development Status :: 5 - Production/Stable")
+    create_package("PACKAGE A", datetime(2024, 1, 1), [stable])
+    rows = FakeRowIterator(
+        [
+            package_row("PACKAGE A", "2.0", ["Framework :: Django"]),
+            package_row("PACKAGE B", "1.0", [stable.name, "Framework :: Django"]),
+            package_row("PACKAGE C", "1.0", []),
+        ]
+    )
+
+    bulk_update_packages(engine(), cast(RowIterator, rows), batch_size=2)
+
+    packages = {
+        package.name: package
+        for package in session.exec(select(Package).order_by(Package.name))
+    }
+    assert list(packages) == ["PACKAGE A", "PACKAGE B", "PACKAGE C"]
+    assert packages["PACKAGE A"].version == "2.0"
+    assert packages["PACKAGE A"].summary == "PACKAGE A summary"
+    assert packages["PACKAGE A"].author == "AUTHOR"
+    assert packages["PACKAGE B"].requires_dist == ["REQUIRES_DIST A", "REQUIRES_DIST B"]
+    assert [c.name for c in packages["PACKAGE A"].classifiers] == [
+        "Framework :: Django"
+    ]
+    assert sorted(c.name for c in packages["PACKAGE B"].classifiers) == [
+        "Development Status :: 5 - Production/Stable",
+        "Framework :: Django",
+    ]
+    assert packages["PACKAGE C"].classifiers == []
+    assert len(session.exec(select(Classifier)).all()) == 2
+
+
+def test_bulk_update_packages_keeps_latest_spelling_of_normalized_name(
+    session: Session,
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+):
+    package = create_package("Package_A", datetime(2024, 1, 1), [])
+    rows = FakeRowIterator(
+        [
+            package_row("package-a", "2.0", ["Framework :: Django"]),
+            package_row("Package.A", "1.0", [], upload_time=datetime(2024, 11, 1)),
+        ]
+    )
+
+    bulk_update_packages(engine(), cast(RowIterator, rows))
+    session.expire_all()
+
+    packages = session.exec(select(Package)).all()
+    assert [(p.id, p.name, p.version) for p in packages] == [
+        (package.id, "package-a", "2.0")
+    ]
+    assert [c.name for c in packages[0].classifiers] == ["Framework :: Django"]
+
+
+def test_bulk_update_packages_copies_arrays_verbatim(session: Session):
+    requires_dist = ['a ; extra == "b"', "c\\d", "e,f", "{g}", "NULL", ""]
+    rows = FakeRowIterator(
+        [
+            {**package_row("PACKAGE A", "1.0", []), "requires_dist": requires_dist},
+            {**package_row("PACKAGE B", "1.0", []), "requires_dist": None},
+        ]
+    )
+
+    bulk_update_packages(engine(), cast(RowIterator, rows))
+
+    packages = session.exec(select(Package).order_by(Package.name)).all()
+    assert [package.requires_dist for package in packages] == [requires_dist, None]
+
+
+def test_bulk_update_packages_resumes_after_checkpoint(session: Session):
+    rows = FakeRowIterator(
+        [
+            package_row("PACKAGE A", "1.0", [], upload_time=datetime(2024, 12, 1)),
+            package_row("PACKAGE B", "1.0", [], upload_time=datetime(2024, 12, 2)),
+            package_row("PACKAGE C", "1.0", [], upload_time=datetime(2024, 12, 2)),
+        ]
+    )
+    with engine().begin() as connection:
+        position = PackagePosition(datetime(2024, 12, 2), "PACKAGE B")
+        save_checkpoint(connection, "packages", "since X", position.to_json())
+
+    bulk_update_packages(
+        engine(), cast(RowIterator, rows), batch_size=1, checkpoint_unit="since X"
+    )
+
+    assert [package.name for package in session.exec(select(Package))] == ["PACKAGE C"]
+    assert get_checkpoints(engine(), "packages") == {
+        "since X": PackagePosition(datetime(2024, 12, 2), "PACKAGE C").to_json()
+    }
+
+
+def test_packages_changed_probes_for_any_upload():
+    upload_time_after = datetime(2024, 12, 1, tzinfo=timezone.utc)
+
+    assert packages_changed(
+        cast(Client, FakeClient(lambda _: [{"changed": 1}])), upload_time_after
+    )
+    assert not packages_changed(
+        cast(Client, FakeClient(lambda _: [])), upload_time_after
+    )
+
+
+def test_import_packages_skips_packages_query_without_changes(
+    monkeypatch: pytest.MonkeyPatch, session: Session
+):
+    monkeypatch.setenv("GOOGLE_CLOUD_PROJECT", "PROJECT")
+    client = FakeClient(lambda _: [])
+
+    import_packages(incremental=True, bigquery_client=cast(Client, client))
+
+    # only the probe, with the parameter as BigQuery reads it
+    assert client.queries == [
+        {"upload_time_after": PACKAGE_UPLOAD_TIME_AFTER.replace(tzinfo=timezone.utc)}
+    ]
+    assert get_import_watermark(engine()) == PACKAGE_UPLOAD_TIME_AFTER
+
+
+def test_import_packages_skips_packages_query_for_upload_at_watermark(
+    monkeypatch: pytest.MonkeyPatch,
+    session: Session,
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+):
+    monkeypatch.setenv("GOOGLE_CLOUD_PROJECT", "PROJECT")
+    watermark = datetime(2024, 12, 1)
+    create_package("PACKAGE A", watermark, [])
+
+    def get_packages(*args: Any):
+        raise AssertionError("packages queried without changes")
+
+    monkeypatch.setattr("petshop.importer.import_packages.get_packages", get_packages)
+    # the only upload is the one at the watermark, which is already imported
+    client = FakeClient(
+        lambda params: (
+            [{"changed": 1}]
+            if watermark.replace(tzinfo=timezone.utc) > params["upload_time_after"]
+            else []
+        )
+    )
+
+    import_packages(incremental=True, bigquery_client=cast(Client, client))
+
+    assert len(client.queries) == 1
+    assert get_import_watermark(engine()) == watermark
+
+
+def test_bulk_update_packages_leaves_packages_without_new_upload_alone(
+    session: Session,
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+    create_classifier: Callable[[str], Classifier],
+):
+    stable = create_classifier("Development Status :: 5 - Production/Stable")
+    package = create_package("PACKAGE A", datetime(2024, 12, 1), [stable])
+    rows = FakeRowIterator(
+        [package_row("PACKAGE A", "2.0", [], upload_time=datetime(2024, 12, 1))]
+    )
+
+    bulk_update_packages(engine(), cast(RowIterator, rows))
+    session.expire_all()
+
+    assert package.version == "VERSION"
+    assert package.classifiers == [stable]
+
+
+def test_import_watermark_is_taken_from_the_last_run(
+    session: Session,
+    create_package: Callable[[str, datetime, list[Classifier]], Package],
+):
+    assert get_import_watermark(engine()) is None
+
+    create_package("PACKAGE A", datetime(2024, 11, 1), [])
+    create_package("PACKAGE B", datetime(2024, 12, 1), [])
+    record_import_run(engine(), datetime(2024, 12, 2), datetime(2024, 11, 1))
+    record_import_run(engine(), datetime(2024, 12, 3), get_latest_update_time(engine()))
+    record_import_run(engine(), datetime(2024, 12, 3), None, importer="downloads")
+
+    assert get_import_watermark(engine()) == datetime(2024, 12, 1)
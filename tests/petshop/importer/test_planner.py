@@ -0,0 +1,86 @@
+from datetime import datetime
+from typing import Any, cast
+
+import pytest
+from google.cloud.bigquery import Client
+
+from petshop.importer.planner import (
+    MonthPlan,
+    QueryPlan,
+    format_bytes,
+    parse_bytes,
+    plan_month,
+    plan_packages,
+    within_budget,
+)
+from tests.petshop.importer.fakes import FakeClient
+
+GIB = 1024**3
+
+
+def bytes_per_day(size: int):
+    def bytes_processed(params: dict[str, Any]) -> int:
+        start, end = (
+            datetime.fromisoformat(str(params[name]))
+            for name in ("timestamp_start", "timestamp_end")
+        )
+        return (end - start).days * size
+
+    return bytes_processed
+
+
+def test_plan_month_chooses_splits_from_estimates():
+    client = FakeClient(lambda _: [], bytes_per_day(100 * GIB))
+
+    plan = plan_month(cast(Client, client), datetime(2024, 1, 1))
+
+    assert plan.number_of_splits == 4
+    assert plan.bytes_processed == 31 * 100 * GIB
+    assert len(client.dry_runs) == 5
+    assert client.queries == []
+
+
+def test_plan_month_keeps_workers_busy_but_not_below_a_day():
+    client = FakeClient(lambda _: [], bytes_per_day(GIB))
+
+    assert plan_month(cast(Client, client), datetime(2024, 1, 1)).number_of_splits == 1
+    assert (
+        plan_month(cast(Client, client), datetime(2024, 1, 1), 8).number_of_splits == 8
+    )
+    assert (
+        plan_month(cast(Client, client), datetime(2024, 2, 1), 50).number_of_splits
+        == 29
+    )
+
+
+def test_plan_packages_estimates_both_incremental_queries():
+    client = FakeClient(lambda _: [], lambda _: 3 * GIB)
+
+    plans = plan_packages(cast(Client, client), datetime(2024, 12, 1), True)
+
+    assert plans == [
+        QueryPlan("changed packages probe", 3 * GIB),
+        QueryPlan("packages", 3 * GIB),
+    ]
+    assert client.queries == []
+
+
+def test_within_budget_keeps_leading_months_that_fit():
+    plans = [
+        MonthPlan(datetime(2024, month, 1), [QueryPlan("split", 400 * GIB)])
+        for month in (1, 2, 3)
+    ]
+
+    assert within_budget(plans, None) == plans
+    assert within_budget(plans, 1000 * GIB) == plans[:2]
+    assert within_budget(plans, 100 * GIB) == []
+
+
+def test_parse_and_format_bytes():
+    assert parse_bytes("500G") == 500 * GIB
+    assert parse_bytes("1.5TiB") == int(1.5 * 1024 * GIB)
+    assert parse_bytes("2048") == 2048
+    assert format_bytes(1536 * GIB) == "1.5 TiB"
+    assert format_bytes(12) == "12.0 B"
+    with pytest.raises(ValueError):
+        parse_bytes("lots")
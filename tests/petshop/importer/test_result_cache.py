@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import cast
+
+from google.cloud.bigquery import Client
+
+from petshop.importer.import_downloads import get_downloads
+from petshop.importer.result_cache import CachingClient, ResultCache
+from tests.petshop.importer.fakes import FakeClient
+
+
+def downloads(params: dict[str, object]) -> list[dict[str, object]]:
+    return [
+        {"package_name": "requests", "downloads": 10},
+        {"package_name": "pytest", "downloads": 20},
+        {"package_name": "flask", "downloads": 30},
+    ]
+
+
+def test_caching_client_replays_results(tmp_path: Path):
+    fake_client = FakeClient(downloads)
+    client = cast(
+        Client, CachingClient(cast(Client, fake_client), ResultCache(tmp_path))
+    )
+
+    first = [
+        tuple(row.values())
+        for row in get_downloads(client, datetime(2024, 1, 1), datetime(2024, 1, 6))
+    ]
+    second = [
+        tuple(row.values())
+        for row in get_downloads(client, datetime(2024, 1, 1), datetime(2024, 1, 6))
+    ]
+    get_downloads(client, datetime(2024, 1, 6), datetime(2024, 1, 12))
+
+    assert first == second == [("requests", 10), ("pytest", 20), ("flask", 30)]
+    assert len(fake_client.queries) == 2
+
+
+def test_caching_client_keeps_columns_of_empty_results(tmp_path: Path):
+    client = cast(
+        Client,
+        CachingClient(cast(Client, FakeClient(lambda _: [])), ResultCache(tmp_path)),
+    )
+
+    rows = get_downloads(client, datetime(2024, 1, 1), datetime(2024, 1, 6))
+    rows = get_downloads(client, datetime(2024, 1, 1), datetime(2024, 1, 6))
+
+    assert list(rows) == []
+    assert rows.total_rows == 0
+
+
+def test_result_cache_expires_and_purges_entries(tmp_path: Path):
+    fake_client = FakeClient(downloads)
+    cache = ResultCache(tmp_path, ttl=timedelta(seconds=-1))
+    client = cast(Client, CachingClient(cast(Client, fake_client), cache))
+
+    get_downloads(client, datetime(2024, 1, 1), datetime(2024, 1, 6))
+    get_downloads(client, datetime(2024, 1, 1), datetime(2024, 1, 6))
+
+    assert len(fake_client.queries) == 2
+    assert [entry.rows for entry in cache.entries()] == [3]
+    assert cache.purge(expired_only=True) == 1
+    assert cache.entries() == []
+    assert list(tmp_path.glob("*.arrow")) == []
@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Callable, cast
+
+import numpy as np
+import pytest
+from sqlmodel import Session, select
+
+from petshop.db import engine
+from petshop.importer.score_features import (
+    DownloadMatrix,
+    compute_score_features,
+    update_score_features,
+)
+from petshop.models import Download, Package, PackageFeatures
+
+
+def test_compute_score_features_of_matrix():
+    matrix = DownloadMatrix(
+        np.array([1, 2, 3]),
+        datetime(2024, 12, 1),
+        np.array(
+            [
+                [10.0, 20.0, 30.0, 40.0],
+                [5.0, 5.0, 5.0, 5.0],
+                [0.0, 0.0, 0.0, 8.0],
+            ]
+        ),
+    )
+
+    features = compute_score_features(
+        matrix, half_life=1, trend_months=3, rolling_mean_months=2
+    )
+
+    np.testing.assert_allclose(
+        features.decayed_downloads, [40 + 15 + 5 + 1.25, 9.375, 8]
+    )
+    np.testing.assert_allclose(features.rolling_mean, [35, 5, 4])
+    np.testing.assert_allclose(features.slope, [10, 0, 4])
+    # the first package deviates by (40 - 20) / sqrt(200 / 3) deviations
+    np.testing.assert_allclose(features.zscore, [20 / np.sqrt(200 / 3), 0, 0])
+
+
+def test_update_score_features_writes_features_of_recent_months(
+    session: Session,
+    create_package: Callable[[str, datetime], Package],
+    create_download: Callable[[int, datetime, datetime, int], Download],
+):
+    package_a = create_package("PACKAGE A", datetime(2024, 1, 1))
+    package_b = create_package("PACKAGE B", datetime(2024, 1, 1))
+    imported_at = datetime(2025, 1, 1)
+    create_download(cast(int, package_a.id), datetime(2024, 10, 1), imported_at, 10)
+    create_download(cast(int, package_a.id), datetime(2024, 12, 1), imported_at, 30)
+    create_download(cast(int, package_b.id), datetime(2024, 11, 1), imported_at, 6)
+    # older than the months the features are computed from
+    create_download(cast(int, package_b.id), datetime(2023, 1, 1), imported_at, 1000)
+    # the running month is left out
+    create_download(cast(int, package_b.id), datetime(2025, 1, 1), imported_at, 100)
+    session.commit()
+
+    update_score_features(engine(), months=3)
+
+    features = {
+        row.package_id: (row.rolling_mean, row.slope)
+        for row in session.exec(select(PackageFeatures))
+    }
+    assert features == {
+        package_a.id: (pytest.approx(40 / 3), pytest.approx(10)),
+        package_b.id: (pytest.approx(2), pytest.approx(0)),
+    }
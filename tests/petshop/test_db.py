@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+from sqlmodel import text
+
+from petshop.db import (
+    create_download_partition,
+    create_profile_engine,
+    download_partition_name,
+    engine,
+)
+
+
+def query(sql: str, profile: str) -> str:
+    sqlmodel_engine = create_profile_engine(profile)
+    try:
+        with sqlmodel_engine.connect() as connection:
+            return str(connection.execute(text(sql)).scalar_one())
+    finally:
+        sqlmodel_engine.dispose()
+
+
+def test_create_profile_engine_uses_profile_defaults():
+    api_engine = create_profile_engine("api")
+    api_engine.dispose()
+
+    assert api_engine.echo is False
+    assert api_engine.pool.size() == 10  # pyright: ignore[reportAttributeAccessIssue]
+    assert query("SHOW statement_timeout", "api") == "5s"
+    assert query("SHOW statement_timeout", "importer") == "0"
+
+
+def test_create_profile_engine_reads_settings_from_environment(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setenv("DATABASE_STATEMENT_TIMEOUT", "1000")
+    monkeypatch.setenv("DATABASE_API_STATEMENT_TIMEOUT", "2000")
+    monkeypatch.setenv("DATABASE_API_ECHO", "true")
+
+    api_engine = create_profile_engine("api")
+    api_engine.dispose()
+
+    assert api_engine.echo is True
+    assert query("SHOW statement_timeout", "api") == "2s"
+    assert query("SHOW statement_timeout", "importer") == "1s"
+
+
+def test_create_profile_engine_reuses_pooled_connections(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setenv("DATABASE_POOL_SIZE", "1")
+    monkeypatch.setenv("DATABASE_MAX_OVERFLOW", "0")
+    sqlmodel_engine = create_profile_engine("api")
+
+    backend_pids = set()
+    try:
+        for _ in range(3):
+            with sqlmodel_engine.connect() as connection:
+                backend_pids.add(
+                    connection.execute(text("SELECT pg_backend_pid()")).scalar_one()
+                )
+    finally:
+        sqlmodel_engine.dispose()
+
+    assert len(backend_pids) == 1
+
+
+def test_create_download_partition_creates_missing_month_once():
+    month = datetime(2099, 1, 1)
+    with engine().begin() as connection:
+        connection.execute(
+            text(f"DROP TABLE IF EXISTS {download_partition_name(month)}")
+        )
+
+    create_download_partition(engine(), month)
+    create_download_partition(engine(), month)
+
+    partition = query(
+        "SELECT pg_get_expr(relpartbound, oid) FROM pg_class"
+        f" WHERE relname = '{download_partition_name(month)}'",
+        "default",
+    )
+    assert partition == (
+        "FOR VALUES FROM ('2099-01-01 00:00:00') TO ('2099-02-01 00:00:00')"
+    )